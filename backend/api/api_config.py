@@ -1,5 +1,8 @@
 ﻿import json
+from functools import lru_cache
 from pathlib import Path
+from typing import Any
+
 from pydantic import BaseModel
 
 
@@ -9,5 +12,18 @@ class ApiConfig(BaseModel):
 
 
 config_path = Path(__file__).with_name("config_api.json")
-with config_path.open("r", encoding="utf-8") as fp:
-    api_config = ApiConfig(**json.load(fp))
+
+
+@lru_cache()
+def get_api_config() -> ApiConfig:
+    """Le `config_api.json` na primeira chamada, nao no import."""
+
+    with config_path.open("r", encoding="utf-8") as fp:
+        return ApiConfig(**json.load(fp))
+
+
+def __getattr__(name: str) -> Any:
+    # Compatibilidade com `from backend.api.api_config import api_config`.
+    if name == "api_config":
+        return get_api_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,140 @@
 ﻿from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
-from sqlalchemy.orm import Session
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterator, Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from backend.api import schemas
-from backend.database.connection import get_db_dependency
+from backend.api.instrumentation import route_class
+from backend.config import get_settings
+from backend import metrics, serialization
+from backend.database.connection import SessionRunner, get_read_db, get_read_session_runner, get_session_runner
 from backend.services import book_service
 
-router = APIRouter(prefix="/books", tags=["books"])
+router = APIRouter(prefix="/books", tags=["books"], route_class=route_class())
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+CURSOR_QUERY = Query(
+    None,
+    description=(
+        f"Cursor opaco devolvido no header `{NEXT_CURSOR_HEADER}` da página anterior. "
+        "Não combine com `offset`."
+    ),
+)
+FIELDS_QUERY = Query(
+    None,
+    description=(
+        "Campos a devolver, separados por vírgula (ex.: `id,title,author`); padrão: todos. "
+        f"Disponíveis: {', '.join(serialization.BOOK_FIELDS)}."
+    ),
+)
+
+
+IF_NONE_MATCH = Header(
+    None,
+    alias="If-None-Match",
+    description="ETag de uma resposta anterior; se ainda for o atual, a resposta é `304` sem corpo.",
+)
+IF_MATCH = Header(
+    None,
+    alias="If-Match",
+    description="ETag do livro lido antes da alteração; se ele mudou desde então, a resposta é `412`.",
+)
+
+
+def _etag_values(header: str) -> list[str]:
+    return [value.strip().removeprefix("W/") for value in header.split(",") if value.strip()]
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    """Compara If-None-Match (lista ou `*`) com o ETag atual (comparacao fraca)."""
+
+    if not header:
+        return False
+    values = _etag_values(header)
+    return "*" in values or etag in values
+
+
+def _book_etag(book_id: int, version: int) -> str:
+    return f'"{book_id}-{version}"'
+
+
+def _catalog_etag(version: int) -> str:
+    return f'"catalog-{version}"'
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def _expected_version(if_match: str | None, book_id: int) -> int | None:
+    """Extrai a versao do If-Match; `*` ou ausente dispensam a checagem."""
+
+    if not if_match:
+        return None
+    values = _etag_values(if_match)
+    if "*" in values:
+        return None
+    prefix = f'"{book_id}-'
+    for value in values:
+        if value.startswith(prefix) and value.endswith('"') and value[len(prefix):-1].isdigit():
+            return int(value[len(prefix):-1])
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="ETag does not match this book")
+
+
+async def _catalog_precondition(
+    db: SessionRunner, response: Response, if_none_match: str | None
+) -> tuple[int, Response | None]:
+    """Publica o ETag do catalogo; devolve a versao lida e um 304 pronto se o cliente ja a tem.
+
+    A versao segue para o book_service e entra na chave do cache da pagina,
+    para que o corpo nunca seja mais antigo que o ETag.
+    """
+
+    version = await db.run(book_service.catalog_version)
+    etag = _catalog_etag(version)
+    if _etag_matches(if_none_match, etag):
+        return version, _not_modified(etag)
+    response.headers["ETag"] = etag
+    return version, None
+
+
+def _fields(fields: str | None) -> tuple[str, ...] | None:
+    """Valida o parâmetro `fields` (422 com campo desconhecido)."""
+
+    try:
+        return serialization.parse_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
+
+
+def _rows_response(response: Response, rows, fields: tuple[str, ...] | None = None):
+    """Devolve as linhas já serializadas, sem revalidar cada uma via `BookOut`.
+
+    O `response_model` da rota continua documentando o schema no OpenAPI.
+    Com `FAST_JSON_RESPONSES=false`, as linhas seguem pelo caminho padrão,
+    exceto com `fields`: linhas parciais não passariam pelo `BookOut`.
+    """
+
+    if fields is None and not get_settings().fast_json_responses:
+        return rows
+    with metrics.serialization():
+        body = serialization.dumps_rows(serialization.project_rows(rows, fields))
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
+
+
+def _paginate(response: Response, page: book_service.BookPage, fields: tuple[str, ...] | None = None):
+    """Publica o cursor da próxima página no header e devolve as linhas."""
+
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return _rows_response(response, page.items, fields)
 
 
 @router.get(
@@ -16,11 +143,14 @@ router = APIRouter(prefix="/books", tags=["books"])
     summary="Listar livros",
     description=(
         "Retorna os livros cadastrados ordenados por data de criação (mais recentes primeiro). "
-        "Use os parâmetros `limit` e `offset` para paginação simples."
+        "Para navegar no catálogo inteiro, use o cursor devolvido no header "
+        f"`{NEXT_CURSOR_HEADER}` (custo constante por página); `offset` continua disponível "
+        "para paginação simples."
     ),
     responses={
         200: {
             "description": "Lista paginada de livros",
+            "headers": {NEXT_CURSOR_HEADER: {"description": "Cursor da próxima página (ausente na última)."}},
             "content": {
                 "application/json": {
                     "example": [
@@ -35,25 +165,52 @@ router = APIRouter(prefix="/books", tags=["books"])
                     ]
                 }
             },
-        }
+        },
+        304: {"description": "Catálogo não mudou desde o ETag informado"},
+        400: {"description": "Cursor inválido"},
     },
 )
-def list_books(
+async def list_books(
+    response: Response,
     limit: int = Query(100, ge=1, le=500, description="Quantidade de registros a retornar."),
     offset: int = Query(0, ge=0, description="Deslocamento inicial para paginação."),
-    db: Session = Depends(get_db_dependency),
+    cursor: str | None = CURSOR_QUERY,
+    fields: str | None = FIELDS_QUERY,
+    if_none_match: str | None = IF_NONE_MATCH,
+    db: SessionRunner = Depends(get_read_session_runner),
 ):
     """Lista livros com paginação e ordenação por data de criação.
 
     Args:
+        response: Resposta do FastAPI, usada para o header do próximo cursor.
         limit: Limite máximo de itens (1-500).
         offset: Deslocamento inicial para navegar entre páginas.
+        cursor: Cursor opaco da página anterior (keyset).
+        fields: Campos de cada livro na resposta (padrão: todos).
+        if_none_match: ETag já conhecido pelo cliente (versão do catálogo).
         db: Sessão de banco injetada pelo FastAPI.
 
     Returns:
-        Lista de livros no formato `BookOut`.
+        Lista de livros no formato `BookOut` (só os campos de `fields`, se informado).
     """
-    return book_service.list_books(db, limit=limit, offset=offset)
+    if cursor and offset:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either cursor or offset, not both")
+    selected = _fields(fields)
+    version, not_modified = await _catalog_precondition(db, response, if_none_match)
+    if not_modified is not None:
+        return not_modified
+    if offset:
+        return _rows_response(
+            response, await db.run(book_service.list_books, limit=limit, offset=offset, version=version), selected
+        )
+    try:
+        return _paginate(
+            response,
+            await db.run(book_service.list_books_page, limit=limit, cursor=cursor, version=version),
+            selected,
+        )
+    except book_service.InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
 
 @router.post(
@@ -67,122 +224,485 @@ def list_books(
         422: {"description": "Dados inválidos"},
     },
 )
-def create_book(payload: schemas.BookCreate, db: Session = Depends(get_db_dependency)):
+async def create_book(
+    response: Response, payload: schemas.BookCreate, db: SessionRunner = Depends(get_session_runner)
+):
     """Cria um novo livro.
 
     Args:
+        response: Resposta do FastAPI, usada para o header `ETag`.
         payload: Dados validados pelo `BookCreate`.
         db: Sessão de banco.
 
     Returns:
         Livro persistido.
     """
-    return book_service.create_book(db, title=payload.title, author=payload.author,
-                                     publisher=payload.publisher, purchase_link=payload.purchase_link)
+    book = await db.write(book_service.create_book, title=payload.title, author=payload.author,
+                          publisher=payload.publisher, purchase_link=payload.purchase_link)
+    response.headers["ETag"] = _book_etag(book.id, book.version)
+    return book
+
+
+async def _iter_ndjson(request: Request, result: book_service.BulkResult) -> AsyncIterator[tuple[int, Any]]:
+    """Le o corpo em streaming, uma linha JSON por livro (linhas vazias sao ignoradas)."""
+
+    buffer = b""
+    index = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield index, json.loads(line)
+            except ValueError as exc:
+                result.add_error(index, f"Invalid JSON: {exc}")
+            index += 1
+    if buffer.strip():
+        try:
+            yield index, json.loads(buffer)
+        except ValueError as exc:
+            result.add_error(index, f"Invalid JSON: {exc}")
+
+
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkResultOut,
+    summary="Cadastrar livros em massa",
+    description=(
+        "Recebe um array JSON de livros ou um corpo NDJSON em streaming "
+        f"(`Content-Type: {NDJSON_MEDIA_TYPES[0]}`, um livro por linha). Cada item é validado "
+        "com as regras de `BookCreate` e inserido em lotes de `batch_size` linhas, com um commit "
+        "por lote. Itens inválidos são reportados por índice sem abortar a carga."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/BookCreate"}}},
+                NDJSON_MEDIA_TYPES[0]: {"schema": {"type": "string"}},
+            },
+            "required": True,
+        }
+    },
+    responses={
+        200: {"description": "Resumo da carga (inseridos e erros por linha)"},
+        400: {"description": "Corpo não é um array JSON válido"},
+    },
+)
+async def bulk_create_books(
+    request: Request,
+    batch_size: int | None = Query(
+        None, ge=1, le=10000, description="Linhas por lote (padrão: `BULK_BATCH_SIZE`)."
+    ),
+    db: SessionRunner = Depends(get_session_runner),
+):
+    """Carga em massa; o SQL roda via `SessionRunner`, sem bloquear o event loop."""
+    size = batch_size or get_settings().bulk_batch_size
+    result = book_service.BulkResult()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_MEDIA_TYPES:
+        chunk: list[Any] = []
+        start = 0
+        async for index, item in _iter_ndjson(request, result):
+            # Linha com JSON invalido quebra a sequencia de indices: fecha o trecho atual.
+            if chunk and (len(chunk) >= size or index != start + len(chunk)):
+                await db.run(book_service.bulk_create_books, chunk, batch_size=size, start=start, result=result)
+                chunk = []
+            if not chunk:
+                start = index
+            chunk.append(item)
+        if chunk:
+            await db.run(book_service.bulk_create_books, chunk, batch_size=size, start=start, result=result)
+    else:
+        try:
+            items = await request.json()
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON body") from exc
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array")
+        await db.run(book_service.bulk_create_books, items, batch_size=size, result=result)
+    return result.to_dict()
+
+
+BULK_FILTER_QUERIES = {
+    "query": Query(None, min_length=1, max_length=255, description="Regra do `/books/search` (palavras e prefixos)."),
+    "title": Query(None, min_length=1, max_length=255, description="Título exato."),
+    "author": Query(None, min_length=1, max_length=255, description="Autor exato."),
+    "publisher": Query(None, min_length=1, max_length=255, description="Editora exata."),
+}
+DRY_RUN_QUERY = Query(False, description="Só conta os livros afetados, sem alterar nada.")
+MAX_ROWS_QUERY = Query(
+    None, ge=1, le=1_000_000, description="Se mais livros casarem, nada é alterado (padrão: `BULK_WRITE_MAX_ROWS`)."
+)
+CHUNK_SIZE_QUERY = Query(
+    None, ge=1, le=10000, description="Livros por bloco, um commit cada (padrão: `BULK_WRITE_CHUNK_SIZE`)."
+)
+
+
+@router.patch(
+    "/",
+    response_model=schemas.BulkWriteOut,
+    summary="Atualizar livros por filtro",
+    description=(
+        "Aplica os campos do corpo a todos os livros que casam com os filtros (`query`, `title`, `author`, "
+        "`publisher`; ao menos um). Executa em blocos de IDs, um `UPDATE` e um commit por bloco, sem "
+        "segurar o lock de escrita do SQLite por toda a operação. Use `dry_run=true` para contar antes."
+    ),
+    responses={
+        200: {"description": "Resumo (livros que casam, alterados e blocos)"},
+        400: {"description": "Sem filtro, sem campos ou acima de `max_rows`"},
+    },
+)
+async def patch_books(
+    payload: schemas.BookUpdate,
+    query: str | None = BULK_FILTER_QUERIES["query"],
+    title: str | None = BULK_FILTER_QUERIES["title"],
+    author: str | None = BULK_FILTER_QUERIES["author"],
+    publisher: str | None = BULK_FILTER_QUERIES["publisher"],
+    dry_run: bool = DRY_RUN_QUERY,
+    max_rows: int | None = MAX_ROWS_QUERY,
+    chunk_size: int | None = CHUNK_SIZE_QUERY,
+    db: SessionRunner = Depends(get_session_runner),
+):
+    """Update em massa; cada bloco é commitado pelo `book_service`, como na carga em massa."""
+    where = book_service.BookFilter(query=query, title=title, author=author, publisher=publisher)
+    try:
+        result = await db.run(book_service.update_books_where, where, title=payload.title, author=payload.author,
+                              publisher=payload.publisher, purchase_link=payload.purchase_link, dry_run=dry_run,
+                              max_rows=max_rows, chunk_size=chunk_size)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return result.to_dict()
+
+
+@router.delete(
+    "/",
+    response_model=schemas.BulkWriteOut,
+    summary="Excluir livros por filtro",
+    description=(
+        "Remove todos os livros que casam com os filtros (mesmos do `PATCH /books`), em blocos de IDs "
+        "com um `DELETE` e um commit por bloco. Use `dry_run=true` para contar antes."
+    ),
+    responses={
+        200: {"description": "Resumo (livros que casam, removidos e blocos)"},
+        400: {"description": "Sem filtro ou acima de `max_rows`"},
+    },
+)
+async def delete_books(
+    query: str | None = BULK_FILTER_QUERIES["query"],
+    title: str | None = BULK_FILTER_QUERIES["title"],
+    author: str | None = BULK_FILTER_QUERIES["author"],
+    publisher: str | None = BULK_FILTER_QUERIES["publisher"],
+    dry_run: bool = DRY_RUN_QUERY,
+    max_rows: int | None = MAX_ROWS_QUERY,
+    chunk_size: int | None = CHUNK_SIZE_QUERY,
+    db: SessionRunner = Depends(get_session_runner),
+):
+    """Delete em massa por filtro."""
+    where = book_service.BookFilter(query=query, title=title, author=author, publisher=publisher)
+    try:
+        result = await db.run(book_service.delete_books_where, where, dry_run=dry_run, max_rows=max_rows,
+                              chunk_size=chunk_size)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return result.to_dict()
 
 
 @router.get(
     "/search",
     response_model=list[schemas.BookOut],
     summary="Buscar livros por palavra-chave",
-    description="Pesquisa case-insensitive em título, autor e editora.",
+    description=(
+        "Pesquisa por palavras (e prefixos) em título, autor e editora, "
+        "ordenada por relevância. Acentos e maiúsculas são ignorados. "
+        "Com `mode=fuzzy`, tolera erros de digitação e ordena por similaridade (paginação só por offset)."
+    ),
     responses={
-        200: {"description": "Livros encontrados"},
+        200: {
+            "description": "Livros encontrados",
+            "headers": {NEXT_CURSOR_HEADER: {"description": "Cursor da próxima página (ausente na última)."}},
+        },
+        304: {"description": "Catálogo não mudou desde o ETag informado"},
+        400: {"description": "Cursor inválido ou usado com `mode=fuzzy`"},
         422: {"description": "Parâmetros inválidos"},
     },
 )
-def search_books(
+async def search_books(
+    response: Response,
     query: str = Query(..., min_length=1, description="Palavra-chave para busca."),
     limit: int = Query(100, ge=1, le=500, description="Quantidade máxima de itens."),
     offset: int = Query(0, ge=0, description="Deslocamento inicial para paginação."),
-    db: Session = Depends(get_db_dependency),
+    cursor: str | None = CURSOR_QUERY,
+    mode: Literal["default", "fuzzy"] = Query("default", description="`fuzzy` tolera erros de digitação."),
+    fields: str | None = FIELDS_QUERY,
+    if_none_match: str | None = IF_NONE_MATCH,
+    db: SessionRunner = Depends(get_read_session_runner),
 ):
     """Busca por palavra-chave em título, autor e editora."""
-    return book_service.search_books(db, query=query, limit=limit, offset=offset)
+    if cursor and offset:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either cursor or offset, not both")
+    if cursor and mode == "fuzzy":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Fuzzy search pages with offset, not cursor")
+    selected = _fields(fields)
+    version, not_modified = await _catalog_precondition(db, response, if_none_match)
+    if not_modified is not None:
+        return not_modified
+    if offset or mode != "default":
+        return _rows_response(
+            response,
+            await db.run(
+                book_service.search_books, query=query, limit=limit, offset=offset, mode=mode, version=version
+            ),
+            selected,
+        )
+    try:
+        return _paginate(
+            response,
+            await db.run(book_service.search_books_page, query=query, limit=limit, cursor=cursor, version=version),
+            selected,
+        )
+    except book_service.InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+@router.get(
+    "/suggest",
+    response_model=list[schemas.SuggestionOut],
+    summary="Sugestões de autocompletar",
+    description=(
+        "Completa títulos, autores e editoras a partir do texto digitado (início do valor ou de uma palavra), "
+        "com a quantidade de livros de cada um. Acentos e maiúsculas são ignorados. "
+        "Servido de um índice em memória, sem consultar o banco: feito para ser chamado a cada tecla."
+    ),
+    responses={422: {"description": "Parâmetros inválidos"}},
+)
+async def suggest_books(
+    prefix: str = Query(..., min_length=1, max_length=255, description="Texto digitado até agora."),
+    limit: int = Query(10, ge=1, le=50, description="Quantidade máxima de sugestões."),
+):
+    """Sugestões mais frequentes primeiro."""
+    if book_service.suggestions_ready():
+        return book_service.suggest_books(prefix, limit=limit)
+    # Índice ainda em construção: espera fora do event loop.
+    return await run_in_threadpool(book_service.suggest_books, prefix, limit=limit)
+
+
+@router.get(
+    "/changes",
+    response_model=schemas.ChangesOut,
+    summary="Mudanças desde um ponto (delta sync)",
+    description=(
+        "Livros criados ou alterados (estado atual) e lápides de removidos com `seq` maior que `since`, "
+        "em ordem de `seq`, cada livro uma vez. Guarde `next_since` e repita enquanto `has_more`; "
+        "`since=0` devolve o catálogo inteiro. O custo acompanha o volume de mudanças, não o tamanho do catálogo."
+    ),
+    responses={
+        410: {"description": "Lápides posteriores a `since` já foram compactadas: refaça a sincronização completa"},
+        501: {"description": "Banco sem os triggers do changelog (só SQLite)"},
+    },
+)
+async def list_changes(
+    since: int = Query(0, ge=0, description="`next_since` da chamada anterior (0 = desde o início)."),
+    limit: int = Query(500, ge=1, le=1000, description="Quantidade máxima de mudanças."),
+    db: SessionRunner = Depends(get_read_session_runner),
+):
+    """Página do changelog a partir de `since`."""
+    try:
+        page = await db.run(book_service.list_changes, since=since, limit=limit)
+    except book_service.ChangesExpiredError as exc:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(exc)) from exc
+    except book_service.ChangesUnsupportedError as exc:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(exc)) from exc
+    return page.to_dict()
+
+
+@router.get(
+    "/stats",
+    response_model=schemas.CatalogStatsOut,
+    summary="Estatísticas do catálogo",
+    description=(
+        "Total de livros, autores e editoras mais frequentes e cadastros por dia. "
+        "Vem de uma tabela de resumo atualizada a cada escrita: o custo não cresce com o catálogo."
+    ),
+    responses={304: {"description": "Estatísticas não mudaram desde o ETag informado"}},
+)
+async def catalog_stats(
+    response: Response,
+    top: int = Query(20, ge=1, le=100, description="Quantos autores/editoras listar."),
+    days: int = Query(30, ge=1, le=366, description="Janela, em dias (UTC), de `added_per_day`."),
+    if_none_match: str | None = IF_NONE_MATCH,
+    db: SessionRunner = Depends(get_read_session_runner),
+):
+    """Totais e contagens por faceta, com ETag ligado à versão do catálogo."""
+    # A janela de dias anda sozinha à meia-noite: a data entra no ETag.
+    version = await db.run(book_service.catalog_version)
+    etag = f'"stats-{version}-{datetime.utcnow().date().isoformat()}"'
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
+    return await db.run(book_service.catalog_stats, top=top, days=days, version=version)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Exportar catálogo completo",
+    description=(
+        "Transmite todos os livros (ordenados por `id`) em NDJSON ou CSV. As linhas são lidas "
+        "do cursor em blocos e enviadas conforme chegam, com memória constante no servidor."
+    ),
+    responses={
+        200: {
+            "description": "Catálogo em streaming",
+            "content": {EXPORT_MEDIA_TYPES["ndjson"]: {}, "text/csv": {}},
+        },
+        422: {"description": "Formato inválido"},
+    },
+)
+def export_books(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="Formato de saída."),
+):
+    """Exporta o catálogo em streaming.
+
+    A sessão é aberta dentro do gerador: dependências com `yield` do FastAPI
+    encerram antes de o corpo ser transmitido.
+    """
+
+    def stream() -> Iterator[str]:
+        with get_read_db() as db:
+            yield from book_service.export_books(db, fmt=fmt)
+
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="books.{fmt}"'},
+    )
 
 
 @router.get(
     "/{book_id}",
     response_model=schemas.BookOut,
     summary="Obter detalhes de um livro",
+    description="Devolve o header `ETag`; com `If-None-Match` igual ao atual, responde `304`.",
     responses={
         200: {"description": "Livro encontrado"},
+        304: {"description": "Livro não mudou desde o ETag informado"},
         404: {"description": "Livro não encontrado"},
     },
 )
-def get_book(
+async def get_book(
+    response: Response,
     book_id: int = Path(..., ge=1, description="ID do livro a ser consultado."),
-    db: Session = Depends(get_db_dependency),
+    fields: str | None = FIELDS_QUERY,
+    if_none_match: str | None = IF_NONE_MATCH,
+    db: SessionRunner = Depends(get_read_session_runner),
 ):
     """Obtém os detalhes de um livro específico."""
+    selected = _fields(fields)
     try:
-        return book_service.get_book(db, book_id)
+        if if_none_match:
+            # Checagem barata pela PK (so a coluna version) antes de carregar o livro.
+            etag = _book_etag(book_id, await db.run(book_service.book_version, book_id))
+            if _etag_matches(if_none_match, etag):
+                return _not_modified(etag)
+        book = await db.run(book_service.get_book, book_id)
     except book_service.BookNotFoundError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    response.headers["ETag"] = _book_etag(book.id, book.version)
+    if selected is None:
+        return book
+    with metrics.serialization():
+        body = serialization.dumps_row(serialization.project(serialization.book_to_dict(book), selected))
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
 
 
 @router.put(
     "/{book_id}",
     response_model=schemas.BookOut,
     summary="Atualizar livro (replace)",
-    description="Substitui todas as informações do livro pelo payload enviado.",
+    description=(
+        "Substitui todas as informações do livro pelo payload enviado. "
+        "Envie `If-Match` com o ETag lido para evitar sobrescrever alterações de outro cliente."
+    ),
     responses={
         200: {"description": "Livro atualizado"},
         404: {"description": "Livro não encontrado"},
+        412: {"description": "O livro mudou desde o ETag informado em `If-Match`"},
     },
 )
-def update_book(
+async def update_book(
+    response: Response,
     book_id: int = Path(..., ge=1, description="ID do livro a ser atualizado."),
     payload: schemas.BookCreate = ...,
-    db: Session = Depends(get_db_dependency),
+    if_match: str | None = IF_MATCH,
+    db: SessionRunner = Depends(get_session_runner),
 ):
     """Atualiza todas as informações de um livro."""
     try:
-        return book_service.update_book(db, book_id, title=payload.title, author=payload.author,
-                                         publisher=payload.publisher, purchase_link=payload.purchase_link)
+        book = await db.write(book_service.update_book, book_id, title=payload.title, author=payload.author,
+                              publisher=payload.publisher, purchase_link=payload.purchase_link,
+                              expected_version=_expected_version(if_match, book_id))
     except book_service.BookNotFoundError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except book_service.VersionConflictError as exc:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(exc)) from exc
+    response.headers["ETag"] = _book_etag(book.id, book.version)
+    return book
 
 
 @router.patch(
     "/{book_id}",
     response_model=schemas.BookOut,
     summary="Atualizar parcialmente um livro",
+    description="Aceita `If-Match` para controle otimista de concorrência, como o PUT.",
     responses={
         200: {"description": "Livro atualizado"},
         404: {"description": "Livro não encontrado"},
+        412: {"description": "O livro mudou desde o ETag informado em `If-Match`"},
     },
 )
-def patch_book(
+async def patch_book(
+    response: Response,
     book_id: int = Path(..., ge=1, description="ID do livro a ser atualizado."),
     payload: schemas.BookUpdate = ...,
-    db: Session = Depends(get_db_dependency),
+    if_match: str | None = IF_MATCH,
+    db: SessionRunner = Depends(get_session_runner),
 ):
     """Atualiza parcialmente campos de um livro."""
     try:
-        return book_service.update_book(db, book_id, title=payload.title, author=payload.author,
-                                         publisher=payload.publisher, purchase_link=payload.purchase_link)
+        book = await db.write(book_service.update_book, book_id, title=payload.title, author=payload.author,
+                              publisher=payload.publisher, purchase_link=payload.purchase_link,
+                              expected_version=_expected_version(if_match, book_id))
     except book_service.BookNotFoundError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except book_service.VersionConflictError as exc:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(exc)) from exc
+    response.headers["ETag"] = _book_etag(book.id, book.version)
+    return book
 
 
 @router.delete(
     "/{book_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Excluir livro",
-    description="Remove definitivamente um livro do catálogo.",
+    description="Remove definitivamente um livro do catálogo. Aceita `If-Match`.",
     responses={
         204: {"description": "Livro removido"},
         404: {"description": "Livro não encontrado"},
+        412: {"description": "O livro mudou desde o ETag informado em `If-Match`"},
     },
 )
-def delete_book(
+async def delete_book(
     book_id: int = Path(..., ge=1, description="ID do livro a ser removido."),
-    db: Session = Depends(get_db_dependency),
+    if_match: str | None = IF_MATCH,
+    db: SessionRunner = Depends(get_session_runner),
 ):
     """Remove um livro definitivamente."""
     try:
-        book_service.delete_book(db, book_id)
+        await db.write(book_service.delete_book, book_id, expected_version=_expected_version(if_match, book_id))
     except book_service.BookNotFoundError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except book_service.VersionConflictError as exc:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(exc)) from exc
     return None
@@ -0,0 +1,86 @@
+"""Instrumentacao da API REST: middleware ASGI, classe de rota e `/metrics`.
+
+So e ligada quando `METRICS_ENABLED=true`; caso contrario o app segue sem
+nenhuma camada extra (ver `backend/api/main.py`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend import metrics
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro (sem BaseHTTPMiddleware) que mede cada requisicao HTTP."""
+
+    def __init__(self, app: ASGIApp, exclude: tuple[str, ...] = ()) -> None:
+        self.app = app
+        self.exclude = exclude
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path == metrics.METRICS_PATH or path.startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+
+        with metrics.track("http", "unmatched") as stats:
+            stats.status = "500"
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    stats.status = str(message["status"])
+                    metrics.mark_response_started()
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+class InstrumentedRoute(APIRoute):
+    """Rota que rotula a requisicao com o template do path e marca o fim do handler.
+
+    O tempo entre o retorno do endpoint e o inicio da resposta (validacao do
+    `response_model` + encoding JSON) vira o tempo de serializacao.
+    """
+
+    def get_route_handler(self) -> Callable[..., Any]:
+        endpoint = self.dependant.call
+        if not asyncio.iscoroutinefunction(endpoint):
+            return super().get_route_handler()
+        label = f"{'|'.join(sorted(self.methods or ()))} {self.path_format}"
+
+        async def call(**values: Any) -> Any:
+            stats = metrics.current()
+            if stats is not None:
+                stats.name = label
+            try:
+                return await endpoint(**values)
+            finally:
+                metrics.mark_handler_done()
+
+        # Troca apenas a chamada: a assinatura ja foi analisada pelo FastAPI.
+        self.dependant.call = call
+        return super().get_route_handler()
+
+
+def route_class() -> type[APIRoute]:
+    """Classe de rota para os routers: instrumentada so com metricas ligadas."""
+
+    return InstrumentedRoute if metrics.enabled() else APIRoute
+
+
+def install(app: FastAPI, *, exclude: tuple[str, ...] = ()) -> None:
+    """Adiciona o middleware e o endpoint `/metrics` ao app (`exclude`: prefixos ignorados)."""
+
+    app.router.route_class = InstrumentedRoute
+    app.add_middleware(MetricsMiddleware, exclude=exclude)
+
+    @app.get(metrics.METRICS_PATH, include_in_schema=False)
+    async def metrics_endpoint() -> PlainTextResponse:
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
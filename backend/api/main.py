@@ -8,21 +8,72 @@ coloque a API atras de um gateway com TLS.
 from __future__ import annotations
 
 import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.api.api_config import api_config
-from backend.api.endpoints import router as books_router
-from backend.database.connection import init_db
+from backend import metrics
+from backend.api import instrumentation
+from backend.api.endpoints import NEXT_CURSOR_HEADER, router as books_router
+from backend.config import get_settings
+from backend.database import memory_replica, suggest
+from backend.database.connection import dispose_async_engine, init_db, stop_write_coalescer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Preenchidos abaixo quando MOUNT_MCP=true.
+mcp_app = None
+mcp_executor = None
+
+
+def startup_event() -> None:
+    """Garante que o banco esteja pronto antes da primeira requisicao."""
+
+    settings = get_settings()
+    if settings.lazy_init:
+        # A primeira sessao aberta roda o init_db (ensure_db).
+        logger.info("LAZY_INIT: banco sera inicializado na primeira requisicao")
+        return
+    logger.info("Inicializando banco de dados...")
+    init_db()
+    logger.info("Banco pronto (modo %s)", "async" if settings.async_db else "sync")
+    if settings.suggest_warmup:
+        # Em segundo plano: o start nao espera; a primeira sugestao espera se ainda nao terminou.
+        suggest.warm_up()
+    if settings.memory_replica:
+        memory_replica.warm_up()
+
+
+async def shutdown_event() -> None:
+    """Grava as escritas pendentes do group commit e libera os pools."""
+
+    if mcp_executor is not None:
+        mcp_executor.shutdown(wait=False)
+    stop_write_coalescer()
+    await dispose_async_engine()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Prepara o banco, sobe o MCP montado (se houver) e libera tudo no shutdown."""
+
+    startup_event()
+    async with AsyncExitStack() as stack:
+        if mcp_app is not None:
+            # Sem o lifespan do app montado o session manager do MCP nao inicia.
+            await stack.enter_async_context(mcp_app.lifespan(mcp_app))
+        yield
+    await shutdown_event()
+
+
 app = FastAPI(
     title="Catalogo de Livros",
     description="API para catalogar livros",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -31,18 +82,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
-app.include_router(books_router, prefix="/api")
+if metrics.enabled():
+    # As tools montadas sao medidas pelo middleware do proprio MCP (canal "mcp").
+    settings = get_settings()
+    instrumentation.install(app, exclude=(settings.mcp_mount_path,) if settings.mount_mcp else ())
 
+app.include_router(books_router, prefix="/api")
 
-@app.on_event("startup")
-async def startup_event() -> None:
-    """Garante que o banco esteja pronto antes da primeira requisicao."""
+if get_settings().mount_mcp:
+    from backend.mcp.server import create_server
 
-    logger.info("Inicializando banco de dados...")
-    init_db()
-    logger.info("Banco pronto")
+    mcp_server, mcp_executor = create_server(metrics_route=False)
+    mcp_app = mcp_server.http_app(path="/")
+    app.mount(get_settings().mcp_mount_path, mcp_app)
+    logger.info("MCP montado em %s/", get_settings().mcp_mount_path)
 
 
 @app.get("/")
@@ -55,4 +111,7 @@ async def root() -> dict[str, str]:
 if __name__ == "__main__":
     import uvicorn
 
+    from backend.api.api_config import get_api_config
+
+    api_config = get_api_config()
     uvicorn.run("backend.api.main:app", host=api_config.host, port=api_config.port, reload=True)
@@ -1,12 +1,16 @@
 ﻿from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field, HttpUrl, field_validator
 
+from backend.services.validation import BookInput
+
+
+class BookBase(BookInput):
+    """Campos de `BookInput` (regras de validação da camada de serviços) documentados para o OpenAPI."""
 
-class BookBase(BaseModel):
     title: str = Field(..., description="Título do livro.", example="O Senhor dos Anéis")
     author: Optional[str] = Field(default=None, description="Autor principal.", example="J. R. R. Tolkien")
     publisher: Optional[str] = Field(default=None, description="Editora responsável.", example="Martins Fontes")
@@ -16,13 +20,6 @@ class BookBase(BaseModel):
         example="https://www.ecolivros.com/produto/o-senhor-dos-aneis",
     )
 
-    @field_validator("title")
-    @classmethod
-    def title_not_empty(cls, value: str) -> str:
-        if not value or not value.strip():
-            raise ValueError("Title is required")
-        return value.strip()
-
 
 class BookCreate(BookBase):
     pass
@@ -49,6 +46,10 @@ class BookUpdate(BaseModel):
 class BookOut(BookBase):
     id: int = Field(..., description="Identificador único do livro.", example=1)
     created_at: datetime = Field(..., description="Data/hora de criação.", example="2024-11-18T10:00:00")
+    updated_at: Optional[datetime] = Field(
+        default=None, description="Data/hora da última alteração.", example="2024-11-18T10:00:00"
+    )
+    version: int = Field(1, description="Versão do registro (muda a cada alteração; base do ETag).", example=1)
 
     model_config = ConfigDict(
         from_attributes=True,
@@ -60,6 +61,69 @@ class BookOut(BookBase):
                 "publisher": "Martins Fontes",
                 "purchase_link": None,
                 "created_at": "2024-11-18T10:00:00",
+                "updated_at": "2024-11-18T10:00:00",
+                "version": 1,
             }
         },
     )
+
+
+class BulkRowError(BaseModel):
+    index: int = Field(..., description="Posição do item na carga (a partir de 0).", example=3)
+    error: str = Field(..., description="Motivo da rejeição.", example="title: Value error, Title is required")
+
+
+class BulkResultOut(BaseModel):
+    inserted: int = Field(..., description="Quantidade de livros inseridos.", example=998)
+    failed: int = Field(..., description="Quantidade de itens rejeitados.", example=2)
+    errors: list[BulkRowError] = Field(default_factory=list, description="Erros por item.")
+
+
+class BulkWriteOut(BaseModel):
+    matched: int = Field(..., description="Livros que casam (no update, só os que mudariam).", example=1200)
+    affected: int = Field(..., description="Livros alterados ou removidos (0 no dry-run).", example=1200)
+    chunks: int = Field(..., description="Blocos executados, um commit cada.", example=3)
+    max_rows: int = Field(..., description="Limite aplicado; acima dele nada é alterado.", example=10000)
+    dry_run: bool = Field(..., description="Se a chamada só contou os livros.", example=False)
+
+
+class ChangeOut(BaseModel):
+    seq: int = Field(..., description="Posição da mudança no changelog (crescente).", example=1042)
+    op: Literal["upsert", "delete"] = Field(..., description="`upsert` (criado/alterado) ou `delete` (lápide).")
+    id: int = Field(..., description="ID do livro.", example=7)
+    book: Optional[BookOut] = Field(default=None, description="Estado atual do livro; `null` nas lápides.")
+
+
+class ChangesOut(BaseModel):
+    items: list[ChangeOut] = Field(default_factory=list, description="Mudanças em ordem de `seq`.")
+    next_since: int = Field(..., description="Valor de `since` para a próxima chamada.", example=1042)
+    has_more: bool = Field(..., description="Se há mais mudanças além desta página.", example=False)
+
+
+class FacetCountOut(BaseModel):
+    value: str = Field(..., description="Autor ou editora.", example="J. R. R. Tolkien")
+    count: int = Field(..., description="Quantidade de livros.", example=12)
+
+
+class DayCountOut(BaseModel):
+    day: str = Field(..., description="Dia do cadastro (UTC, AAAA-MM-DD).", example="2024-11-18")
+    count: int = Field(..., description="Livros cadastrados no dia que ainda existem.", example=5)
+
+
+class SuggestionOut(BaseModel):
+    text: str = Field(..., description="Valor completo, como cadastrado.", example="O Senhor dos Anéis")
+    field: Literal["title", "author", "publisher"] = Field(..., description="Campo de onde veio o valor.", example="title")
+    count: int = Field(..., description="Quantidade de livros com esse valor.", example=3)
+
+
+class CatalogStatsOut(BaseModel):
+    total: int = Field(..., description="Total de livros no catálogo.", example=1500)
+    distinct_authors: int = Field(..., description="Autores distintos.", example=320)
+    distinct_publishers: int = Field(..., description="Editoras distintas.", example=45)
+    unknown_authors: int = Field(..., description="Livros sem autor (fora de `authors`).", example=7)
+    unknown_publishers: int = Field(..., description="Livros sem editora (fora de `publishers`).", example=30)
+    authors: list[FacetCountOut] = Field(default_factory=list, description="Autores com mais livros.")
+    publishers: list[FacetCountOut] = Field(default_factory=list, description="Editoras com mais livros.")
+    added_per_day: list[DayCountOut] = Field(
+        default_factory=list, description="Cadastros por dia no período, do mais recente ao mais antigo."
+    )
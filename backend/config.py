@@ -3,9 +3,14 @@
 Os valores sao carregados via variaveis de ambiente ou arquivo .env para
 facilitar o desenvolvimento local. Em producao, injete-os a partir de um
 Key Vault/secret manager e nunca versione segredos.
+
+`Settings` e montado na primeira chamada de `get_settings()`, nao no import
+deste modulo; os modulos do backend chamam `get_settings()` onde leem cada
+valor.
 """
 
 from functools import lru_cache
+from typing import Any, Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -18,6 +23,159 @@ class Settings(BaseSettings):
         default="sqlite:///./data/books.db",
         description="URL de conexao usada pelo SQLAlchemy.",
     )
+    # Perfil de tuning aplicado a cada conexao SQLite (PRAGMAs no evento connect).
+    sqlite_journal_mode: Literal["wal", "delete", "truncate", "persist", "memory"] = Field(
+        default="wal",
+        description="WAL permite leitores concorrentes com um escritor (API + MCP no mesmo arquivo).",
+    )
+    sqlite_synchronous: Literal["off", "normal", "full", "extra"] = Field(
+        default="normal",
+        description="Com WAL, NORMAL e seguro contra corrupcao e evita fsync a cada commit.",
+    )
+    sqlite_cache_size_kib: int = Field(default=65536, ge=0, description="Cache de paginas por conexao (KiB).")
+    sqlite_mmap_size: int = Field(default=268435456, ge=0, description="Bytes do arquivo mapeados em memoria.")
+    sqlite_busy_timeout_ms: int = Field(
+        default=5000,
+        ge=0,
+        description="Espera pelo lock antes de falhar com 'database is locked'.",
+    )
+    sqlite_temp_store: Literal["default", "file", "memory"] = Field(
+        default="memory",
+        description="Onde ficam tabelas/indices temporarios (ordenacoes grandes).",
+    )
+    # Pool para bancos servidor (Postgres, MySQL...); ignorado no SQLite.
+    db_pool_size: int = Field(default=10, ge=1, description="Conexoes mantidas abertas no pool.")
+    db_max_overflow: int = Field(default=20, ge=0, description="Conexoes extras alem do pool em picos.")
+    db_pool_timeout: float = Field(default=30.0, gt=0, description="Segundos esperando uma conexao livre.")
+    db_pool_pre_ping: bool = Field(default=True, description="Testa a conexao antes de usa-la.")
+    db_pool_recycle: int = Field(default=1800, ge=-1, description="Recicla conexoes apos N segundos (-1 desliga).")
+    async_db: bool = Field(
+        default=False,
+        description="Usa engine/AsyncSession (aiosqlite, asyncpg...) nos endpoints REST.",
+    )
+    async_database_url: str | None = Field(
+        default=None,
+        description="URL async explicita; se vazia, deriva de database_url trocando o driver.",
+    )
+    lazy_init: bool = Field(
+        default=False,
+        description="Adia o init_db do start para a primeira sessao de banco (cold start mais curto).",
+    )
+    schema_version_check: bool = Field(
+        default=True,
+        description="Pula o DDL do init_db quando a versao de schema gravada no banco bate com a do modelo.",
+    )
+    read_database_url: str | None = Field(
+        default=None,
+        description="Replica usada pelas leituras (GET e tools de consulta); vazia = mesmo banco.",
+    )
+    sqlite_read_only_connections: bool = Field(
+        default=True,
+        description="Sem replica, no SQLite as leituras usam um pool separado de conexoes mode=ro.",
+    )
+    read_your_writes_seconds: float = Field(
+        default=0.0,
+        ge=0,
+        description="Apos escrever, as leituras do mesmo cliente vao ao banco principal por N segundos.",
+    )
+    search_backend: str = Field(
+        default="auto",
+        description="Backend de busca textual: auto (fts5 no SQLite), fts5 ou like.",
+    )
+    search_weight_title: float = Field(default=10.0, description="Peso bm25 do titulo na busca.")
+    search_weight_author: float = Field(default=5.0, description="Peso bm25 do autor na busca.")
+    search_weight_publisher: float = Field(default=2.0, description="Peso bm25 da editora na busca.")
+    fuzzy_min_similarity: float = Field(
+        default=0.3,
+        gt=0,
+        le=1,
+        description="Similaridade de trigramas minima para uma palavra do catalogo entrar na busca fuzzy.",
+    )
+    fuzzy_max_expansions: int = Field(default=8, ge=1, description="Palavras parecidas usadas por termo na busca fuzzy.")
+    fuzzy_refresh_seconds: float = Field(
+        default=30.0,
+        gt=0,
+        description="Intervalo minimo entre checagens de versao que reconstroem o indice fuzzy em segundo plano.",
+    )
+    suggest_memory_mb: float = Field(
+        default=64.0,
+        gt=0,
+        description="Orcamento (estimado) do indice de sugestoes em memoria; valores raros ficam de fora se estourar.",
+    )
+    suggest_warmup: bool = Field(
+        default=True,
+        description="Constroi o indice de sugestoes em segundo plano no start (sem LAZY_INIT).",
+    )
+    suggest_refresh_seconds: float = Field(
+        default=300.0,
+        gt=0,
+        description="Intervalo minimo entre checagens de versao que reconstroem o indice de sugestoes.",
+    )
+    changes_retention_days: float = Field(
+        default=30.0,
+        gt=0,
+        description="Lapides do changelog (delta sync) mais antigas que isso sao compactadas.",
+    )
+    memory_replica: bool = Field(
+        default=False,
+        description="Serve listagens, buscas e leituras por ID de uma replica do catalogo em memoria (so SQLite).",
+    )
+    memory_replica_refresh_seconds: float = Field(
+        default=1.0,
+        gt=0,
+        description="Intervalo maximo para a replica em memoria ver escritas de outros processos.",
+    )
+    cache_backend: str = Field(
+        default="memory",
+        description="Cache de leitura do book_service: memory (por processo), redis ou none.",
+    )
+    cache_url: str | None = Field(default=None, description="URL do Redis quando cache_backend=redis.")
+    cache_ttl_seconds: float = Field(default=10.0, gt=0, description="Tempo de vida das entradas do cache.")
+    cache_max_entries: int = Field(default=10000, ge=1, description="Limite de entradas do cache em memoria.")
+    fast_json_responses: bool = Field(
+        default=True,
+        description="Listagem/busca REST serializam as linhas direto (orjson/TypeAdapter), sem revalidar via BookOut.",
+    )
+    mount_mcp: bool = Field(
+        default=False,
+        description="Monta o servidor MCP dentro da API (um processo, engine/pool/cache compartilhados).",
+    )
+    mcp_mount_path: str = Field(default="/mcp", description="Prefixo do MCP quando montado na API.")
+    metrics_enabled: bool = Field(
+        default=False,
+        description="Coleta metricas (latencia, queries, pool) e expoe /metrics na API e no MCP.",
+    )
+    write_coalescing: bool = Field(
+        default=False,
+        description="Agrupa create/update/delete concorrentes num unico commit (group commit).",
+    )
+    write_coalesce_window_ms: float = Field(
+        default=2.0,
+        ge=0,
+        description="Latencia maxima adicionada a uma escrita esperando o grupo encher.",
+    )
+    write_coalesce_max_batch: int = Field(default=64, ge=1, description="Escritas por commit no group commit.")
+    bulk_batch_size: int = Field(
+        default=1000,
+        ge=1,
+        description="Linhas por INSERT em lote (um commit por lote) na carga em massa.",
+    )
+    bulk_write_max_rows: int = Field(
+        default=10000,
+        ge=1,
+        description="Limite padrao de livros alterados/removidos por um update/delete em massa por filtro.",
+    )
+    bulk_write_chunk_size: int = Field(
+        default=500,
+        ge=1,
+        le=10000,
+        description="Livros por bloco (um UPDATE/DELETE e um commit) no update/delete em massa por filtro.",
+    )
+    export_chunk_size: int = Field(
+        default=1000,
+        ge=1,
+        description="Linhas buscadas do cursor e enviadas por bloco na exportacao.",
+    )
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -28,9 +186,13 @@ class Settings(BaseSettings):
 
 @lru_cache()
 def get_settings() -> Settings:
-    """Retorna uma instancia cacheada de Settings."""
+    """Retorna uma instancia cacheada de Settings (montada na primeira chamada)."""
 
     return Settings()
 
 
-config = get_settings()
+def __getattr__(name: str) -> Any:
+    # Compatibilidade com `from backend.config import config`.
+    if name == "config":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,186 @@
+"""Changelog do catalogo para sincronizacao incremental (delta sync).
+
+No SQLite, triggers em `books` (como os do FTS5 e das estatisticas) gravam
+em `book_changes` cada INSERT, UPDATE e DELETE com um `seq` AUTOINCREMENT:
+crescente e nunca reutilizado. Como o SQLite tem um escritor por vez, a
+ordem do `seq` e a ordem de commit, entao um cliente que leu ate `seq` N
+nunca perde uma mudanca commitada depois com `seq` menor.
+
+Cada livro guarda so a ultima mudanca (o trigger apaga a anterior): o log
+tem no maximo uma linha por livro vivo mais as lapides dos removidos, e
+`changes_since` devolve cada livro uma vez, no estado atual. As lapides
+mais antigas que `CHANGES_RETENTION_DAYS` sao compactadas; o maior `seq`
+compactado vira o horizonte (`catalog_state.changes_horizon`), e clientes
+com `since` abaixo dele precisam refazer a sincronizacao completa.
+
+    python -m backend.database.changes --compact
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Sequence
+
+from sqlalchemy import Connection, Engine, Row, delete, func, select, text, update
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.database import crud
+from backend.database.models import Book, BookChange, CatalogState
+
+logger = logging.getLogger(__name__)
+
+CHANGES_TABLE = "book_changes"
+TRIGGER_PREFIX = "books_changes_"
+UPSERT, DELETE = "upsert", "delete"
+MAX_LIMIT = 1000
+# Intervalo minimo entre compactacoes automaticas disparadas pelas leituras do changelog.
+COMPACT_INTERVAL_SECONDS = 3600.0
+
+
+def uses_triggers(engine: Engine | Connection) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def _record(op: str, row: str) -> str:
+    return (
+        f"DELETE FROM {CHANGES_TABLE} WHERE book_id = {row}.id; "
+        f"INSERT INTO {CHANGES_TABLE}(book_id, op, changed_at) VALUES ({row}.id, '{op}', datetime('now'));"
+    )
+
+
+def trigger_statements() -> list[str]:
+    """DDL dos triggers que registram cada escrita em `book_changes`."""
+
+    return [
+        f"CREATE TRIGGER {TRIGGER_PREFIX}ai AFTER INSERT ON books BEGIN {_record(UPSERT, 'new')} END",
+        f"CREATE TRIGGER {TRIGGER_PREFIX}au AFTER UPDATE ON books BEGIN {_record(UPSERT, 'new')} END",
+        f"CREATE TRIGGER {TRIGGER_PREFIX}ad AFTER DELETE ON books BEGIN {_record(DELETE, 'old')} END",
+    ]
+
+
+def install(engine: Engine) -> None:
+    """Chamado pelo `init_db`: cria os triggers (so SQLite) e registra os livros ja existentes."""
+
+    if not uses_triggers(engine):
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+            {"name": f"{TRIGGER_PREFIX}ai"},
+        ).first()
+        if exists:
+            return
+        for statement in trigger_statements():
+            conn.exec_driver_sql(statement)
+        # Livros anteriores ao changelog entram como upsert: `since=0` e a sincronizacao completa.
+        rows = conn.exec_driver_sql(
+            f"INSERT INTO {CHANGES_TABLE}(book_id, op, changed_at) "
+            f"SELECT id, '{UPSERT}', datetime('now') FROM books "
+            f"WHERE id NOT IN (SELECT book_id FROM {CHANGES_TABLE}) ORDER BY id"
+        ).rowcount
+    logger.info("Triggers do changelog criados (%s livros registrados)", rows)
+
+
+def horizon(db: Session) -> int:
+    """Maior `seq` de lapide compactada (0 = nada compactado)."""
+
+    return db.execute(select(CatalogState.changes_horizon).where(CatalogState.id == 1)).scalar() or 0
+
+
+def last_seq(db: Session) -> int:
+    """`seq` da mudanca mais recente (0 com o changelog vazio)."""
+
+    return db.execute(select(func.max(BookChange.seq))).scalar() or 0
+
+
+def changes_since(db: Session, *, since: int, limit: int) -> Sequence[Row]:
+    """Mudancas com `seq` > `since`, em ordem de `seq`: (seq, op, book_id, colunas de BOOK_COLUMNS).
+
+    Nas lapides as colunas do livro vem nulas (LEFT JOIN).
+    """
+
+    stmt = (
+        select(BookChange.seq, BookChange.op, BookChange.book_id, *crud.BOOK_COLUMNS)
+        .outerjoin(Book, Book.id == BookChange.book_id)
+        .where(BookChange.seq > since)
+        .order_by(BookChange.seq)
+        .limit(limit)
+    )
+    return db.execute(stmt).all()
+
+
+def compact(engine: Engine, *, retention_days: float | None = None) -> int:
+    """Remove lapides mais antigas que a retencao e avanca o horizonte; devolve quantas saiu."""
+
+    if not uses_triggers(engine):
+        return 0
+    days = get_settings().changes_retention_days if retention_days is None else retention_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with engine.begin() as conn:
+        newest = conn.execute(
+            select(func.max(BookChange.seq)).where(BookChange.op == DELETE, BookChange.changed_at < cutoff)
+        ).scalar()
+        if newest is None:
+            return 0
+        conn.execute(
+            update(CatalogState)
+            .where(CatalogState.id == 1)
+            .values(changes_horizon=func.max(CatalogState.changes_horizon, newest))
+        )
+        removed = conn.execute(delete(BookChange).where(BookChange.op == DELETE, BookChange.seq <= newest)).rowcount
+    logger.info("Changelog compactado: %s lapides removidas, horizonte em %s", removed, newest)
+    return removed
+
+
+_compacted_at: float | None = None
+_compacting = False
+
+
+def maybe_compact() -> None:
+    """Agenda uma compactacao em segundo plano, no maximo a cada `COMPACT_INTERVAL_SECONDS`."""
+
+    global _compacted_at, _compacting
+    now = time.monotonic()
+    if _compacting or (_compacted_at is not None and now - _compacted_at < COMPACT_INTERVAL_SECONDS):
+        return
+    _compacted_at = now
+    _compacting = True
+
+    def run() -> None:
+        global _compacting
+        # Import tardio: connection importa este pacote.
+        from backend.database.connection import engine
+
+        try:
+            compact(engine)
+        except Exception:  # pragma: no cover - tenta de novo no proximo intervalo
+            logger.exception("Falha ao compactar o changelog")
+        finally:
+            _compacting = False
+
+    threading.Thread(target=run, name="changes-compact", daemon=True).start()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Changelog (delta sync) do catalogo de livros.")
+    parser.add_argument("--compact", action="store_true", help="remove lapides mais antigas que a retencao")
+    parser.add_argument("--days", type=float, default=None, help="retencao em dias (padrao: CHANGES_RETENTION_DAYS)")
+    args = parser.parse_args(argv)
+
+    from backend.database.connection import SessionLocal, engine, init_db
+
+    init_db()
+    if args.compact:
+        compact(engine, retention_days=args.days)
+    with SessionLocal() as db:
+        print(f"ultimo seq: {last_seq(db)}, horizonte: {horizon(db)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -2,37 +2,420 @@
 
 from __future__ import annotations
 
+import hashlib
+import logging
 import os
+import threading
 from contextlib import contextmanager
-from typing import Generator
+from functools import partial
+from typing import Any, AsyncGenerator, Callable, Generator, TypeVar
 
-from sqlalchemy import create_engine
+import anyio
+from sqlalchemy import Engine, create_engine, event, inspect, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import Request
 
-from backend.config import config
-from backend.database.models import Base
+from backend import metrics
+from backend.config import get_settings
+from backend.database import changes, crud, routing, search, stats
+from backend.database.models import Base, CatalogState
+from backend.database.write_coalescer import WriteCoalescer
 
-DATABASE_URL = config.database_url or os.getenv("DATABASE_URL", "sqlite:///./data/books.db")
+logger = logging.getLogger(__name__)
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-    echo=False,
-)
+DATABASE_URL = get_settings().database_url or os.getenv("DATABASE_URL", "sqlite:///./data/books.db")
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def sqlite_pragmas(*, read_only: bool = False) -> dict[str, str | int]:
+    """PRAGMAs do perfil de tuning, na ordem em que sao aplicados.
+
+    Conexoes de leitura nao mexem no `journal_mode` (e do arquivo, nao da conexao).
+    """
+
+    settings = get_settings()
+    pragmas: dict[str, str | int] = {} if read_only else {"journal_mode": settings.sqlite_journal_mode}
+    return pragmas | {
+        "synchronous": settings.sqlite_synchronous,
+        # Valor negativo = tamanho em KiB (positivo seria em paginas).
+        "cache_size": -settings.sqlite_cache_size_kib,
+        "mmap_size": settings.sqlite_mmap_size,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "temp_store": settings.sqlite_temp_store,
+    }
+
+
+def engine_options(url: str) -> dict[str, Any]:
+    """Argumentos de create_engine conforme o tipo de banco."""
+
+    if is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    settings = get_settings()
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+def _sqlite_pragmas_hook(pragmas: dict[str, str | int]) -> Callable[[Any, Any], None]:
+    def apply(dbapi_connection: Any, _connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return apply
+
+
+def _begin_before_savepoint(conn: Any, _name: str | None) -> None:
+    # O driver so emite BEGIN antes de DML; um SAVEPOINT inicial viraria a
+    # transacao externa e seu RELEASE faria commit. Abrimos a transacao antes,
+    # ja IMMEDIATE: quem usa savepoint vai escrever, e pegar o lock de escrita
+    # agora (respeitando busy_timeout) evita o SQLITE_BUSY de promover uma
+    # leitura a escrita no WAL. Leituras fora de savepoint seguem sem BEGIN.
+    if not conn.connection.driver_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def install_tuning(target: Engine, url: str, *, read_only: bool = False) -> None:
+    """Registra o hook de connect que aplica os PRAGMAs (so SQLite) e a instrumentacao."""
+
+    if is_sqlite(url):
+        event.listen(target, "connect", _sqlite_pragmas_hook(sqlite_pragmas(read_only=read_only)))
+        event.listen(target, "savepoint", _begin_before_savepoint)
+        if not read_only:
+            event.listen(target, "checkout", crud.install_previous_text)
+    if metrics.enabled():
+        metrics.instrument_engine(target)
+
+
+def log_database_settings() -> None:
+    """Registra no log os valores efetivos (lidos do banco, nao da config)."""
+
+    if is_sqlite(DATABASE_URL):
+        with engine.connect() as conn:
+            effective = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in sqlite_pragmas()
+            }
+        logger.info("SQLite tuning efetivo: %s", ", ".join(f"{k}={v}" for k, v in effective.items()))
+    else:
+        options = engine_options(DATABASE_URL)
+        logger.info("Pool do banco: %s", ", ".join(f"{k}={v}" for k, v in options.items()))
+    if READ_DATABASE_URL is None:
+        logger.info("Leituras usam o engine principal")
+    else:
+        logger.info("Leituras em engine separado: %s", make_url(READ_DATABASE_URL).render_as_string())
+
+
+def read_only_url(url: str) -> str | None:
+    """URL SQLite que abre o mesmo arquivo com `mode=ro` (None para banco em memoria)."""
+
+    parsed = make_url(url)
+    database = parsed.database or ""
+    if database in ("", ":memory:") or parsed.query.get("mode") == "memory":
+        return None
+    if not database.startswith("file:"):
+        database = f"file:{database}"
+    query = {**parsed.query, "mode": "ro", "uri": "true"}
+    return parsed.set(database=database, query=query).render_as_string(hide_password=False)
+
+
+def resolve_read_url() -> str | None:
+    """URL do engine de leitura: replica configurada, `mode=ro` no SQLite ou None (engine principal)."""
+
+    settings = get_settings()
+    if settings.read_database_url:
+        return settings.read_database_url
+    if settings.sqlite_read_only_connections and is_sqlite(DATABASE_URL):
+        return read_only_url(DATABASE_URL)
+    return None
+
+
+engine = create_engine(DATABASE_URL, echo=False, **engine_options(DATABASE_URL))
+install_tuning(engine, DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# Leituras (GET, tools de consulta) usam pool proprio e nunca fazem commit.
+READ_DATABASE_URL = resolve_read_url()
+if READ_DATABASE_URL is None:
+    read_engine = engine
+else:
+    read_engine = create_engine(READ_DATABASE_URL, echo=False, **engine_options(READ_DATABASE_URL))
+    install_tuning(read_engine, READ_DATABASE_URL, read_only=True)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, expire_on_commit=False)
+
+T = TypeVar("T")
+
+_write_coalescer: WriteCoalescer | None = None
+
+
+def get_write_coalescer() -> WriteCoalescer | None:
+    """Coalescedor de escritas (criado sob demanda) ou None se `WRITE_COALESCING=false`."""
+
+    global _write_coalescer
+    settings = get_settings()
+    if _write_coalescer is None and settings.write_coalescing:
+        _write_coalescer = WriteCoalescer(
+            SessionLocal,
+            window_ms=settings.write_coalesce_window_ms,
+            max_batch=settings.write_coalesce_max_batch,
+        )
+    return _write_coalescer
+
+
+def run_write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Executa uma escrita `fn(session, ...)` e faz commit (chamadores sync, ex.: MCP).
+
+    Com group commit ligado a escrita entra no proximo grupo; senao roda numa
+    sessao propria. Nos dois casos o objeto devolvido continua legivel apos o
+    commit (`expire_on_commit=False`).
+    """
+
+    ensure_db()
+    coalescer = get_write_coalescer()
+    if coalescer is not None:
+        result = coalescer.run(fn, *args, **kwargs)
+    else:
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            result = fn(db, *args, **kwargs)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    routing.note_write()
+    return result
+
+
+def read_sessionmaker() -> sessionmaker:
+    """Fabrica das leituras: engine de leitura ou, na janela read-your-writes, o principal."""
+
+    return SessionLocal if routing.reads_from_primary() else ReadSessionLocal
+
+
+# Driver async usado quando a URL configurada aponta para um driver sync.
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+_KNOWN_ASYNC_DRIVERS = {"aiosqlite", "asyncpg", "aiomysql", "asyncmy", "psycopg"}
+
+_async_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+_async_read_engine: AsyncEngine | None = None
+_async_read_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+
+
+def to_async_url(url: str) -> str:
+    """Troca o driver da URL pelo equivalente async (ex.: sqlite -> sqlite+aiosqlite)."""
+
+    parsed = make_url(url)
+    if parsed.get_driver_name() in _KNOWN_ASYNC_DRIVERS and "+" in parsed.drivername:
+        return url
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for '{backend}'; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Cria sob demanda o engine async (so importa o driver se o modo async for usado)."""
+
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        url = get_settings().async_database_url or to_async_url(DATABASE_URL)
+        _async_engine = create_async_engine(url, echo=False, **engine_options(url))
+        install_tuning(_async_engine.sync_engine, url)
+        _async_sessionmaker = async_sessionmaker(
+            bind=_async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Fabrica de `AsyncSession` ligada ao engine async."""
+
+    get_async_engine()
+    return _async_sessionmaker
+
+
+def get_async_read_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Fabrica de `AsyncSession` de leitura (mesmo engine async se nao houver engine de leitura)."""
+
+    global _async_read_engine, _async_read_sessionmaker
+    if READ_DATABASE_URL is None:
+        return get_async_sessionmaker()
+    if _async_read_engine is None:
+        url = to_async_url(READ_DATABASE_URL)
+        _async_read_engine = create_async_engine(url, echo=False, **engine_options(url))
+        install_tuning(_async_read_engine.sync_engine, url, read_only=True)
+        _async_read_sessionmaker = async_sessionmaker(
+            bind=_async_read_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_read_sessionmaker
+
+
+class SessionRunner:
+    """Executa funcoes sync do `book_service` sem bloquear o event loop.
+
+    Com `ASYNC_DB=true` a sessao e uma `AsyncSession` e a funcao roda via
+    `run_sync` (greenlet sobre o driver async, sem thread). No modo sync a
+    mesma funcao vai para o threadpool do anyio com uma `Session` comum.
+    Assim endpoints `async def` reaproveitam o mesmo CRUD nos dois modos.
+    """
+
+    def __init__(self, session: Session | AsyncSession) -> None:
+        self.session = session
+
+    @property
+    def is_async(self) -> bool:
+        return isinstance(self.session, AsyncSession)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Chama `fn(session, *args, **kwargs)` no modo configurado."""
+
+        if isinstance(self.session, AsyncSession):
+            return await self.session.run_sync(fn, *args, **kwargs)
+        return await anyio.to_thread.run_sync(partial(fn, self.session, *args, **kwargs))
+
+    async def write(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Como `run`, mas usa o group commit quando `WRITE_COALESCING=true`.
+
+        A escrita roda numa sessao da thread escritora e ja esta commitada
+        quando o resultado volta; a sessao da requisicao nao participa.
+        """
+
+        coalescer = get_write_coalescer()
+        if coalescer is not None:
+            return await coalescer.run_async(fn, *args, **kwargs)
+        return await self.run(fn, *args, **kwargs)
+
+
+def _add_missing_columns() -> None:
+    """Migracao aditiva minima: cria colunas novas do modelo em tabelas existentes."""
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.exec_driver_sql(ddl)
+
+
+def schema_version() -> str:
+    """Impressao digital do schema esperado: tabelas, colunas, indices, busca e triggers.
+
+    Muda sozinha quando o modelo muda, entao nao ha numero para lembrar de
+    incrementar. Fica gravada em `catalog_state.schema_version`.
+    """
+
+    backend = search.get_backend(engine)
+    parts = [engine.dialect.name, backend.name, *(statement for _name, statement in backend.ddl())]
+    for table in Base.metadata.sorted_tables:
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            default = "" if column.server_default is None else str(column.server_default.arg)
+            parts.append(f"{column.name} {column.type!r} {column.nullable} {default}")
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            parts.append(f"index {index.name} {[column.name for column in index.columns]} {index.unique}")
+    if stats.uses_triggers(engine):
+        parts.extend(stats.trigger_statements())
+    if changes.uses_triggers(engine):
+        parts.extend(changes.trigger_statements())
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _stored_schema_version() -> str | None:
+    try:
+        with engine.connect() as conn:
+            return conn.exec_driver_sql("SELECT schema_version FROM catalog_state WHERE id = 1").scalar()
+    except DBAPIError:
+        # Banco novo ou anterior a coluna: segue pelo caminho completo.
+        return None
+
+
+_db_ready = False
+_db_lock = threading.Lock()
+
 
 def init_db() -> None:
-    """Cria a pasta data/ e o schema caso nao existam."""
+    """Cria a pasta data/, o schema, o indice de busca, as estatisticas e o changelog caso nao existam.
 
+    Se a versao de schema gravada no banco bate com `schema_version()`, nada
+    disso precisa rodar: uma unica consulta substitui a reflexao e o DDL.
+    """
+
+    global _db_ready
     os.makedirs("data", exist_ok=True)
+    version = schema_version()
+    if get_settings().schema_version_check and _stored_schema_version() == version:
+        logger.info("Schema em dia (versao %s); DDL ignorado", version)
+        log_database_settings()
+        _db_ready = True
+        return
+
+    _add_missing_columns()
     Base.metadata.create_all(bind=engine)
+    with SessionLocal.begin() as db:
+        if db.get(CatalogState, 1) is None:
+            db.add(CatalogState(id=1, version=0))
+    log_database_settings()
+    # create_all ignora tabelas existentes; garante indices novos em bancos antigos.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    search.install(engine)
+    stats.install(engine)
+    changes.install(engine)
+    # Gravada por ultimo: um start interrompido no meio refaz tudo no proximo.
+    with SessionLocal.begin() as db:
+        db.get(CatalogState, 1).schema_version = version
+    logger.info("Schema atualizado (versao %s)", version)
+    _db_ready = True
+
+
+def ensure_db() -> None:
+    """Roda o `init_db` uma vez por processo, se o start ainda nao rodou (`LAZY_INIT=true`)."""
+
+    if _db_ready:
+        return
+    with _db_lock:
+        if not _db_ready:
+            init_db()
+
+
+async def ensure_db_async() -> None:
+    """`ensure_db` para dependencias async: o DDL roda no threadpool, fora do event loop."""
+
+    if not _db_ready:
+        await anyio.to_thread.run_sync(ensure_db)
 
 
 @contextmanager
 def get_db() -> Generator[Session, None, None]:
     """Gerenciador usado fora do FastAPI (ex.: MCP)."""
 
+    ensure_db()
     db = SessionLocal()
     try:
         yield db
@@ -42,11 +425,25 @@ def get_db() -> Generator[Session, None, None]:
         raise
     finally:
         db.close()
+    routing.note_write()
+
+
+@contextmanager
+def get_read_db() -> Generator[Session, None, None]:
+    """Sessao so de leitura usada fora do FastAPI (tools de consulta do MCP); sem commit."""
+
+    ensure_db()
+    db = read_sessionmaker()()
+    try:
+        yield db
+    finally:
+        db.close()
 
 
 def get_db_dependency() -> Generator[Session, None, None]:
     """Gerador para ser usado como dependencia do FastAPI."""
 
+    ensure_db()
     db = SessionLocal()
     try:
         yield db
@@ -56,3 +453,86 @@ def get_db_dependency() -> Generator[Session, None, None]:
         raise
     finally:
         db.close()
+
+
+CLIENT_ID_HEADER = "X-Client-Id"
+
+
+def request_client(request: Request) -> str | None:
+    """Chave do cliente HTTP para o read-your-writes: `X-Client-Id` ou o IP."""
+
+    client_id = request.headers.get(CLIENT_ID_HEADER)
+    if client_id:
+        return f"http:{client_id}"
+    return f"http:{request.client.host}" if request.client else None
+
+
+async def get_session_runner(request: Request) -> AsyncGenerator[SessionRunner, None]:
+    """Dependencia FastAPI para endpoints `async def` que escrevem (sync ou async conforme config)."""
+
+    await ensure_db_async()
+    if get_settings().async_db:
+        async with get_async_sessionmaker()() as session:
+            try:
+                yield SessionRunner(session)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        routing.note_write(request_client(request))
+        return
+
+    db = SessionLocal()
+    try:
+        yield SessionRunner(db)
+        await anyio.to_thread.run_sync(db.commit)
+    except Exception:
+        await anyio.to_thread.run_sync(db.rollback)
+        raise
+    finally:
+        await anyio.to_thread.run_sync(db.close)
+    routing.note_write(request_client(request))
+
+
+async def get_read_session_runner(request: Request) -> AsyncGenerator[SessionRunner, None]:
+    """Dependencia dos endpoints de leitura: engine de leitura, sem commit.
+
+    Dentro da janela read-your-writes do cliente, usa o engine principal.
+    """
+
+    await ensure_db_async()
+    primary = routing.reads_from_primary(request_client(request))
+    if get_settings().async_db:
+        factory = get_async_sessionmaker() if primary else get_async_read_sessionmaker()
+        async with factory() as session:
+            yield SessionRunner(session)
+        return
+
+    db = (SessionLocal if primary else ReadSessionLocal)()
+    try:
+        yield SessionRunner(db)
+    finally:
+        await anyio.to_thread.run_sync(db.close)
+
+
+def stop_write_coalescer() -> None:
+    """Drena a fila de escritas pendentes e encerra a thread escritora."""
+
+    global _write_coalescer
+    if _write_coalescer is not None:
+        _write_coalescer.stop()
+        _write_coalescer = None
+
+
+async def dispose_async_engine() -> None:
+    """Fecha o pool async no shutdown do app."""
+
+    global _async_engine, _async_sessionmaker, _async_read_engine, _async_read_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+    if _async_read_engine is not None:
+        await _async_read_engine.dispose()
+        _async_read_engine = None
+        _async_read_sessionmaker = None
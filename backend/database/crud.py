@@ -2,12 +2,24 @@
 
 from __future__ import annotations
 
-from typing import Sequence
+from datetime import datetime
+from typing import Any, Iterator, Sequence
 
-from sqlalchemy import or_, select
+from sqlalchemy import ColumnElement, Row, and_, column, delete, func, insert, or_, select, table, tuple_, update
 from sqlalchemy.orm import Session
 
-from backend.database.models import Book
+from backend.database.models import Book, CatalogState
+from backend.serialization import BOOK_FIELDS
+
+# Colunas lidas pelas consultas de listagem/busca, na ordem de BOOK_FIELDS.
+BOOK_COLUMNS = tuple(getattr(Book, name) for name in BOOK_FIELDS)
+
+# SQLite: o RETURNING so enxerga a linha nova. Um trigger TEMP (por conexao)
+# copia titulo/autor/editora de antes do UPDATE numa tabela TEMP de uma linha,
+# lida por subconsulta no proprio RETURNING: o UPDATE continua num statement.
+PREVIOUS_TEXT_TABLE = "books_previous_text"
+_PREVIOUS_TEXT_KEY = "books_previous_text"
+_previous_text = table(PREVIOUS_TEXT_TABLE, column("id"), column("title"), column("author"), column("publisher"))
 
 
 def create_book(
@@ -27,11 +39,104 @@ def create_book(
     return book
 
 
-def list_books(db: Session, *, limit: int = 100, offset: int = 0) -> Sequence[Book]:
-    """Retorna livros ordenados por created_at desc."""
+def supports_returning(db: Session) -> bool:
+    """Se o banco aceita INSERT/UPDATE/DELETE ... RETURNING (SQLite >= 3.35, Postgres...)."""
+
+    dialect = db.get_bind().dialect
+    return dialect.insert_returning and dialect.update_returning and dialect.delete_returning
+
+
+def install_previous_text(dbapi_connection: Any, connection_record: Any, _proxy: Any = None) -> None:
+    """Hook de checkout do engine de escrita (so SQLite): cria a tabela e o trigger TEMP uma vez por conexao.
+
+    No checkout nao ha transacao aberta, entao o DDL nao e desfeito por um
+    rollback posterior.
+    """
+
+    if connection_record.info.get(_PREVIOUS_TEXT_KEY):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {PREVIOUS_TEXT_TABLE}"
+            "(id INTEGER PRIMARY KEY, title TEXT, author TEXT, publisher TEXT)"
+        )
+        cursor.execute(
+            f"CREATE TEMP TRIGGER IF NOT EXISTS {PREVIOUS_TEXT_TABLE}_bu "
+            "BEFORE UPDATE OF title, author, publisher ON main.books BEGIN "
+            f"DELETE FROM {PREVIOUS_TEXT_TABLE}; "
+            f"INSERT INTO {PREVIOUS_TEXT_TABLE} VALUES (old.id, old.title, old.author, old.publisher); END"
+        )
+    except Exception:  # `books` ainda nao existe (antes do init_db): tenta no proximo checkout
+        return
+    finally:
+        cursor.close()
+    connection_record.info[_PREVIOUS_TEXT_KEY] = True
+
+
+def returns_previous_text(db: Session) -> bool:
+    """Se `update_book_returning(previous_text=True)` funciona na conexao da sessao."""
+
+    return bool(db.connection().info.get(_PREVIOUS_TEXT_KEY))
+
+
+def insert_book_returning(
+    db: Session,
+    *,
+    title: str,
+    author: str | None = None,
+    publisher: str | None = None,
+    purchase_link: str | None = None,
+) -> Row:
+    """INSERT ... RETURNING: a linha criada (colunas de BOOK_COLUMNS) numa unica ida ao banco."""
+
+    stmt = (
+        insert(Book)
+        .values(title=title.strip(), author=author, publisher=publisher, purchase_link=purchase_link)
+        .returning(*BOOK_COLUMNS)
+    )
+    return db.execute(stmt).one()
+
+
+def insert_books(db: Session, rows: list[dict[str, str | None]]) -> None:
+    """INSERT em lote (executemany/multi-row) sem hidratar objetos ORM."""
+
+    if rows:
+        db.execute(insert(Book), rows)
 
-    stmt = select(Book).order_by(Book.created_at.desc()).limit(limit).offset(offset)
-    return db.execute(stmt).scalars().all()
+
+def list_books(db: Session, *, limit: int = 100, offset: int = 0) -> Sequence[Row]:
+    """Retorna linhas (colunas de BOOK_COLUMNS) ordenadas por created_at desc."""
+
+    stmt = select(*BOOK_COLUMNS).order_by(Book.created_at.desc(), Book.id.desc()).limit(limit).offset(offset)
+    return db.execute(stmt).all()
+
+
+def list_books_after(db: Session, *, limit: int = 100, after: tuple[datetime, int] | None = None) -> Sequence[Row]:
+    """Pagina por chave (created_at, id) desc usando o indice composto."""
+
+    stmt = select(*BOOK_COLUMNS).order_by(Book.created_at.desc(), Book.id.desc()).limit(limit)
+    if after is not None:
+        stmt = stmt.where(tuple_(Book.created_at, Book.id) < tuple_(*after))
+    return db.execute(stmt).all()
+
+
+def iter_book_rows(db: Session, *, chunk_size: int = 1000) -> Iterator[Sequence[Row]]:
+    """Percorre a tabela inteira por id, em blocos de tuplas (sem objetos ORM).
+
+    Usa `stream_results` + `yield_per`: o driver entrega as linhas aos poucos
+    (cursor no servidor quando o banco suporta), entao a memoria fica limitada
+    a um bloco, qualquer que seja o tamanho do catalogo.
+    """
+
+    stmt = select(
+        Book.id, Book.title, Book.author, Book.publisher, Book.purchase_link, Book.created_at
+    ).order_by(Book.id)
+    result = db.execute(stmt, execution_options={"stream_results": True, "yield_per": chunk_size})
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
 
 
 def get_book(db: Session, book_id: int) -> Book | None:
@@ -71,21 +176,189 @@ def delete_book(db: Session, book: Book) -> None:
     db.delete(book)
 
 
-def search_books(db: Session, *, query: str, limit: int = 100, offset: int = 0) -> Sequence[Book]:
-    """Busca case-insensitive em titulo, autor e editora."""
+def differs_from(values: dict[str, str]) -> ColumnElement[bool]:
+    """Algum dos campos e diferente de `values` (NULL conta como valor: IS NOT / IS DISTINCT FROM)."""
+
+    return or_(*(getattr(Book, name).is_distinct_from(value) for name, value in values.items()))
+
+
+def update_book_returning(
+    db: Session,
+    book_id: int,
+    values: dict[str, str],
+    *,
+    expected_version: int | None = None,
+    previous_text: bool = False,
+) -> Row | None:
+    """UPDATE ... RETURNING pela PK, incrementando `version` como o ORM faria.
+
+    So altera a linha se algum valor mudou (um PATCH repetido nao gera versao
+    nova). Devolve None quando nada casou: livro ausente, outra versao ou
+    mesmos valores; quem chama distingue os casos. Com `previous_text` (ver
+    `returns_previous_text`), a linha traz depois de BOOK_COLUMNS o titulo,
+    autor e editora de antes do UPDATE.
+    """
+
+    returning = list(BOOK_COLUMNS)
+    if previous_text:
+        returning += [
+            select(getattr(_previous_text.c, name)).where(_previous_text.c.id == Book.id).scalar_subquery()
+            for name in ("title", "author", "publisher")
+        ]
+    stmt = (
+        update(Book)
+        .where(Book.id == book_id, differs_from(values))
+        .values(**values, version=Book.version + 1)
+        .returning(*returning)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(Book.version == expected_version)
+    return db.execute(stmt).one_or_none()
+
+
+def delete_book_returning(db: Session, book_id: int, *, expected_version: int | None = None) -> Row | None:
+    """DELETE ... RETURNING (id, title, author, publisher); None se nenhuma linha casou."""
+
+    stmt = delete(Book).where(Book.id == book_id).returning(Book.id, Book.title, Book.author, Book.publisher)
+    if expected_version is not None:
+        stmt = stmt.where(Book.version == expected_version)
+    return db.execute(stmt).one_or_none()
+
+
+def ilike_filter(query: str) -> ColumnElement[bool]:
+    """Substring case-insensitive em titulo, autor ou editora (filtro do backend `like`)."""
 
     pattern = f"%{query.lower()}%"
+    return or_(
+        Book.title.ilike(pattern),
+        Book.author.ilike(pattern),
+        Book.publisher.ilike(pattern),
+    )
+
+
+def search_books(db: Session, *, query: str, limit: int = 100, offset: int = 0) -> Sequence[Row]:
+    """Busca case-insensitive em titulo, autor e editora (linhas de BOOK_COLUMNS)."""
+
     stmt = (
-        select(Book)
-        .where(
-            or_(
-                Book.title.ilike(pattern),
-                Book.author.ilike(pattern),
-                Book.publisher.ilike(pattern),
-            )
-        )
-        .order_by(Book.created_at.desc())
+        select(*BOOK_COLUMNS)
+        .where(ilike_filter(query))
+        .order_by(Book.created_at.desc(), Book.id.desc())
         .limit(limit)
         .offset(offset)
     )
-    return db.execute(stmt).scalars().all()
+    return db.execute(stmt).all()
+
+
+def search_books_terms(
+    db: Session, *, groups: Sequence[Sequence[str]], limit: int = 100, require_all: bool = True
+) -> Sequence[Row]:
+    """ILIKE por grupos de termos alternativos: AND entre grupos (ou OR), OR dentro de cada um."""
+
+    filters = [or_(*(ilike_filter(term) for term in group)) for group in groups if group]
+    stmt = (
+        select(*BOOK_COLUMNS)
+        .where((and_ if require_all else or_)(*filters))
+        .order_by(Book.created_at.desc(), Book.id.desc())
+        .limit(limit)
+    )
+    return db.execute(stmt).all()
+
+
+def search_books_after(
+    db: Session,
+    *,
+    query: str,
+    limit: int = 100,
+    after: tuple[datetime, int] | None = None,
+) -> Sequence[Row]:
+    """Mesma busca do `search_books`, paginada por chave (created_at, id)."""
+
+    stmt = (
+        select(*BOOK_COLUMNS)
+        .where(ilike_filter(query))
+        .order_by(Book.created_at.desc(), Book.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Book.created_at, Book.id) < tuple_(*after))
+    return db.execute(stmt).all()
+
+
+def field_filters(
+    *, title: str | None = None, author: str | None = None, publisher: str | None = None
+) -> list[ColumnElement[bool]]:
+    """Igualdade exata nos campos informados (None = campo nao filtra)."""
+
+    fields = {"title": title, "author": author, "publisher": publisher}
+    return [getattr(Book, name) == value for name, value in fields.items() if value is not None]
+
+
+def count_books_where(db: Session, filters: Sequence[ColumnElement[bool]]) -> int:
+    """Quantos livros casam com todos os `filters`."""
+
+    return db.execute(select(func.count()).select_from(Book).where(*filters)).scalar_one()
+
+
+def books_where_after(
+    db: Session, filters: Sequence[ColumnElement[bool]], *, after_id: int = 0, limit: int = 1000
+) -> Sequence[Row]:
+    """Proximo bloco (id, title, author, publisher) que casa com `filters`, por id (keyset na PK)."""
+
+    stmt = (
+        select(Book.id, Book.title, Book.author, Book.publisher)
+        .where(*filters, Book.id > after_id)
+        .order_by(Book.id)
+        .limit(limit)
+    )
+    return db.execute(stmt).all()
+
+
+def update_books_by_ids(db: Session, book_ids: Sequence[int], values: dict[str, str]) -> None:
+    """Um UPDATE para o bloco inteiro, incrementando `version` de cada livro."""
+
+    db.execute(update(Book).where(Book.id.in_(book_ids)).values(**values, version=Book.version + 1))
+
+
+def delete_books_by_ids(db: Session, book_ids: Sequence[int]) -> None:
+    """Um DELETE para o bloco inteiro."""
+
+    db.execute(delete(Book).where(Book.id.in_(book_ids)))
+
+
+def get_books_by_ids(db: Session, book_ids: Sequence[int]) -> Sequence[Row]:
+    """Varios livros num unico `WHERE id IN (...)` (linhas de BOOK_COLUMNS, sem ordem)."""
+
+    if not book_ids:
+        return []
+    return db.execute(select(*BOOK_COLUMNS).where(Book.id.in_(book_ids))).all()
+
+
+def count_titles(db: Session) -> Iterator[Row]:
+    """(titulo, livros) de cada titulo distinto, mais repetidos primeiro (percorre o indice de titulo)."""
+
+    count = func.count()
+    yield from db.execute(select(Book.title, count).group_by(Book.title).order_by(count.desc(), Book.title))
+
+
+def get_book_row(db: Session, book_id: int) -> Row | None:
+    """Um livro pela PK como linha de BOOK_COLUMNS (sem passar pelo identity map)."""
+
+    return db.execute(select(*BOOK_COLUMNS).where(Book.id == book_id)).one_or_none()
+
+
+def get_book_version(db: Session, book_id: int) -> int | None:
+    """Le so a coluna version pela PK (sem hidratar o modelo)."""
+
+    return db.execute(select(Book.version).where(Book.id == book_id)).scalar()
+
+
+def get_catalog_version(db: Session) -> int:
+    """Versao global do catalogo (0 se a linha ainda nao existir)."""
+
+    return db.execute(select(CatalogState.version).where(CatalogState.id == 1)).scalar() or 0
+
+
+def bump_catalog_version(db: Session) -> None:
+    """Incrementa a versao global na mesma transacao da escrita."""
+
+    db.execute(update(CatalogState).where(CatalogState.id == 1).values(version=CatalogState.version + 1))
@@ -0,0 +1,258 @@
+"""Busca tolerante a erros de digitacao ("Tolkein", "Senhor dos Aneis").
+
+Em vez de indexar trigramas de cada livro, indexamos o vocabulario do
+catalogo (palavras distintas, sem acento e em minusculas), que e ordens de
+grandeza menor. Cada palavra da consulta vira um grupo de alternativas (ela
+mesma como prefixo + as palavras do vocabulario com similaridade de
+trigramas >= `FUZZY_MIN_SIMILARITY`), e o backend de busca ativo (FTS5 ou
+ILIKE) encontra os livros. Os candidatos sao reordenados pela similaridade
+entre a consulta e as palavras de cada livro.
+
+O indice vive em memoria, construido na primeira busca fuzzy a partir do
+`vocabulary()` do backend (no SQLite, a tabela `fts5vocab`, que o proprio
+FTS5 mantem). Escritas do `book_service` acrescentam as palavras novas logo
+apos o commit; escritas de outros processos sao absorvidas por uma
+reconstrucao em segundo plano quando a versao do catalogo muda (no maximo a
+cada `FUZZY_REFRESH_SECONDS`).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Any, Sequence
+
+from sqlalchemy import Row, event
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.database import crud, search
+
+logger = logging.getLogger(__name__)
+
+# Palavras menores que isso nao tem trigramas suficientes para comparar: so prefixo.
+MIN_FUZZY_LENGTH = 3
+# Palavra do livro que comeca com o termo digitado (usuario ainda digitando).
+PREFIX_SIMILARITY = 0.9
+# Candidatos buscados para reordenar (multiplo de offset + limit, com teto).
+CANDIDATE_FACTOR = 3
+MAX_CANDIDATES = 500
+_PENDING_KEY = "fuzzy_pending"
+
+
+@lru_cache(maxsize=65536)
+def trigrams(word: str) -> frozenset[str]:
+    """Trigramas com duas posicoes de borda no inicio e uma no fim (como o pg_trgm)."""
+
+    padded = f"  {word} "
+    return frozenset(padded[index : index + 3] for index in range(len(padded) - 2))
+
+
+def similarity(token: str, word: str) -> float:
+    """Jaccard dos trigramas; 1.0 para a palavra exata e 0.9 se `word` comeca com `token`."""
+
+    if word == token:
+        return 1.0
+    if word.startswith(token):
+        return PREFIX_SIMILARITY
+    left, right = trigrams(token), trigrams(word)
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared)
+
+
+class TrigramIndex:
+    """Vocabulario do catalogo com listas invertidas trigrama -> termos."""
+
+    def __init__(self, version: int) -> None:
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.terms: list[str] = []
+        self.docs: list[int] = []
+        self.forms: list[tuple[str, ...]] = []
+        self.sizes: list[int] = []
+        self.term_ids: dict[str, int] = {}
+        self.postings: dict[str, array] = {}
+        self._lock = threading.Lock()
+
+    def add(self, term: str, docs: int = 1, forms: tuple[str, ...] = ()) -> None:
+        with self._lock:
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                self.docs[term_id] += docs
+                if forms:
+                    self.forms[term_id] = tuple(sorted({*self.forms[term_id], *forms}))
+                return
+            grams = trigrams(term)
+            term_id = len(self.terms)
+            self.terms.append(term)
+            self.docs.append(docs)
+            self.forms.append(forms or (term,))
+            self.sizes.append(len(grams))
+            self.term_ids[term] = term_id
+            for gram in grams:
+                self.postings.setdefault(gram, array("I")).append(term_id)
+
+    def similar(self, token: str, *, limit: int, threshold: float) -> list[tuple[str, float]]:
+        """Termos com similaridade >= `threshold`, mais parecidos (e mais frequentes) primeiro."""
+
+        grams = trigrams(token)
+        shared: dict[int, int] = {}
+        for gram in grams:
+            for term_id in self.postings.get(gram, ()):
+                shared[term_id] = shared.get(term_id, 0) + 1
+        scored = []
+        for term_id, count in shared.items():
+            score = count / (len(grams) + self.sizes[term_id] - count)
+            if score >= threshold:
+                scored.append((score, self.docs[term_id], term_id))
+        scored.sort(reverse=True)
+        return [(self.terms[term_id], score) for score, _docs, term_id in scored[:limit]]
+
+    def forms_of(self, term: str) -> tuple[str, ...]:
+        return self.forms[self.term_ids[term]]
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+
+_index: TrigramIndex | None = None
+_build_lock = threading.Lock()
+_refreshing = False
+
+
+def _indexable(term: str) -> bool:
+    # Numeros (ISBN, edicao, ano) nao tem erro de digitacao "parecido" e inflariam o vocabulario.
+    return not term.isdigit()
+
+
+def build_index(db: Session) -> TrigramIndex:
+    started = time.perf_counter()
+    # Versao lida antes do vocabulario: escritas durante a leitura disparam o proximo refresh.
+    index = TrigramIndex(crud.get_catalog_version(db))
+    for term, docs, forms in search.get_backend(db.get_bind()).vocabulary(db):
+        if _indexable(term):
+            index.add(term, docs, forms)
+    logger.info(
+        "Indice fuzzy: %s termos, %s trigramas em %.0f ms",
+        len(index),
+        len(index.postings),
+        (time.perf_counter() - started) * 1000,
+    )
+    return index
+
+
+def _refresh_in_background() -> None:
+    global _refreshing
+
+    def run() -> None:
+        global _index, _refreshing
+        # Import tardio: connection importa este pacote.
+        from backend.database.connection import read_sessionmaker
+
+        try:
+            with read_sessionmaker()() as db:
+                _index = build_index(db)
+        except Exception:  # pragma: no cover - o indice antigo continua servindo
+            logger.exception("Falha ao reconstruir o indice fuzzy")
+        finally:
+            _refreshing = False
+
+    _refreshing = True
+    threading.Thread(target=run, name="fuzzy-index-refresh", daemon=True).start()
+
+
+def get_index(db: Session) -> TrigramIndex:
+    """Indice atual; constroi na primeira chamada e agenda refresh se o catalogo mudou."""
+
+    global _index
+    index = _index
+    if index is None:
+        with _build_lock:
+            if _index is None:
+                _index = build_index(db)
+            return _index
+    now = time.monotonic()
+    if not _refreshing and now - index.checked_at >= get_settings().fuzzy_refresh_seconds:
+        index.checked_at = now
+        if crud.get_catalog_version(db) != index.version:
+            _refresh_in_background()
+    return index
+
+
+def note_book(db: Session, *values: str | None) -> None:
+    """Registra as palavras de um livro criado/alterado; entram no indice (se ja construido) apos o commit."""
+
+    if _index is None:
+        return
+    db.info.setdefault(_PENDING_KEY, []).append(values)
+
+
+def _add_words(index: TrigramIndex, values: Sequence[str | None]) -> None:
+    words = {word.lower() for value in values if value for word in search.tokenize(value)}
+    for word in words:
+        term = search.fold(word)
+        if not _indexable(term):
+            continue
+        if term not in index.term_ids:
+            index.add(term, 1, (word,))
+        elif word not in index.forms_of(term):
+            # Grafia nova de um termo conhecido (usada pelo backend ILIKE).
+            index.add(term, 0, (word,))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        # RELEASE de um SAVEPOINT tambem dispara after_commit; espera o commit de fora.
+        return
+    pending = session.info.pop(_PENDING_KEY, None)
+    index = _index
+    if pending and index is not None:
+        for values in pending:
+            _add_words(index, values)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction: Any) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def _score(tokens: list[str], row: Row) -> float:
+    values = (row.title, row.author, row.publisher)
+    words = {search.fold(word) for value in values if value for word in search.tokenize(value)}
+    if not words:
+        return 0.0
+    return sum(max(similarity(token, word) for word in words) for token in tokens) / len(tokens)
+
+
+def search_books(db: Session, *, query: str, limit: int = 100, offset: int = 0) -> Sequence[Row]:
+    """Livros parecidos com `query` (linhas de `crud.BOOK_COLUMNS`), mais similares primeiro."""
+
+    tokens = list(dict.fromkeys(search.fold(token) for token in search.tokenize(query)))
+    if not tokens:
+        return []
+    index = get_index(db)
+    settings = get_settings()
+    groups = []
+    for token in tokens:
+        group = {(token, True)}
+        if len(token) >= MIN_FUZZY_LENGTH:
+            for term, _similarity in index.similar(
+                token, limit=settings.fuzzy_max_expansions, threshold=settings.fuzzy_min_similarity
+            ):
+                group.update((form, False) for form in index.forms_of(term))
+        groups.append(sorted(group))
+
+    backend = search.get_backend(db.get_bind())
+    window = min(max((offset + limit) * CANDIDATE_FACTOR, 50), MAX_CANDIDATES)
+    rows = backend.search_terms(db, groups=groups, limit=window)
+    if not rows and len(groups) > 1:
+        # Nenhum livro tem todas as palavras: aceita os que tem alguma.
+        rows = backend.search_terms(db, groups=groups, limit=window, require_all=False)
+    # sort estavel: empates mantem a ordem de relevancia do backend.
+    ranked = sorted(rows, key=lambda row: _score(tokens, row), reverse=True)
+    return ranked[offset : offset + limit]
@@ -0,0 +1,775 @@
+"""Replica do catalogo em memoria para as leituras quentes (opt-in: `MEMORY_REPLICA=true`).
+
+Com a replica ligada, `list_books`, `get_book`, `get_books`, `search_books`
+(e as versoes por cursor) e as versoes usadas nos ETags respondem de uma
+copia do catalogo no proprio processo: sem sessao de banco, sem cache de
+leitura e sem objetos ORM.
+
+O layout e colunar. As linhas ficam na ordem das listagens, (created_at, id),
+em arrays paralelos do modulo `array` (id, datas em microssegundos, versao);
+titulo e link ficam em listas. Autores e editoras sao internados numa tabela
+de strings e cada linha guarda so o indice (4 bytes). `slot_of[id]` leva do
+ID a posicao (os IDs do SQLite sao densos). Remocoes viram lapides e sao
+compactadas quando passam de 1/`COMPACT_FRACTION` das linhas.
+
+A busca reproduz a do FTS5 sobre um indice invertido (termo -> array de
+`id << 24 | frequencias por coluna`): mesma tokenizacao (sem acento,
+minusculas), AND de prefixos e bm25 com os pesos de `SEARCH_WEIGHT_*`.
+Consultas cujos prefixos cobrem mais de `MAX_SEARCH_POSTINGS` entradas (ex.:
+"a") voltam ao banco, onde o FTS5 faz o mesmo em C. Com o backend `like`,
+toda busca vai ao banco. O ranking completo de cada consulta fica guardado
+ate a proxima escrita (o papel do cache de leitura, que a replica dispensa):
+paginas seguintes, por offset ou cursor, sao um recorte dele.
+
+A sincronizacao usa o changelog (`backend/database/changes.py`), por isso a
+replica so existe no SQLite. Ela guarda o ultimo `seq` aplicado e a versao do
+catalogo correspondente. Escritas do `book_service` marcam a replica como
+atrasada no commit, e a leitura seguinte aplica as mudancas antes de
+responder (read-your-writes no processo). Escritas de outros processos
+entram na checagem de versao em segundo plano, no maximo a cada
+`MEMORY_REPLICA_REFRESH_SECONDS`. Se o changelog ja foi compactado alem do
+`seq` da replica, ela e reconstruida.
+
+    python -m backend.database.memory_replica   # constroi e mostra o consumo de memoria
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import math
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Sequence
+
+from sqlalchemy import Row, event, select
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.database import changes, crud, search
+from backend.database.models import Book
+from backend.database.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Mesmo cursor do banco: as paginas da listagem podem alternar entre replica e banco.
+LIST_CURSOR_KIND = "list"
+SEARCH_CURSOR_KIND = "search:memory"
+# Entradas de indice invertido percorridas por consulta antes de devolver a busca ao banco.
+MAX_SEARCH_POSTINGS = 50_000
+# Rankings completos guardados por consulta; qualquer escrita na replica os descarta.
+SEARCH_CACHE_ENTRIES = 256
+# Mudancas lidas do changelog por consulta durante a sincronizacao.
+SYNC_BATCH = 5000
+COMPACT_MIN_DEAD = 1024
+COMPACT_FRACTION = 8
+# Constantes do bm25 do FTS5.
+BM25_K1 = 1.2
+BM25_B = 0.75
+NO_SLOT = 0xFFFFFFFF
+NULL_TIME = -(1 << 63)
+EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# Postings: id nos bits altos, frequencia no titulo, autor e editora (8 bits cada) nos baixos.
+_ID_SHIFT = 24
+_TF_SHIFTS = (16, 8, 0)
+_TF_MAX = 255
+_MAX_CHAR = "\U0010ffff"
+_PENDING_KEY = "memory_replica_pending"
+# Tokens do unicode61 do FTS5: letras e digitos; ao contrario de `search.tokenize`, "_" separa.
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def _micros(value: datetime | None) -> int:
+    return NULL_TIME if value is None else (value - EPOCH) // _MICROSECOND
+
+
+def _datetime(micros: int) -> datetime | None:
+    return None if micros == NULL_TIME else EPOCH + timedelta(microseconds=micros)
+
+
+def term_counts(title: str | None, author: str | None, publisher: str | None) -> tuple[dict[str, int], int]:
+    """Termos do livro como o FTS5 os indexa: {termo: frequencias empacotadas} e total de tokens."""
+
+    counts: dict[str, int] = {}
+    total = 0
+    for shift, value in zip(_TF_SHIFTS, (title, author, publisher)):
+        if not value:
+            continue
+        for token in _TOKEN_RE.findall(search.fold(value)):
+            current = counts.get(token, 0)
+            if (current >> shift) & _TF_MAX < _TF_MAX:
+                counts[token] = current + (1 << shift)
+            total += 1
+    return counts, total
+
+
+def _grow(values: array, size: int, fill: int) -> None:
+    if size > len(values):
+        values.extend(array(values.typecode, [fill]) * max(size - len(values), len(values) // 4))
+
+
+class CatalogReplica:
+    """Livros em arrays paralelos ordenados por (created_at, id), com indice invertido para a busca."""
+
+    def __init__(self, *, version: int, seq: int, searchable: bool) -> None:
+        self.version = version
+        self.seq = seq
+        self.searchable = searchable
+        # Geracao de escritas locais ja aplicada (ver `_written`).
+        self.synced = 0
+        self.checked_at = time.monotonic()
+        self.ids = array("q")
+        self.created = array("q")
+        self.updated = array("q")
+        self.versions = array("I")
+        self.titles: list[str] = []
+        self.authors = array("I")
+        self.publishers = array("I")
+        self.links: list[str | None] = []
+        self.alive = bytearray()
+        self.dead = array("I")
+        self.slot_of = array("I")
+        self.strings: list[str | None] = [None]
+        self.string_ids: dict[str, int] = {}
+        self.postings: dict[str, array] = {}
+        self.vocab: list[str] = []
+        self.doc_lengths = array("H")
+        self.total_tokens = 0
+        self._loading = False
+        self._rankings: dict[str, list[tuple] | None] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.ids) - len(self.dead)
+
+    # Escrita -----------------------------------------------------------------
+
+    def _intern(self, value: str | None) -> int:
+        if value is None:
+            return 0
+        index = self.string_ids.get(value)
+        if index is None:
+            index = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def _slot(self, book_id: int) -> int | None:
+        if book_id >= len(self.slot_of):
+            return None
+        slot = self.slot_of[book_id]
+        return None if slot == NO_SLOT else slot
+
+    def _position(self, created: int, book_id: int) -> int:
+        """Primeira posicao com chave >= (created, book_id)."""
+
+        position = bisect_left(self.created, created)
+        while position < len(self.ids) and self.created[position] == created and self.ids[position] < book_id:
+            position += 1
+        return position
+
+    def upsert(self, row: Sequence[Any]) -> None:
+        """Insere ou substitui um livro (tupla na ordem de `BOOK_FIELDS`)."""
+
+        book_id, title, author, publisher, purchase_link, created_at, updated_at, version = row
+        self._rankings.clear()
+        created = _micros(created_at)
+        slot = self._slot(book_id)
+        if slot is not None and self.created[slot] != created:
+            self.delete(book_id)
+            slot = None
+        if slot is not None:
+            before = (self.titles[slot], self.strings[self.authors[slot]], self.strings[self.publishers[slot]])
+            if before != (title, author, publisher):
+                self._unindex(book_id, *before)
+                self._index(book_id, title, author, publisher)
+        else:
+            slot = len(self.ids)
+            if slot and (self.created[-1], self.ids[-1]) > (created, book_id):
+                slot = self._position(created, book_id)
+                self._open_slot(slot)
+                self.ids[slot] = book_id
+                self.created[slot] = created
+            else:
+                self.ids.append(book_id)
+                self.created.append(created)
+                self.updated.append(NULL_TIME)
+                self.versions.append(0)
+                self.titles.append("")
+                self.authors.append(0)
+                self.publishers.append(0)
+                self.links.append(None)
+                self.alive.append(1)
+            _grow(self.slot_of, book_id + 1, NO_SLOT)
+            self.slot_of[book_id] = slot
+            self._index(book_id, title, author, publisher)
+        self.updated[slot] = _micros(updated_at)
+        self.versions[slot] = version
+        self.titles[slot] = title
+        self.authors[slot] = self._intern(author)
+        self.publishers[slot] = self._intern(publisher)
+        self.links[slot] = purchase_link
+
+    def _open_slot(self, position: int) -> None:
+        """Abre espaco no meio (created_at fora de ordem, raro): desloca as linhas seguintes."""
+
+        for values, empty in (
+            (self.ids, 0),
+            (self.created, 0),
+            (self.updated, NULL_TIME),
+            (self.versions, 0),
+            (self.titles, ""),
+            (self.authors, 0),
+            (self.publishers, 0),
+            (self.links, None),
+        ):
+            values.insert(position, empty)
+        self.alive.insert(position, 1)
+        for slot in range(position + 1, len(self.ids)):
+            if self.alive[slot]:
+                self.slot_of[self.ids[slot]] = slot
+        for index in range(bisect_left(self.dead, position), len(self.dead)):
+            self.dead[index] += 1
+
+    def delete(self, book_id: int) -> None:
+        slot = self._slot(book_id)
+        if slot is None:
+            return
+        self._rankings.clear()
+        self._unindex(book_id, self.titles[slot], self.strings[self.authors[slot]], self.strings[self.publishers[slot]])
+        self.alive[slot] = 0
+        insort(self.dead, slot)
+        self.slot_of[book_id] = NO_SLOT
+        self.titles[slot] = ""
+        self.links[slot] = None
+        if len(self.dead) > max(COMPACT_MIN_DEAD, len(self.ids) // COMPACT_FRACTION):
+            self.compact()
+
+    def compact(self) -> None:
+        """Remove as lapides e a tabela de strings que ninguem mais usa (O(linhas))."""
+
+        self._rankings.clear()
+        keep = [slot for slot in range(len(self.ids)) if self.alive[slot]]
+        authors = [self.strings[self.authors[slot]] for slot in keep]
+        publishers = [self.strings[self.publishers[slot]] for slot in keep]
+        self.ids = array("q", [self.ids[slot] for slot in keep])
+        self.created = array("q", [self.created[slot] for slot in keep])
+        self.updated = array("q", [self.updated[slot] for slot in keep])
+        self.versions = array("I", [self.versions[slot] for slot in keep])
+        self.titles = [self.titles[slot] for slot in keep]
+        self.links = [self.links[slot] for slot in keep]
+        self.strings = [None]
+        self.string_ids = {}
+        self.authors = array("I", map(self._intern, authors))
+        self.publishers = array("I", map(self._intern, publishers))
+        self.alive = bytearray(b"\x01") * len(keep)
+        self.dead = array("I")
+        self.slot_of = array("I", [NO_SLOT]) * len(self.slot_of)
+        for slot, book_id in enumerate(self.ids):
+            self.slot_of[book_id] = slot
+
+    def _index(self, book_id: int, title: str | None, author: str | None, publisher: str | None) -> None:
+        counts, total = term_counts(title, author, publisher)
+        for term, frequencies in counts.items():
+            packed = book_id << _ID_SHIFT | frequencies
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = array("Q")
+                if not self._loading:
+                    insort(self.vocab, term)
+            if self._loading or not postings or postings[-1] < packed:
+                postings.append(packed)
+            else:
+                insort(postings, packed)
+        _grow(self.doc_lengths, book_id + 1, 0)
+        self.doc_lengths[book_id] = min(total, 0xFFFF)
+        self.total_tokens += self.doc_lengths[book_id]
+
+    def load(self, rows: Iterable[Sequence[Any]]) -> None:
+        """Carga inicial: vocabulario e postings sao ordenados uma vez no fim, nao a cada livro."""
+
+        with self._lock:
+            self._loading = True
+            try:
+                for row in rows:
+                    self.upsert(row)
+            finally:
+                self._loading = False
+                for term, postings in self.postings.items():
+                    if len(postings) > 1:
+                        self.postings[term] = array("Q", sorted(postings))
+                self.vocab = sorted(self.postings)
+
+    def _unindex(self, book_id: int, title: str | None, author: str | None, publisher: str | None) -> None:
+        counts, _total = term_counts(title, author, publisher)
+        for term in counts:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            index = bisect_left(postings, book_id << _ID_SHIFT)
+            if index < len(postings) and postings[index] >> _ID_SHIFT == book_id:
+                del postings[index]
+            if not postings:
+                del self.postings[term]
+                del self.vocab[bisect_left(self.vocab, term)]
+        self.total_tokens -= self.doc_lengths[book_id]
+        self.doc_lengths[book_id] = 0
+
+    def apply(self, rows: Sequence[Row]) -> None:
+        """Aplica linhas de `changes.changes_since` (seq, op, book_id, colunas do livro)."""
+
+        with self._lock:
+            for row in rows:
+                if row.op == changes.UPSERT:
+                    self.upsert(row[3:])
+                else:
+                    self.delete(row.book_id)
+            if rows:
+                self.seq = rows[-1].seq
+
+    # Leitura -----------------------------------------------------------------
+
+    def _row(self, slot: int) -> dict[str, Any]:
+        return {
+            "id": self.ids[slot],
+            "title": self.titles[slot],
+            "author": self.strings[self.authors[slot]],
+            "publisher": self.strings[self.publishers[slot]],
+            "purchase_link": self.links[slot],
+            "created_at": _datetime(self.created[slot]),
+            "updated_at": _datetime(self.updated[slot]),
+            "version": self.versions[slot],
+        }
+
+    def _collect(self, start: int, limit: int) -> list[int]:
+        """Ate `limit` posicoes vivas a partir de `start`, descendo (mais recentes primeiro)."""
+
+        slots = []
+        slot = start
+        while slot >= 0 and len(slots) < limit:
+            if self.alive[slot]:
+                slots.append(slot)
+            slot -= 1
+        return slots
+
+    def _slot_from_end(self, offset: int) -> int:
+        """Posicao da linha viva numero `offset` contando do fim (lapides via bisect)."""
+
+        total = len(self.ids)
+        if not self.dead:
+            return total - 1 - offset
+        # Maior posicao com pelo menos offset + 1 linhas vivas dali ate o fim.
+        low, high = 0, total - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            live_after = (total - middle) - (len(self.dead) - bisect_left(self.dead, middle))
+            if live_after >= offset + 1:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def get(self, book_id: int) -> dict[str, Any] | None:
+        with self._lock:
+            slot = self._slot(book_id)
+            return None if slot is None else self._row(slot)
+
+    def book_version(self, book_id: int) -> int | None:
+        with self._lock:
+            slot = self._slot(book_id)
+            return None if slot is None else self.versions[slot]
+
+    def get_many(self, book_ids: Iterable[int]) -> list[dict[str, Any]]:
+        with self._lock:
+            slots = (self._slot(book_id) for book_id in book_ids)
+            return [self._row(slot) for slot in slots if slot is not None]
+
+    def list_books(self, *, limit: int, offset: int) -> list[dict[str, Any]]:
+        with self._lock:
+            if offset >= len(self):
+                return []
+            return [self._row(slot) for slot in self._collect(self._slot_from_end(offset), limit)]
+
+    def list_books_page(self, *, limit: int, cursor: str | None) -> tuple[list[dict[str, Any]], str | None]:
+        """Mesma pagina do `crud.list_books_after`; o cursor e o do banco."""
+
+        after = decode_cursor(cursor, LIST_CURSOR_KIND, 2) if cursor else None
+        with self._lock:
+            start = len(self.ids) - 1 if after is None else self._position(_micros(after[0]), after[1]) - 1
+            slots = self._collect(start, limit + 1)
+            rows = [self._row(slot) for slot in slots[:limit]]
+        if len(slots) <= limit:
+            return rows, None
+        return rows, encode_cursor(LIST_CURSOR_KIND, (rows[-1]["created_at"], rows[-1]["id"]))
+
+    def _scores(self, query: str) -> dict[int, float] | None:
+        """bm25 do FTS5 de cada livro que casa com todos os prefixos; None se a busca deve ir ao banco."""
+
+        tokens = search.tokenize(search.fold(query))
+        if not self.searchable or not tokens or any("_" in token for token in tokens):
+            # Sem token a busca do banco vira ILIKE; "a_b" vira frase no FTS5 (precisa de posicoes).
+            return None
+        ranges = []
+        touched = 0
+        for token in tokens:
+            low = bisect_left(self.vocab, token)
+            terms = self.vocab[low:bisect_left(self.vocab, token + _MAX_CHAR, low)]
+            touched += sum(len(self.postings[term]) for term in terms)
+            if touched > MAX_SEARCH_POSTINGS:
+                return None
+            ranges.append(terms)
+        rows = len(self)
+        if not rows:
+            return {}
+        settings = get_settings()
+        title_weight, author_weight, publisher_weight = (
+            settings.search_weight_title,
+            settings.search_weight_author,
+            settings.search_weight_publisher,
+        )
+        phrases: list[tuple[float, dict[int, float]]] = []
+        for terms in ranges:
+            frequencies: dict[int, float] = {}
+            for term in terms:
+                for packed in self.postings[term]:
+                    book_id = packed >> _ID_SHIFT
+                    frequencies[book_id] = (
+                        frequencies.get(book_id, 0.0)
+                        + title_weight * (packed >> 16 & _TF_MAX)
+                        + author_weight * (packed >> 8 & _TF_MAX)
+                        + publisher_weight * (packed & _TF_MAX)
+                    )
+            hits = len(frequencies)
+            # Mesmas formulas (e ordem das operacoes) do fts5Bm25Function.
+            idf = math.log((rows - hits + 0.5) / (hits + 0.5))
+            phrases.append((idf if idf > 0.0 else 1e-6, frequencies))
+        candidates = min((frequencies for _idf, frequencies in phrases), key=len).keys()
+        candidates = [book_id for book_id in candidates if all(book_id in f for _idf, f in phrases)]
+        avgdl = self.total_tokens / rows
+        scores = {}
+        for book_id in candidates:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[book_id] / avgdl)
+            score = 0.0
+            for idf, frequencies in phrases:
+                frequency = frequencies[book_id]
+                score += idf * ((frequency * (BM25_K1 + 1.0)) / (frequency + norm))
+            scores[book_id] = -1.0 * score
+        return scores
+
+    def _ranking(self, query: str) -> list[tuple] | None:
+        """Chaves (rank, -created, -id, posicao) na ordem do FTS5: rank, created_at desc, id desc."""
+
+        if query in self._rankings:
+            return self._rankings[query]
+        scores = self._scores(query)
+        ranking = None
+        if scores is not None:
+            ranking = sorted(
+                (score, -self.created[slot], -book_id, slot)
+                for book_id, score in scores.items()
+                if (slot := self._slot(book_id)) is not None
+            )
+        if len(self._rankings) >= SEARCH_CACHE_ENTRIES:
+            del self._rankings[next(iter(self._rankings))]
+        self._rankings[query] = ranking
+        return ranking
+
+    def _ranked(
+        self, query: str, count: int, *, offset: int = 0, after: tuple[float, int, int] | None = None
+    ) -> list[tuple] | None:
+        """Ate `count` (chave, livro) do ranking, apos `offset` ou apos a chave `after` de um cursor."""
+
+        with self._lock:
+            ranking = self._ranking(query)
+            if ranking is None:
+                return None
+            start = offset if after is None else bisect_right(ranking, (*after, math.inf))
+            return [(key, self._row(key[3])) for key in ranking[start:start + count]]
+
+    def search(self, query: str, *, limit: int, offset: int) -> list[dict[str, Any]] | None:
+        ranked = self._ranked(query, limit, offset=offset)
+        return None if ranked is None else [row for _key, row in ranked]
+
+    def search_page(
+        self, query: str, *, limit: int, cursor: str | None
+    ) -> tuple[list[dict[str, Any]], str | None] | None:
+        """Busca por cursor; None se a consulta (ou o cursor, emitido pelo banco) nao e da replica."""
+
+        after = None
+        if cursor:
+            try:
+                rank, created_at, book_id = decode_cursor(cursor, SEARCH_CURSOR_KIND, 3)
+            except InvalidCursorError:
+                return None
+            after = (rank, -_micros(created_at), -book_id)
+        ranked = self._ranked(query, limit + 1, after=after)
+        if ranked is None:
+            return None
+        rows = [row for _key, row in ranked[:limit]]
+        if len(ranked) <= limit:
+            return rows, None
+        last_key, last = ranked[limit - 1]
+        return rows, encode_cursor(SEARCH_CURSOR_KIND, (last_key[0], last["created_at"], last["id"]))
+
+    def stats(self) -> dict[str, Any]:
+        """Linhas, termos e bytes por componente (sys.getsizeof), com a projecao para 1 milhao de linhas."""
+
+        with self._lock:
+            columns = sum(
+                sys.getsizeof(values)
+                for values in (
+                    self.ids, self.created, self.updated, self.versions, self.authors, self.publishers,
+                    self.alive, self.dead, self.slot_of,
+                )
+            )
+            texts = (
+                sys.getsizeof(self.titles)
+                + sys.getsizeof(self.links)
+                + sum(map(sys.getsizeof, self.titles))
+                + sum(sys.getsizeof(link) for link in self.links if link is not None)
+                + sys.getsizeof(self.strings)
+                + sys.getsizeof(self.string_ids)
+                + sum(sys.getsizeof(value) for value in self.strings if value is not None)
+            )
+            index = (
+                sys.getsizeof(self.postings)
+                + sys.getsizeof(self.vocab)
+                + sys.getsizeof(self.doc_lengths)
+                + sum(sys.getsizeof(term) + sys.getsizeof(postings) for term, postings in self.postings.items())
+            )
+            rows = len(self)
+            total = columns + texts + index
+            return {
+                "rows": rows,
+                "dead": len(self.dead),
+                "terms": len(self.postings),
+                "postings": sum(map(len, self.postings.values())),
+                "bytes": {"columns": columns, "texts": texts, "search": index, "total": total},
+                "bytes_per_row": round(total / rows, 1) if rows else 0.0,
+                "mib_per_million_rows": round(total / rows * 1_000_000 / 1024 / 1024, 1) if rows else 0.0,
+                "version": self.version,
+                "seq": self.seq,
+            }
+
+
+_replica: CatalogReplica | None = None
+_build_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_building = False
+_refreshing = False
+# Incrementado a cada commit com escrita do `book_service` neste processo.
+_written = 0
+
+
+def _catch_up(replica: CatalogReplica, db: Session) -> bool:
+    """Aplica o changelog desde `replica.seq`; False se ele ja foi compactado alem disso.
+
+    Repete enquanto a versao do catalogo muda durante a leitura, para que a
+    versao gravada na replica (base dos ETags) corresponda ao conteudo.
+    """
+
+    while True:
+        version = crud.get_catalog_version(db)
+        if changes.horizon(db) > replica.seq:
+            return False
+        while True:
+            rows = changes.changes_since(db, since=replica.seq, limit=SYNC_BATCH)
+            replica.apply(rows)
+            if len(rows) < SYNC_BATCH:
+                break
+        if crud.get_catalog_version(db) == version:
+            replica.version = version
+            replica.checked_at = time.monotonic()
+            return True
+
+
+def build_replica(db: Session) -> CatalogReplica:
+    started = time.perf_counter()
+    written = _written
+    replica = CatalogReplica(
+        version=crud.get_catalog_version(db),
+        # `seq` lido antes das linhas: mudancas durante a leitura sao reaplicadas no `_catch_up`.
+        # Nunca abaixo do horizonte: lapides ja compactadas estao refletidas nas linhas (livro
+        # ausente), e um `seq` menor faria cada sincronizacao reconstruir a replica.
+        seq=max(changes.last_seq(db), changes.horizon(db)),
+        searchable=search.get_backend(db.get_bind()).name == "fts5",
+    )
+    stmt = (
+        select(*crud.BOOK_COLUMNS)
+        .order_by(Book.created_at, Book.id)
+        .execution_options(yield_per=get_settings().export_chunk_size)
+    )
+    replica.load(db.execute(stmt))
+    _catch_up(replica, db)
+    replica.synced = written
+    logger.info(
+        "Replica em memoria: %s livros, %s termos em %.0f ms",
+        len(replica),
+        len(replica.postings),
+        (time.perf_counter() - started) * 1000,
+    )
+    return replica
+
+
+def supported() -> bool:
+    """Se a replica pode ser usada: ligada na config e banco com changelog (SQLite)."""
+
+    if not get_settings().memory_replica:
+        return False
+    # Import tardio: connection importa este pacote.
+    from backend.database.connection import engine
+
+    return changes.uses_triggers(engine)
+
+
+def _session() -> Session:
+    from backend.database.connection import SessionLocal, ensure_db
+
+    ensure_db()
+    return SessionLocal()
+
+
+def _build() -> None:
+    global _replica, _building
+    try:
+        with _build_lock:
+            if _replica is None:
+                with _session() as db:
+                    _replica = build_replica(db)
+    except Exception:  # pragma: no cover - a proxima leitura tenta de novo
+        logger.exception("Falha ao construir a replica em memoria")
+    finally:
+        _building = False
+
+
+def warm_up() -> None:
+    """Constroi a replica em segundo plano (start da API/MCP ou primeira leitura)."""
+
+    global _building
+    if _replica is not None or _building:
+        return
+    if not supported():
+        if get_settings().memory_replica:
+            logger.warning("MEMORY_REPLICA ignorado: a replica depende do changelog, disponivel so no SQLite")
+        return
+    _building = True
+    threading.Thread(target=_build, name="memory-replica-build", daemon=True).start()
+
+
+def _sync(replica: CatalogReplica, *, check: bool = False) -> None:
+    """Traz a replica ao estado do banco (ou a reconstroi se o changelog foi compactado alem dela)."""
+
+    global _replica
+    with _sync_lock:
+        written = _written
+        if not check and replica.synced == written:
+            return
+        with _session() as db:
+            if _catch_up(replica, db):
+                replica.synced = written
+            else:
+                logger.info("Changelog compactado alem do seq %s da replica: reconstruindo", replica.seq)
+                _replica = build_replica(db)
+
+
+def _refresh_in_background(replica: CatalogReplica) -> None:
+    global _refreshing
+
+    def run() -> None:
+        global _refreshing
+        try:
+            _sync(replica, check=True)
+        except Exception:  # pragma: no cover - a replica atual continua servindo
+            logger.exception("Falha ao sincronizar a replica em memoria")
+        finally:
+            _refreshing = False
+
+    _refreshing = True
+    replica.checked_at = time.monotonic()
+    threading.Thread(target=run, name="memory-replica-refresh", daemon=True).start()
+
+
+def current() -> CatalogReplica | None:
+    """Replica pronta para responder, com as escritas deste processo aplicadas; None = use o banco.
+
+    Na primeira chamada agenda a construcao (as leituras vao ao banco ate
+    ela terminar).
+    """
+
+    if not get_settings().memory_replica:
+        return None
+    replica = _replica
+    if replica is None:
+        warm_up()
+        return None
+    if replica.synced != _written:
+        _sync(replica)
+        return _replica
+    if not _refreshing and time.monotonic() - replica.checked_at >= get_settings().memory_replica_refresh_seconds:
+        _refresh_in_background(replica)
+    return replica
+
+
+def ready() -> bool:
+    """Se a replica ja foi construida (as leituras respondem da memoria)."""
+
+    return _replica is not None
+
+
+def replica_stats() -> dict[str, Any] | None:
+    """Tamanho e memoria da replica (None se desligada ou ainda nao construida)."""
+
+    replica = _replica
+    return replica.stats() if replica is not None else None
+
+
+def note_write(db: Session) -> None:
+    """Chamado pelas escritas do `book_service`: a replica se atualiza na leitura apos o commit."""
+
+    if get_settings().memory_replica:
+        db.info[_PENDING_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_after_commit(session: Session) -> None:
+    global _written
+    if session.in_nested_transaction():
+        # RELEASE de um SAVEPOINT tambem dispara after_commit; espera o commit de fora.
+        return
+    if session.info.pop(_PENDING_KEY, False):
+        _written += 1
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction: Any) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Constroi a replica em memoria e mostra o consumo por componente.")
+    parser.parse_args(argv)
+
+    from backend.database.connection import SessionLocal, init_db
+
+    init_db()
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        replica = build_replica(db)
+        elapsed = time.perf_counter() - started
+    report = replica.stats()
+    print(f"livros: {report['rows']}, termos: {report['terms']}, postings: {report['postings']}")
+    for name, size in report["bytes"].items():
+        print(f"  {name:<8} {size / 1024 / 1024:8.1f} MiB")
+    print(f"por livro: {report['bytes_per_row']} bytes (~{report['mib_per_million_rows']} MiB por milhao de livros)")
+    print(f"construcao: {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
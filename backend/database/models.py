@@ -7,6 +7,8 @@ from datetime import datetime
 from sqlalchemy import Column, DateTime, Index, Integer, String, Text
 from sqlalchemy.orm import declarative_base
 
+from backend.serialization import book_to_dict, to_jsonable
+
 Base = declarative_base()
 
 
@@ -21,21 +23,70 @@ class Book(Base):
     publisher = Column(String(255), nullable=True, index=True)
     purchase_link = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
+    # Incrementado a cada UPDATE pelo ORM (version_id_col): base do ETag e do If-Match.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     __table_args__ = (
         Index("idx_books_title", "title"),
         Index("idx_books_author", "author"),
         Index("idx_books_publisher", "publisher"),
+        Index("idx_books_created_at_id", "created_at", "id"),
     )
 
     def to_dict(self) -> dict[str, str | int | None]:
         """Facilita transformar o modelo em JSON (usado pelo MCP)."""
 
-        return {
-            "id": self.id,
-            "title": self.title,
-            "author": self.author,
-            "publisher": self.publisher,
-            "purchase_link": self.purchase_link,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-        }
+        return to_jsonable(book_to_dict(self))
+
+
+class CatalogState(Base):
+    """Linha unica com a versao global do catalogo (ETag de listagens/buscas) e a do schema."""
+
+    __tablename__ = "catalog_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Impressao digital do schema aplicado pelo `init_db` (ver `connection.schema_version`).
+    schema_version = Column(String(32), nullable=True)
+    # Maior `seq` de lapide ja compactada: `since` abaixo disso exige sincronizacao completa.
+    changes_horizon = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class FacetCount(Base):
+    """Contagem de livros por faceta (total, autor, editora, dia de cadastro).
+
+    Mantida por triggers no SQLite (ver `backend/database/stats.py`); `value`
+    vazio representa livros sem autor/editora.
+    """
+
+    __tablename__ = "catalog_facets"
+
+    facet = Column(String(16), primary_key=True)
+    value = Column(String(255), primary_key=True)
+    book_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (Index("idx_catalog_facets_count", "facet", "book_count", "value"),)
+
+
+class BookChange(Base):
+    """Ultima mudanca de cada livro (changelog do delta sync), mantida por triggers no SQLite.
+
+    `seq` e AUTOINCREMENT (nunca reutilizado) e cresce a cada escrita; `op`
+    e `upsert` (livro criado/alterado) ou `delete` (lapide). Ver
+    `backend/database/changes.py`.
+    """
+
+    __tablename__ = "book_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    book_id = Column(Integer, nullable=False)
+    op = Column(String(8), nullable=False)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_book_changes_book_id", "book_id"),
+        {"sqlite_autoincrement": True},
+    )
@@ -0,0 +1,56 @@
+"""Cursores opacos para paginacao por chave (keyset).
+
+Um cursor guarda apenas a chave de ordenacao da ultima linha entregue
+(ex.: `created_at` + `id`). A proxima pagina filtra `WHERE chave < cursor`
+e aproveita o indice composto, em vez de ordenar e descartar `offset`
+linhas. O cliente trata o valor como string opaca.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any
+
+
+class InvalidCursorError(ValueError):
+    """Cursor malformado ou gerado para outro tipo de consulta."""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(kind: str, values: tuple[Any, ...]) -> str:
+    """Serializa a chave de ordenacao em base64 url-safe."""
+
+    payload = json.dumps({"k": kind, "v": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str, size: int) -> tuple[Any, ...]:
+    """Valida o cursor e devolve a chave; dispara InvalidCursorError se invalido."""
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload["k"] != kind:
+            raise InvalidCursorError("Cursor does not belong to this query")
+        values = tuple(_decode_value(v) for v in payload["v"])
+    except InvalidCursorError:
+        raise
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+    if len(values) != size:
+        raise InvalidCursorError("Invalid cursor")
+    return values
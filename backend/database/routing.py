@@ -0,0 +1,75 @@
+"""Janela "read-your-writes" do roteamento de sessoes de leitura.
+
+Leituras vao para o engine de leitura (conexoes SQLite `mode=ro` ou uma
+replica). Com replica ha atraso de replicacao: um cliente que acabou de
+escrever poderia nao ver a propria escrita. Com `READ_YOUR_WRITES_SECONDS`
+> 0, as leituras de um cliente que escreveu ha menos que esse tempo voltam
+para o engine principal.
+
+O cliente e identificado por uma chave opaca: `X-Client-Id` (ou o IP) na
+API REST e o ID da sessao MCP nas tools. Ela vive numa ContextVar, entao
+acompanha a chamada ate as threads do pool (`copy_context`).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from backend.config import get_settings
+
+_client: ContextVar[str | None] = ContextVar("db_client", default=None)
+_recent_writes: dict[str, float] = {}
+_lock = threading.Lock()
+# Limpa as entradas vencidas a cada N escritas registradas.
+_PRUNE_EVERY = 1024
+_writes_since_prune = 0
+
+
+def window() -> float:
+    return get_settings().read_your_writes_seconds
+
+
+def current_client() -> str | None:
+    return _client.get()
+
+
+@contextmanager
+def client_scope(client: str | None) -> Iterator[None]:
+    """Associa as sessoes abertas dentro do bloco ao cliente `client`."""
+
+    token = _client.set(client)
+    try:
+        yield
+    finally:
+        _client.reset(token)
+
+
+def note_write(client: str | None = None) -> None:
+    """Registra que `client` (ou o cliente atual) acabou de escrever."""
+
+    global _writes_since_prune
+    client = client or _client.get()
+    if client is None or window() <= 0:
+        return
+    now = time.monotonic()
+    with _lock:
+        _recent_writes[client] = now + window()
+        _writes_since_prune += 1
+        if _writes_since_prune >= _PRUNE_EVERY:
+            _writes_since_prune = 0
+            for key in [key for key, until in _recent_writes.items() if until <= now]:
+                del _recent_writes[key]
+
+
+def reads_from_primary(client: str | None = None) -> bool:
+    """True se as leituras de `client` ainda devem ir ao engine principal."""
+
+    client = client or _client.get()
+    if client is None or window() <= 0:
+        return False
+    until = _recent_writes.get(client)
+    return until is not None and until > time.monotonic()
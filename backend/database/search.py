@@ -0,0 +1,335 @@
+"""Motor de busca textual do catalogo (full-text search).
+
+No SQLite usamos uma tabela virtual FTS5 (`books_fts`) com conteudo externo
+apontando para `books`. Triggers mantem o indice sincronizado em cada
+INSERT/UPDATE/DELETE, entao nenhuma camada acima precisa lembrar de
+atualiza-lo. Outros bancos podem registrar seu proprio backend via
+`register_backend`; sem registro, caimos no `LikeSearchBackend` (ILIKE).
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from typing import Callable, Iterator, Sequence
+
+from sqlalchemy import ColumnElement, Engine, Row, and_, column, func, literal_column, or_, select, table, text, tuple_
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.database import crud
+from backend.database.models import Book
+from backend.database.pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "books_fts"
+FTS_VOCAB_TABLE = "books_fts_vocab"
+FTS_COLUMNS = ("title", "author", "publisher")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query: str) -> list[str]:
+    """Quebra a consulta em tokens alfanumericos (unicode)."""
+
+    return _TOKEN_RE.findall(query)
+
+
+def fold(value: str) -> str:
+    """Minusculas sem acentos (NFKD sem marcas combinantes), como o `remove_diacritics` do FTS5."""
+
+    if value.isascii():
+        return value.casefold()
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+# Alternativas de um termo da busca fuzzy: (texto, casa como prefixo?).
+TermGroup = Sequence[tuple[str, bool]]
+
+
+class SearchBackend(ABC):
+    """Contrato minimo de um backend de busca (`search` e `search_page` sao obrigatorios)."""
+
+    name = "base"
+
+    def ddl(self) -> list[tuple[str, str]]:
+        """(nome, DDL) das estruturas auxiliares; entra na versao de schema do `init_db`."""
+
+        return []
+
+    def install(self, engine: Engine) -> None:
+        """Cria estruturas auxiliares (indices, triggers). Padrao: nada."""
+
+    @abstractmethod
+    def search(self, db: Session, *, query: str, limit: int = 100, offset: int = 0) -> Sequence[Row]:
+        """Linhas com as colunas de `crud.BOOK_COLUMNS`, na ordem de relevancia."""
+
+    @abstractmethod
+    def search_page(
+        self, db: Session, *, query: str, limit: int = 100, cursor: str | None = None
+    ) -> tuple[Sequence[Row], str | None]:
+        """Pagina por cursor opaco; devolve (livros, proximo_cursor)."""
+
+    def where(self, query: str) -> ColumnElement[bool]:
+        """Condicao "o livro casa com `query`" (mesma regra do `search`), para filtrar escritas em massa."""
+
+        return crud.ilike_filter(query)
+
+    def vocabulary(self, db: Session) -> Iterator[tuple[str, int, tuple[str, ...]]]:
+        """(termo sem acento, livros que o contem, grafias no banco) para o indice fuzzy.
+
+        Padrao portavel: varre `books` e tokeniza em Python, O(livros) a cada
+        (re)construcao do indice.
+        """
+
+        docs: dict[str, int] = {}
+        forms: dict[str, set[str]] = {}
+        chunk_size = get_settings().export_chunk_size
+        stmt = select(Book.title, Book.author, Book.publisher).execution_options(yield_per=chunk_size)
+        for row in db.execute(stmt):
+            words = {word.lower() for value in row if value for word in tokenize(value)}
+            for term in {fold(word) for word in words}:
+                docs[term] = docs.get(term, 0) + 1
+            for word in words:
+                forms.setdefault(fold(word), set()).add(word)
+        for term, count in docs.items():
+            yield term, count, tuple(sorted(forms[term]))
+
+    def search_terms(
+        self, db: Session, *, groups: Sequence[TermGroup], limit: int = 100, require_all: bool = True
+    ) -> Sequence[Row]:
+        """Livros que casam com os grupos de alternativas (AND entre grupos, ou OR), por relevancia."""
+
+        terms = [[term for term, _prefix in group] for group in groups]
+        return crud.search_books_terms(db, groups=terms, limit=limit, require_all=require_all)
+
+
+class LikeSearchBackend(SearchBackend):
+    """Fallback portavel: substring case-insensitive via ILIKE (varredura)."""
+
+    name = "like"
+    cursor_kind = "search:like"
+
+    def search(self, db: Session, *, query: str, limit: int = 100, offset: int = 0) -> Sequence[Row]:
+        return crud.search_books(db, query=query, limit=limit, offset=offset)
+
+    def search_page(
+        self, db: Session, *, query: str, limit: int = 100, cursor: str | None = None
+    ) -> tuple[Sequence[Row], str | None]:
+        after = decode_cursor(cursor, self.cursor_kind, 2) if cursor else None
+        books = crud.search_books_after(db, query=query, limit=limit + 1, after=after)
+        if len(books) <= limit:
+            return books, None
+        books = books[:limit]
+        return books, encode_cursor(self.cursor_kind, (books[-1].created_at, books[-1].id))
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Busca por tokens/prefixos com ranking bm25 usando SQLite FTS5."""
+
+    name = "fts5"
+    cursor_kind = "search:fts5"
+
+    _fts = table(FTS_TABLE, column("rowid"))
+
+    def ddl(self) -> list[tuple[str, str]]:
+        columns = ", ".join(FTS_COLUMNS)
+        new_values = ", ".join(f"new.{name}" for name in FTS_COLUMNS)
+        old_values = ", ".join(f"old.{name}" for name in FTS_COLUMNS)
+        return [
+            (
+                FTS_TABLE,
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"{columns}, content='books', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')",
+            ),
+            (
+                "books_fts_ai",
+                f"CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+                f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            ),
+            (
+                "books_fts_ad",
+                f"CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+                f"VALUES ('delete', old.id, {old_values}); END",
+            ),
+            (
+                "books_fts_au",
+                f"CREATE TRIGGER books_fts_au AFTER UPDATE OF {columns} ON books BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+                f"VALUES ('delete', old.id, {old_values}); "
+                f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            ),
+            # Vocabulario do indice (termo, documentos) lido pela busca fuzzy; o FTS5 o mantem.
+            (FTS_VOCAB_TABLE, f"CREATE VIRTUAL TABLE {FTS_VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, row)"),
+        ]
+
+    def install(self, engine: Engine) -> None:
+        with engine.begin() as conn:
+            existing = set(conn.execute(text("SELECT name FROM sqlite_master")).scalars())
+            missing = [(name, statement) for name, statement in self.ddl() if name not in existing]
+            for _name, statement in missing:
+                conn.exec_driver_sql(statement)
+            if FTS_TABLE not in existing:
+                # Indexa as linhas que ja existiam antes do FTS ser criado.
+                conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        if FTS_TABLE not in existing:
+            logger.info("Indice FTS5 '%s' criado", FTS_TABLE)
+
+    @staticmethod
+    def build_match(query: str) -> str | None:
+        """Converte texto livre em expressao FTS5 (AND de prefixos).
+
+        Cada token vira `"token"*`, o que evita injecao da sintaxe FTS5
+        (aspas, NEAR, OR...) e permite buscar enquanto o usuario digita.
+        """
+
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    @staticmethod
+    def _rank():
+        settings = get_settings()
+        return func.bm25(
+            literal_column(FTS_TABLE),
+            settings.search_weight_title,
+            settings.search_weight_author,
+            settings.search_weight_publisher,
+        )
+
+    def _select(self, match: str, *entities):
+        return (
+            select(*entities)
+            .join(self._fts, self._fts.c.rowid == Book.id)
+            .where(literal_column(FTS_TABLE).op("MATCH")(match))
+            .order_by(self._rank(), Book.created_at.desc(), Book.id.desc())
+        )
+
+    def search(self, db: Session, *, query: str, limit: int = 100, offset: int = 0) -> Sequence[Row]:
+        match = self.build_match(query)
+        if match is None:
+            # Consulta so com pontuacao: nao ha token para o FTS, mantem o ILIKE.
+            return crud.search_books(db, query=query, limit=limit, offset=offset)
+        stmt = self._select(match, *crud.BOOK_COLUMNS).limit(limit).offset(offset)
+        return db.execute(stmt).all()
+
+    def search_page(
+        self, db: Session, *, query: str, limit: int = 100, cursor: str | None = None
+    ) -> tuple[Sequence[Row], str | None]:
+        match = self.build_match(query)
+        if match is None:
+            return LikeSearchBackend().search_page(db, query=query, limit=limit, cursor=cursor)
+        rank = self._rank()
+        stmt = self._select(match, *crud.BOOK_COLUMNS, rank).limit(limit + 1)
+        if cursor:
+            # Chave de ordenacao: (rank asc, created_at desc, id desc).
+            last_rank, created_at, book_id = decode_cursor(cursor, self.cursor_kind, 3)
+            stmt = stmt.where(
+                or_(
+                    rank > last_rank,
+                    and_(rank == last_rank, tuple_(Book.created_at, Book.id) < tuple_(created_at, book_id)),
+                )
+            )
+        rows = db.execute(stmt).all()
+        # A ultima coluna e o rank; o restante e a linha do livro.
+        books = [row[:-1] for row in rows[:limit]]
+        if len(rows) <= limit:
+            return books, None
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(self.cursor_kind, (last[-1], last.created_at, last.id))
+        return books, next_cursor
+
+    def where(self, query: str) -> ColumnElement[bool]:
+        match = self.build_match(query)
+        if match is None:
+            return crud.ilike_filter(query)
+        return Book.id.in_(select(self._fts.c.rowid).where(literal_column(FTS_TABLE).op("MATCH")(match)))
+
+    def vocabulary(self, db: Session) -> Iterator[tuple[str, int, tuple[str, ...]]]:
+        # Os termos do FTS5 ja vem sem acento e em minusculas; nenhuma varredura em `books`.
+        # Termos so com digitos ficam de fora (o indice fuzzy os ignora).
+        stmt = text(f"SELECT term, doc FROM {FTS_VOCAB_TABLE} WHERE term GLOB '*[^0-9]*'")
+        for term, docs in db.execute(stmt):
+            yield term, docs, (term,)
+
+    def search_terms(
+        self, db: Session, *, groups: Sequence[TermGroup], limit: int = 100, require_all: bool = True
+    ) -> Sequence[Row]:
+        # Termos vem do `tokenize` ou do vocabulario do FTS5: so \w, seguros entre aspas.
+        alternatives = [
+            " OR ".join(f'"{term}"*' if prefix else f'"{term}"' for term, prefix in group) for group in groups if group
+        ]
+        match = (" AND " if require_all else " OR ").join(f"({alternative})" for alternative in alternatives)
+        return db.execute(self._select(match, *crud.BOOK_COLUMNS).limit(limit)).all()
+
+
+_BACKENDS: dict[str, Callable[[], SearchBackend]] = {
+    "like": LikeSearchBackend,
+    "fts5": SQLiteFTS5Backend,
+}
+_DIALECT_DEFAULTS: dict[str, str] = {
+    "sqlite": "fts5",
+}
+_active: dict[int, SearchBackend] = {}
+
+
+def register_backend(name: str, factory: Callable[[], SearchBackend], *, dialect: str | None = None) -> None:
+    """Registra um backend (ex.: tsvector no Postgres) e, opcionalmente, o torna padrao do dialeto."""
+
+    _BACKENDS[name] = factory
+    if dialect:
+        _DIALECT_DEFAULTS[dialect] = name
+
+
+def _resolve_name(engine: Engine) -> str:
+    name = get_settings().search_backend
+    if name == "auto":
+        name = _DIALECT_DEFAULTS.get(engine.dialect.name, "like")
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown search backend: {name}")
+    return name
+
+
+def get_backend(engine: Engine) -> SearchBackend:
+    """Retorna (e memoriza por engine) o backend configurado."""
+
+    backend = _active.get(id(engine))
+    if backend is None:
+        backend = _BACKENDS[_resolve_name(engine)]()
+        _active[id(engine)] = backend
+    return backend
+
+
+def install(engine: Engine) -> None:
+    """Chamado pelo `init_db` para preparar o indice do backend ativo."""
+
+    backend = get_backend(engine)
+    backend.install(engine)
+    logger.info("Busca textual usando backend '%s'", backend.name)
+
+
+def search_books(db: Session, *, query: str, limit: int = 100, offset: int = 0) -> Sequence[Row]:
+    """Busca usando o backend ativo para o engine da sessao."""
+
+    return get_backend(db.get_bind()).search(db, query=query, limit=limit, offset=offset)
+
+
+def search_books_page(
+    db: Session, *, query: str, limit: int = 100, cursor: str | None = None
+) -> tuple[Sequence[Row], str | None]:
+    """Versao paginada por cursor do `search_books`."""
+
+    return get_backend(db.get_bind()).search_page(db, query=query, limit=limit, cursor=cursor)
+
+
+def where(db: Session, *, query: str) -> ColumnElement[bool]:
+    """Filtro SQL do backend ativo para `query` (update/delete em massa por busca)."""
+
+    return get_backend(db.get_bind()).where(query)
@@ -0,0 +1,231 @@
+"""Estatisticas do catalogo: total e contagens por autor, editora e dia.
+
+No SQLite a tabela `catalog_facets` e mantida por triggers em `books` (como
+o indice FTS5): qualquer caminho de escrita (ORM, carga em massa, SQL
+manual) a mantem em dia, e ler as estatisticas custa O(facetas), nao
+O(livros). Nos demais bancos as contagens saem de um GROUP BY em `books`.
+
+`rebuild` recalcula a tabela a partir de `books` para corrigir divergencias:
+
+    python -m backend.database.stats --rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Connection, Engine, func, select, text
+from sqlalchemy.orm import Session
+
+from backend.database.models import Book, FacetCount
+
+logger = logging.getLogger(__name__)
+
+FACETS_TABLE = "catalog_facets"
+TOTAL, AUTHOR, PUBLISHER, DAY = "total", "author", "publisher", "day"
+
+# Valor de cada faceta para uma linha de `books` ({row} = new, old ou books).
+FACET_VALUES = {
+    TOTAL: "''",
+    AUTHOR: "coalesce({row}.author, '')",
+    PUBLISHER: "coalesce({row}.publisher, '')",
+    DAY: "coalesce(date({row}.created_at), '')",
+}
+# Coluna de `books` que move o livro de uma faceta para outra num UPDATE.
+FACET_COLUMNS = {AUTHOR: "author", PUBLISHER: "publisher", DAY: "created_at"}
+TRIGGER_PREFIX = "books_facets_"
+
+
+def uses_triggers(engine: Engine | Connection) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def _increment(facet: str, row: str) -> str:
+    value = FACET_VALUES[facet].format(row=row)
+    return (
+        f"INSERT INTO {FACETS_TABLE}(facet, value, book_count) VALUES ('{facet}', {value}, 1) "
+        "ON CONFLICT(facet, value) DO UPDATE SET book_count = book_count + 1;"
+    )
+
+
+def _decrement(facet: str, row: str) -> str:
+    value = FACET_VALUES[facet].format(row=row)
+    where = f"facet = '{facet}' AND value = {value}"
+    return (
+        f"UPDATE {FACETS_TABLE} SET book_count = book_count - 1 WHERE {where}; "
+        f"DELETE FROM {FACETS_TABLE} WHERE {where} AND book_count <= 0;"
+    )
+
+
+def trigger_statements() -> list[str]:
+    """DDL dos triggers que mantem `catalog_facets` (INSERT, DELETE e um UPDATE por coluna)."""
+
+    statements = [
+        f"CREATE TRIGGER {TRIGGER_PREFIX}ai AFTER INSERT ON books BEGIN "
+        + " ".join(_increment(facet, "new") for facet in FACET_VALUES)
+        + " END",
+        f"CREATE TRIGGER {TRIGGER_PREFIX}ad AFTER DELETE ON books BEGIN "
+        + " ".join(_decrement(facet, "old") for facet in FACET_VALUES)
+        + " END",
+    ]
+    for facet, column in FACET_COLUMNS.items():
+        # PUT reescreve todas as colunas; o WHEN evita mexer em facetas que nao mudaram.
+        statements.append(
+            f"CREATE TRIGGER {TRIGGER_PREFIX}au_{facet} AFTER UPDATE OF {column} ON books "
+            f"WHEN old.{column} IS NOT new.{column} BEGIN "
+            f"{_decrement(facet, 'old')} {_increment(facet, 'new')} END"
+        )
+    return statements
+
+
+def _rebuild(conn: Connection) -> int:
+    conn.exec_driver_sql(f"DELETE FROM {FACETS_TABLE}")
+    for facet, expression in FACET_VALUES.items():
+        conn.exec_driver_sql(
+            f"INSERT INTO {FACETS_TABLE}(facet, value, book_count) "
+            f"SELECT '{facet}', {expression.format(row='books')}, count(*) FROM books GROUP BY 2"
+        )
+    return conn.execute(text(f"SELECT count(*) FROM {FACETS_TABLE}")).scalar_one()
+
+
+def install(engine: Engine) -> None:
+    """Chamado pelo `init_db`: cria os triggers (so SQLite) e popula a tabela na primeira vez."""
+
+    if not uses_triggers(engine):
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+            {"name": f"{TRIGGER_PREFIX}ai"},
+        ).first()
+        if exists:
+            return
+        for statement in trigger_statements():
+            conn.exec_driver_sql(statement)
+        rows = _rebuild(conn)
+    logger.info("Triggers de estatisticas criados (%s facetas)", rows)
+
+
+def rebuild(engine: Engine) -> int:
+    """Recalcula `catalog_facets` do zero; devolve o numero de linhas de faceta."""
+
+    if not uses_triggers(engine):
+        logger.info("Banco %s calcula as estatisticas sob demanda; nada a reconstruir", engine.dialect.name)
+        return 0
+    with engine.begin() as conn:
+        rows = _rebuild(conn)
+        # Muda o ETag das listagens/estatisticas para que clientes nao fiquem com contagens antigas.
+        conn.exec_driver_sql("UPDATE catalog_state SET version = version + 1 WHERE id = 1")
+    logger.info("Estatisticas reconstruidas (%s facetas)", rows)
+    return rows
+
+
+# Mesmas facetas calculadas direto de `books` (bancos sem triggers).
+_GROUPED_VALUES = {
+    AUTHOR: func.coalesce(Book.author, ""),
+    PUBLISHER: func.coalesce(Book.publisher, ""),
+    DAY: func.date(Book.created_at),
+}
+
+
+def _facet_rows(
+    db: Session, facet: str, *, limit: int | None = None, since: str | None = None, named: bool = False
+) -> list[tuple[str, int]]:
+    """(valor, contagem) de uma faceta, maiores primeiro (ou dias mais recentes primeiro com `since`).
+
+    `named` deixa de fora o valor '' (livros sem autor/editora).
+    """
+
+    if uses_triggers(db.get_bind()):
+        value, count = FacetCount.value, FacetCount.book_count
+        query = select(value, count).where(FacetCount.facet == facet)
+        if since is not None:
+            query = query.where(value >= since)
+    elif facet == TOTAL:
+        return [("", db.execute(select(func.count()).select_from(Book)).scalar_one())]
+    else:
+        value, count = _GROUPED_VALUES[facet], func.count()
+        query = select(value, count).group_by(value)
+        if since is not None:
+            query = query.where(Book.created_at >= datetime.fromisoformat(since))
+    if named:
+        query = query.where(value != "")
+    query = query.order_by(value.desc()) if since is not None else query.order_by(count.desc(), value)
+    if limit is not None:
+        query = query.limit(limit)
+    return [(str(row[0]), row[1]) for row in db.execute(query)]
+
+
+def facet_counts(db: Session, facet: str) -> list[tuple[str, int]]:
+    """Todos os (valor, contagem) de uma faceta, maiores primeiro ('' = livros sem o campo)."""
+
+    return _facet_rows(db, facet)
+
+
+def _distinct(db: Session, facet: str) -> int:
+    """Quantos valores distintos (sem contar livros sem autor/editora) a faceta tem."""
+
+    if uses_triggers(db.get_bind()):
+        query = select(func.count()).where(FacetCount.facet == facet, FacetCount.value != "")
+    else:
+        column = getattr(Book, FACET_COLUMNS[facet])
+        query = select(func.count(func.distinct(column))).where(column != "")
+    return db.execute(query).scalar_one()
+
+
+def _unnamed(db: Session, facet: str) -> int:
+    """Livros sem autor/editora (valor '' da faceta), fora do ranking de `_facet_rows(named=True)`."""
+
+    if uses_triggers(db.get_bind()):
+        query = select(FacetCount.book_count).where(FacetCount.facet == facet, FacetCount.value == "")
+    else:
+        query = select(func.count()).select_from(Book).where(_GROUPED_VALUES[facet] == "")
+    return db.execute(query).scalar() or 0
+
+
+def _entries(rows: list[tuple[str, int]]) -> list[dict[str, Any]]:
+    return [{"value": value, "count": count} for value, count in rows]
+
+
+def catalog_stats(db: Session, *, top: int = 20, days: int = 30, today: date | None = None) -> dict[str, Any]:
+    """Total de livros, `top` autores/editoras e cadastros por dia nos ultimos `days` dias (UTC).
+
+    Livros sem autor/editora nao entram nos rankings: saem em `unknown_authors`
+    e `unknown_publishers`, como `distinct_*` tambem nao os conta.
+    """
+
+    since = ((today or datetime.utcnow().date()) - timedelta(days=days - 1)).isoformat()
+    total = _facet_rows(db, TOTAL)
+    return {
+        "total": total[0][1] if total else 0,
+        "distinct_authors": _distinct(db, AUTHOR),
+        "distinct_publishers": _distinct(db, PUBLISHER),
+        "unknown_authors": _unnamed(db, AUTHOR),
+        "unknown_publishers": _unnamed(db, PUBLISHER),
+        "authors": _entries(_facet_rows(db, AUTHOR, limit=top, named=True)),
+        "publishers": _entries(_facet_rows(db, PUBLISHER, limit=top, named=True)),
+        "added_per_day": [{"day": day, "count": count} for day, count in _facet_rows(db, DAY, since=since)],
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Estatisticas do catalogo de livros.")
+    parser.add_argument("--rebuild", action="store_true", help="recalcula catalog_facets a partir de books")
+    args = parser.parse_args(argv)
+
+    from backend.database.connection import SessionLocal, engine, init_db
+
+    init_db()
+    if args.rebuild:
+        rebuild(engine)
+    with SessionLocal() as db:
+        print(json.dumps(catalog_stats(db), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,457 @@
+"""Autocompletar da caixa de busca: titulos, autores e editoras em memoria.
+
+O frontend pede sugestoes a cada tecla; mandar cada tecla para o
+`/books/search` custa uma consulta ao banco por requisicao. Aqui os valores
+distintos de titulo, autor e editora sao normalizados como na busca (sem
+acento, minusculas, so letras e digitos) e indexados por prefixo. Um prefixo
+vira um intervalo achado com `bisect`, e as sugestoes sao os valores desse
+intervalo com mais livros (empate: o texto mais curto). Cada valor tambem
+entra a partir das palavras do meio, entao "aneis" sugere "O Senhor dos
+Aneis".
+
+A estrutura e um suffix array por palavra: cada chave e um inteiro
+(`id do valor << 8 | posicao da palavra`) num `array("Q")` ordenado pelo
+texto normalizado a partir dessa posicao, sem copiar o texto (8 bytes por
+chave alem do valor). Escritas inserem num segundo array, pequeno, fundido
+ao principal de tempos em tempos (como numa LSM tree). Prefixos curtos ("a", "o ") cobrem intervalos enormes:
+acima de `SCAN_LIMIT` chaves, o top-`MAX_LIMIT` do prefixo e calculado uma
+vez, guardado e mantido a cada escrita.
+
+`SUGGEST_MEMORY_MB` limita o tamanho estimado do indice: os valores entram
+dos mais frequentes para os menos (autores, editoras e depois titulos) e o
+que nao couber fica de fora (`truncated` em `index_stats()`).
+
+O indice e construido em segundo plano no start da API e do MCP
+(`SUGGEST_WARMUP`) ou, se ainda nao existir, na primeira sugestao. Escritas
+do `book_service` sao aplicadas apos o commit; escritas de outros processos
+entram numa reconstrucao em segundo plano quando a versao do catalogo muda
+(checada no maximo a cada `SUGGEST_REFRESH_SECONDS`, e logo na primeira
+consulta apos a construcao inicial: escritas durante ela nao entram no indice).
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Iterable, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.database import crud, search, stats
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("title", "author", "publisher")
+TITLE, AUTHOR, PUBLISHER = range(len(FIELDS))
+MAX_LIMIT = 50
+# Intervalos ate esse tamanho sao percorridos na hora; maiores usam o top-k guardado.
+SCAN_LIMIT = 512
+# Chaves por valor: o texto inteiro e mais ate 7 a partir de palavras do meio.
+MAX_WORD_KEYS = 8
+# Palavras menores ("o", "a", "e") nao abrem chave propria.
+MIN_WORD_LENGTH = 2
+# A posicao da palavra ocupa 8 bits da chave.
+_OFFSET_BITS = 8
+_MAX_OFFSET = (1 << _OFFSET_BITS) - 1
+# Chaves novas vao para um array pequeno (insercao barata) fundido ao principal quando passa
+# de max(RECENT_MIN_KEYS, 1/RECENT_FRACTION do principal): o custo de reordenar e amortizado.
+RECENT_MIN_KEYS = 4096
+RECENT_FRACTION = 8
+# Bytes estimados por chave e por valor alem dos dois textos (dict, contagem, rank, campo, listas).
+_KEY_BYTES = 8
+_ENTRY_OVERHEAD = 120
+_MAX_CHAR = "\U0010ffff"
+# Inicio do texto ou de uma palavra (apos espaco) com pelo menos MIN_WORD_LENGTH caracteres.
+_WORD_START_RE = re.compile(rf"^|(?<= )(?=\w{{{MIN_WORD_LENGTH}}})")
+_PENDING_KEY = "suggest_pending"
+
+Values = Sequence[str | None]
+
+
+def normalize(value: str) -> str:
+    """Como a busca compara: sem acento, minusculas e palavras separadas por um espaco."""
+
+    return " ".join(search.tokenize(search.fold(value)))
+
+
+def word_offsets(normalized: str) -> list[int]:
+    """Posicoes em que o valor gera chave: o inicio e cada palavra com 2+ letras."""
+
+    offsets = [match.start() for match in _WORD_START_RE.finditer(normalized, 0, _MAX_OFFSET + 1)]
+    return offsets[:MAX_WORD_KEYS]
+
+
+def _rank(count: int, text: str) -> int:
+    # Mais livros primeiro; texto mais curto desempata.
+    return count << 8 | (255 - min(len(text), 255))
+
+
+class PrefixIndex:
+    """Valores (texto, normalizado, campo, contagem) e chaves ordenadas por sufixo."""
+
+    def __init__(self, version: int, budget_bytes: int) -> None:
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.budget_bytes = budget_bytes
+        self.bytes = 0
+        self.truncated = False
+        self.keys = array("Q")
+        self.recent = array("Q")
+        self.texts: list[str | None] = []
+        self.norms: list[str | None] = []
+        self.fields = bytearray()
+        self.counts = array("I")
+        self.ranks = array("Q")
+        self.entry_ids: dict[tuple[int, str], int] = {}
+        self._free: list[int] = []
+        self._top: dict[str, list[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entry_ids)
+
+    def _suffix(self, key: int) -> str:
+        return self.norms[key >> _OFFSET_BITS][key & _MAX_OFFSET :]
+
+    # -- valores ------------------------------------------------------------
+
+    @staticmethod
+    def _cost(text: str, normalized: str, keys: int) -> int:
+        return sys.getsizeof(text) + sys.getsizeof(normalized) + _ENTRY_OVERHEAD + keys * _KEY_BYTES
+
+    def _new_entry(self, field: int, normalized: str, text: str, count: int) -> list[int]:
+        """Cria o valor e devolve as chaves dele (ainda fora de `keys`); [] se nao couber."""
+
+        offsets = word_offsets(normalized)
+        cost = self._cost(text, normalized, len(offsets))
+        if self.bytes + cost > self.budget_bytes:
+            self.truncated = True
+            return []
+        self.bytes += cost
+        if self._free:
+            entry = self._free.pop()
+            self.texts[entry] = text
+            self.norms[entry] = normalized
+            self.fields[entry] = field
+            self.counts[entry] = count
+            self.ranks[entry] = _rank(count, text)
+        else:
+            entry = len(self.texts)
+            self.texts.append(text)
+            self.norms.append(normalized)
+            self.fields.append(field)
+            self.counts.append(count)
+            self.ranks.append(_rank(count, text))
+        self.entry_ids[(field, normalized)] = entry
+        return [entry << _OFFSET_BITS | offset for offset in offsets]
+
+    def _drop_entry(self, entry: int) -> None:
+        text, normalized = self.texts[entry], self.norms[entry]
+        offsets = word_offsets(normalized)
+        for offset in offsets:
+            key = entry << _OFFSET_BITS | offset
+            for keys in (self.recent, self.keys):
+                position = bisect_left(keys, normalized[offset:], key=self._suffix)
+                while position < len(keys) and keys[position] != key and self._suffix(keys[position]) == normalized[offset:]:
+                    position += 1
+                if position < len(keys) and keys[position] == key:
+                    del keys[position]
+                    break
+        del self.entry_ids[(self.fields[entry], normalized)]
+        self.bytes -= self._cost(text, normalized, len(offsets))
+        self.texts[entry] = self.norms[entry] = None
+        self.counts[entry] = self.ranks[entry] = 0
+        self._free.append(entry)
+
+    def load(self, field: int, text: str, count: int) -> None:
+        """Carga inicial: acrescenta sem ordenar (`finish` ordena tudo de uma vez)."""
+
+        text = text.strip()
+        normalized = normalize(text)
+        if not normalized:
+            return
+        entry = self.entry_ids.get((field, normalized))
+        if entry is not None:
+            # Mesmo valor com outra grafia ("Tolkien" e "TOLKIEN"): soma na primeira.
+            self.counts[entry] += count
+            self.ranks[entry] = _rank(self.counts[entry], self.texts[entry])
+            return
+        self.keys.extend(self._new_entry(field, normalized, text, count))
+
+    def finish(self) -> None:
+        """Ordena as chaves (e funde as recentes no array principal)."""
+
+        self.keys.extend(self.recent)
+        self.recent = array("Q")
+        self.keys = array("Q", sorted(self.keys, key=self._suffix))
+
+    # -- escritas -----------------------------------------------------------
+
+    def apply(self, changes: Iterable[tuple[Values | None, Values | None]]) -> None:
+        """Aplica trocas (valores antes, valores depois) de livros ja commitadas."""
+
+        deltas: dict[tuple[int, str], list[Any]] = {}
+        for before, after in changes:
+            for field in range(len(FIELDS)):
+                old = (before[field] or "").strip() if before else ""
+                new = (after[field] or "").strip() if after else ""
+                if old == new:
+                    continue
+                for text, delta in ((old, -1), (new, 1)):
+                    normalized = normalize(text) if text else ""
+                    if normalized:
+                        deltas.setdefault((field, normalized), [text, 0])[1] += delta
+        with self._lock:
+            added: list[int] = []
+            for (field, normalized), (text, delta) in deltas.items():
+                if delta:
+                    self._change(field, normalized, text, delta, added)
+            for key in added:
+                self.recent.insert(bisect_left(self.recent, self._suffix(key), key=self._suffix), key)
+            if len(self.recent) > max(RECENT_MIN_KEYS, len(self.keys) // RECENT_FRACTION):
+                self.finish()
+
+    def _change(self, field: int, normalized: str, text: str, delta: int, added: list[int]) -> None:
+        entry = self.entry_ids.get((field, normalized))
+        if entry is None:
+            if delta > 0:
+                keys = self._new_entry(field, normalized, text, delta)
+                if keys:
+                    added.extend(keys)
+                    self._promote(keys[0] >> _OFFSET_BITS)
+            return
+        count = self.counts[entry] + delta
+        if count <= 0:
+            self._forget(entry)
+            self._drop_entry(entry)
+            return
+        self.counts[entry] = count
+        self.ranks[entry] = _rank(count, self.texts[entry])
+        if delta > 0:
+            self._promote(entry)
+        else:
+            self._forget(entry)
+
+    def _cached_prefixes(self, entry: int) -> Iterable[tuple[str, list[int]]]:
+        normalized = self.norms[entry]
+        seen = set()
+        for offset in word_offsets(normalized):
+            suffix = normalized[offset:]
+            for end in range(1, len(suffix) + 1):
+                prefix = suffix[:end]
+                top = self._top.get(prefix)
+                if top is not None and prefix not in seen:
+                    seen.add(prefix)
+                    yield prefix, top
+
+    def _promote(self, entry: int) -> None:
+        # A contagem so subiu: basta ver se o valor entra (ou sobe) em cada top-k guardado.
+        ranks = self.ranks
+        for _prefix, top in self._cached_prefixes(entry):
+            if entry not in top:
+                if len(top) >= MAX_LIMIT and ranks[entry] <= ranks[top[-1]]:
+                    continue
+                top.append(entry)
+            top.sort(key=ranks.__getitem__, reverse=True)
+            del top[MAX_LIMIT:]
+
+    def _forget(self, entry: int) -> None:
+        # A contagem caiu: quem estava fora pode passar a frente, entao o top-k e recalculado depois.
+        for prefix, top in list(self._cached_prefixes(entry)):
+            if entry in top:
+                del self._top[prefix]
+
+    # -- leitura ------------------------------------------------------------
+
+    def _range(self, keys: array, prefix: str) -> array:
+        low = bisect_left(keys, prefix, key=self._suffix)
+        return keys[low : bisect_left(keys, prefix + _MAX_CHAR, low, key=self._suffix)]
+
+    def _best(self, matches: Iterable[array], limit: int) -> list[int]:
+        entries = {key >> _OFFSET_BITS for keys in matches for key in keys}
+        return heapq.nlargest(limit, entries, key=self.ranks.__getitem__)
+
+    def complete(self, prefix: str, limit: int) -> list[dict[str, Any]]:
+        """Sugestoes para um prefixo ja normalizado, mais frequentes primeiro."""
+
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None:
+                matches = (self._range(self.keys, prefix), self._range(self.recent, prefix))
+                if sum(map(len, matches)) <= SCAN_LIMIT:
+                    top = self._best(matches, limit)
+                else:
+                    top = self._top[prefix] = self._best(matches, MAX_LIMIT)
+            top = top[:limit]
+            return [
+                {"text": self.texts[entry], "field": FIELDS[self.fields[entry]], "count": self.counts[entry]}
+                for entry in top
+            ]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self),
+            "keys": len(self.keys) + len(self.recent),
+            "estimated_bytes": self.bytes,
+            "budget_bytes": self.budget_bytes,
+            "truncated": self.truncated,
+            "cached_prefixes": len(self._top),
+            "version": self.version,
+        }
+
+
+_index: PrefixIndex | None = None
+_build_lock = threading.Lock()
+_refreshing = False
+
+
+def build_index(db: Session) -> PrefixIndex:
+    started = time.perf_counter()
+    # Versao lida antes dos valores: escritas durante a leitura disparam o proximo refresh.
+    index = PrefixIndex(crud.get_catalog_version(db), int(get_settings().suggest_memory_mb * 1024 * 1024))
+    # Dos valores mais frequentes para os menos: quando o orcamento acaba, os raros ficam de fora.
+    for field, rows in (
+        (AUTHOR, stats.facet_counts(db, stats.AUTHOR)),
+        (PUBLISHER, stats.facet_counts(db, stats.PUBLISHER)),
+        (TITLE, crud.count_titles(db)),
+    ):
+        for value, count in rows:
+            if index.truncated:
+                break
+            if value:
+                index.load(field, value, count)
+    index.finish()
+    logger.info(
+        "Indice de sugestoes: %s valores, %s chaves, ~%.1f MiB em %.0f ms%s",
+        len(index),
+        len(index.keys),
+        index.bytes / 1024 / 1024,
+        (time.perf_counter() - started) * 1000,
+        " (orcamento esgotado: valores menos frequentes ficaram de fora)" if index.truncated else "",
+    )
+    return index
+
+
+def _session() -> Session:
+    # Import tardio: connection importa este pacote.
+    from backend.database.connection import ensure_db, read_sessionmaker
+
+    ensure_db()
+    return read_sessionmaker()()
+
+
+def _build() -> PrefixIndex:
+    global _index
+    with _build_lock:
+        if _index is None:
+            with _session() as db:
+                index = build_index(db)
+            # Escritas commitadas durante a construcao nao tinham indice para receber a nota:
+            # a primeira consulta ja checa a versao, sem esperar SUGGEST_REFRESH_SECONDS.
+            index.checked_at = float("-inf")
+            _index = index
+        return _index
+
+
+def _build_quietly() -> None:
+    try:
+        _build()
+    except Exception:  # pragma: no cover - a primeira sugestao tenta de novo
+        logger.exception("Falha ao construir o indice de sugestoes")
+
+
+def warm_up() -> None:
+    """Constroi o indice em segundo plano (start da API e do MCP)."""
+
+    if _index is None:
+        threading.Thread(target=_build_quietly, name="suggest-index-build", daemon=True).start()
+
+
+def _refresh_in_background(index: PrefixIndex) -> None:
+    global _refreshing
+
+    def run() -> None:
+        global _index, _refreshing
+        try:
+            with _session() as db:
+                if crud.get_catalog_version(db) != index.version:
+                    _index = build_index(db)
+        except Exception:  # pragma: no cover - o indice antigo continua servindo
+            logger.exception("Falha ao reconstruir o indice de sugestoes")
+        finally:
+            _refreshing = False
+
+    _refreshing = True
+    threading.Thread(target=run, name="suggest-index-refresh", daemon=True).start()
+
+
+def ready() -> bool:
+    """Se o indice ja existe (`complete` responde sem ir ao banco)."""
+
+    return _index is not None
+
+
+def get_index() -> PrefixIndex:
+    """Indice atual; constroi na primeira chamada e agenda a checagem de versao."""
+
+    index = _index
+    if index is None:
+        return _build()
+    now = time.monotonic()
+    if not _refreshing and now - index.checked_at >= get_settings().suggest_refresh_seconds:
+        index.checked_at = now
+        _refresh_in_background(index)
+    return index
+
+
+def complete(prefix: str, *, limit: int = 10) -> list[dict[str, Any]]:
+    """Ate `limit` sugestoes ({text, field, count}) para o texto digitado."""
+
+    normalized = normalize(prefix)
+    if not normalized:
+        return []
+    if prefix[-1:].isspace():
+        # "senhor " completa a proxima palavra, nao "senhorita".
+        normalized += " "
+    return get_index().complete(normalized, min(max(limit, 1), MAX_LIMIT))
+
+
+def index_stats() -> dict[str, Any] | None:
+    """Tamanho, orcamento e versao do indice (None antes de construido)."""
+
+    index = _index
+    return index.stats() if index is not None else None
+
+
+def note_change(db: Session, before: Values | None, after: Values | None) -> None:
+    """Registra (titulo, autor, editora) de um livro antes/depois da escrita; aplicado apos o commit."""
+
+    if _index is None:
+        return
+    db.info.setdefault(_PENDING_KEY, []).append((before, after))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        # RELEASE de um SAVEPOINT tambem dispara after_commit; espera o commit de fora.
+        return
+    changes = session.info.pop(_PENDING_KEY, None)
+    index = _index
+    if changes and index is not None:
+        index.apply(changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction: Any) -> None:
+    # SAVEPOINT desfeito (uma operacao do lote) nao descarta as escritas ja feitas no lote.
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,180 @@
+"""Group commit: agrupa escritas concorrentes numa unica transacao.
+
+No SQLite os escritores sao serializados e cada commit custa um fsync, entao
+a vazao de escrita para em algumas centenas por segundo mesmo com CPU livre.
+Com `WRITE_COALESCING=true`, `create/update/delete` deixam de abrir uma
+transacao propria: sao enfileirados para uma thread escritora, que junta o
+que chegar em ate `WRITE_COALESCE_WINDOW_MS` (ou `WRITE_COALESCE_MAX_BATCH`
+operacoes), executa cada uma num SAVEPOINT e faz um unico commit. Cada
+chamador recebe o proprio resultado ou a propria excecao, sempre depois do
+commit.
+
+Se o commit do grupo falhar, as operacoes sao refeitas uma a uma, cada qual
+com sua transacao, para que um erro nao contamine as demais. Os indices em
+memoria so recebem as notas das escritas no `after_commit` da transacao de
+fora, entao a tentativa desfeita nao deixa rastro e a repeticao nao as
+aplica duas vezes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextvars import Context, copy_context
+from dataclasses import dataclass, field
+from typing import Any, Callable, TypeVar
+
+from sqlalchemy.orm import Session, sessionmaker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+@dataclass
+class _PendingWrite:
+    fn: Callable[..., Any]
+    args: tuple[Any, ...]
+    kwargs: dict[str, Any]
+    future: Future = field(default_factory=Future)
+    context: Context = field(default_factory=copy_context)
+    result: Any = None
+    error: BaseException | None = None
+
+    def call(self, session: Session) -> None:
+        # Roda no contexto do chamador (metricas por requisicao continuam valendo).
+        self.result = self.context.run(self.fn, session, *self.args, **self.kwargs)
+
+
+class WriteCoalescer:
+    """Thread escritora que aplica operacoes enfileiradas em grupos."""
+
+    def __init__(self, session_factory: sessionmaker, *, window_ms: float, max_batch: int) -> None:
+        self.session_factory = session_factory
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_batch = max(max_batch, 1)
+        self.batches = 0
+        self.writes = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="write-coalescer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> Future:
+        """Enfileira `fn(session, *args, **kwargs)`; o Future resolve apos o commit."""
+
+        self._ensure_started()
+        pending = _PendingWrite(fn, args, kwargs)
+        self._queue.put(pending)
+        return pending.future
+
+    def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Versao bloqueante de `submit` (threads do MCP, scripts)."""
+
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run_async(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Aguarda o resultado sem ocupar thread nem bloquear o event loop."""
+
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _collect(self, first: _PendingWrite) -> tuple[list[_PendingWrite], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            # O que chegou durante o commit anterior ja esta na fila e entra
+            # sem espera; fora isso, espera no maximo ate o fim da janela.
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch, stop = self._collect(first)
+            batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    self._apply(batch)
+                except BaseException as exc:  # pragma: no cover - protege a thread escritora
+                    logger.exception("Falha inesperada no group commit")
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(exc)
+            if stop:
+                return
+
+    def _apply(self, batch: list[_PendingWrite]) -> None:
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            for item in batch:
+                try:
+                    with session.begin_nested():
+                        item.call(session)
+                except Exception as exc:
+                    item.error = exc
+            session.commit()
+        except Exception:
+            session.rollback()
+            logger.warning("Commit do grupo (%s escritas) falhou; refazendo individualmente", len(batch))
+            self._apply_individually(batch)
+            return
+        finally:
+            session.close()
+        self.batches += 1
+        self.writes += len(batch)
+        for item in batch:
+            if item.error is not None:
+                item.future.set_exception(item.error)
+            else:
+                item.future.set_result(item.result)
+
+    def _apply_individually(self, batch: list[_PendingWrite]) -> None:
+        for item in batch:
+            session = self.session_factory(expire_on_commit=False)
+            try:
+                item.call(session)
+                session.commit()
+            except Exception as exc:
+                session.rollback()
+                item.future.set_exception(exc)
+            else:
+                item.future.set_result(item.result)
+            finally:
+                session.close()
+            self.batches += 1
+            self.writes += 1
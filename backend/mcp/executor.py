@@ -0,0 +1,153 @@
+"""Execucao das tools MCP fora do event loop, com limites por tool.
+
+As tools do `MCPBookTools` sao sincronas (abrem `get_db()` e fazem SQL
+bloqueante). Registradas direto no FastMCP, elas rodariam no event loop do
+transporte streamable-http e uma busca lenta travaria todos os agentes.
+
+O `ToolExecutor` roda cada chamada num pool de threads limitado e aplica,
+por tool, um teto de execucoes simultaneas, uma fila de espera com tamanho
+maximo e timeouts (na fila e na execucao). Os limites vem da secao
+`execution` e de cada item de `endpoints` no `config_mcp.json`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ToolBusyError(RuntimeError):
+    """Fila da tool cheia: o cliente deve tentar de novo mais tarde."""
+
+
+class ToolTimeoutError(TimeoutError):
+    """A tool esperou demais na fila ou excedeu o tempo de execucao."""
+
+
+@dataclass(frozen=True)
+class ToolLimits:
+    """Limites de uma tool; campos ausentes herdam da secao `execution` (`null` desliga o timeout)."""
+
+    max_concurrency: int = 8
+    max_queue: int = 64
+    queue_timeout_seconds: float | None = 10.0
+    timeout_seconds: float | None = 30.0
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], base: ToolLimits | None = None) -> ToolLimits:
+        base = base or cls()
+        names = ("max_concurrency", "max_queue", "queue_timeout_seconds", "timeout_seconds")
+        limits = replace(base, **{name: data[name] for name in names if name in data})
+        if limits.max_concurrency < 1 or limits.max_queue < 0:
+            raise ValueError("max_concurrency must be >= 1 and max_queue >= 0")
+        return limits
+
+
+class ToolExecutor:
+    """Pool de threads compartilhado + semaforo e fila limitada por tool."""
+
+    def __init__(
+        self,
+        *,
+        max_workers: int = 16,
+        defaults: ToolLimits | None = None,
+        overrides: dict[str, ToolLimits] | None = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.defaults = defaults or ToolLimits()
+        self.overrides = overrides or {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._waiting: dict[str, int] = {}
+        self._running: dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> ToolExecutor:
+        """Le `execution` (padroes + `max_workers`) e os limites de cada endpoint."""
+
+        execution = config.get("execution", {})
+        defaults = ToolLimits.from_dict(execution)
+        overrides = {
+            endpoint["name"]: ToolLimits.from_dict(endpoint, defaults)
+            for endpoint in config.get("endpoints", [])
+        }
+        return cls(max_workers=execution.get("max_workers", 16), defaults=defaults, overrides=overrides)
+
+    def limits(self, name: str) -> ToolLimits:
+        return self.overrides.get(name, self.defaults)
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            semaphore = self._semaphores[name] = asyncio.Semaphore(self.limits(name).max_concurrency)
+        return semaphore
+
+    async def run(self, name: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Executa `fn` no pool respeitando os limites da tool `name`."""
+
+        limits = self.limits(name)
+        semaphore = self._semaphore(name)
+        if semaphore.locked():
+            await self._wait_for_slot(name, semaphore, limits)
+        else:
+            await semaphore.acquire()
+
+        loop = asyncio.get_running_loop()
+        self._running[name] = self._running.get(name, 0) + 1
+
+        def release(_future: Any) -> None:
+            # O slot so volta quando a thread termina, mesmo apos timeout do cliente.
+            try:
+                loop.call_soon_threadsafe(self._release, name, semaphore)
+            except RuntimeError:  # loop ja encerrado (shutdown)
+                pass
+
+        # copy_context: metricas/ContextVars da chamada seguem para a thread.
+        future = self._pool.submit(copy_context().run, partial(fn, *args, **kwargs))
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=limits.timeout_seconds)
+        except asyncio.TimeoutError as exc:
+            logger.warning("Tool %s excedeu %ss", name, limits.timeout_seconds)
+            raise ToolTimeoutError(f"Tool '{name}' timed out after {limits.timeout_seconds}s") from exc
+
+    async def _wait_for_slot(self, name: str, semaphore: asyncio.Semaphore, limits: ToolLimits) -> None:
+        waiting = self._waiting.get(name, 0)
+        if waiting >= limits.max_queue:
+            raise ToolBusyError(
+                f"Tool '{name}' is busy ({limits.max_concurrency} running, {waiting} queued); retry later"
+            )
+        self._waiting[name] = waiting + 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=limits.queue_timeout_seconds)
+        except asyncio.TimeoutError as exc:
+            raise ToolTimeoutError(
+                f"Tool '{name}' waited more than {limits.queue_timeout_seconds}s for a free slot"
+            ) from exc
+        finally:
+            self._waiting[name] -= 1
+
+    def _release(self, name: str, semaphore: asyncio.Semaphore) -> None:
+        self._running[name] -= 1
+        semaphore.release()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Execucoes em andamento e chamadas na fila, por tool."""
+
+        names = set(self._running) | set(self._waiting)
+        return {
+            name: {"running": self._running.get(name, 0), "queued": self._waiting.get(name, 0)}
+            for name in sorted(names)
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping, Sequence
 
-from backend.database.connection import get_db
+from backend import metrics
+from backend.database.connection import get_db, get_read_db, run_write
+from backend.serialization import parse_fields, project, to_jsonable
 from backend.services import book_service
 
 
@@ -15,9 +17,17 @@ class MCPBookTools:
     facilitar a serializacao e o consumo pelos agentes MCP.
     """
 
-    def _to_dict(self, obj: Any) -> Dict[str, Any]:
+    def _to_dict(self, obj: Any, fields: Sequence[str] | None = None) -> Dict[str, Any]:
+        with metrics.serialization():
+            return self._as_dict(obj, fields)
+
+    @staticmethod
+    def _as_dict(obj: Any, fields: Sequence[str] | None = None) -> Dict[str, Any]:
+        if isinstance(obj, Mapping):
+            # Linhas de listagem/busca: mesmo formato do Book.to_dict.
+            return to_jsonable(project(obj, fields))
         if hasattr(obj, "to_dict"):
-            return obj.to_dict()
+            return dict(project(obj.to_dict(), fields))
         data = obj.__dict__.copy()
         data.pop("_sa_instance_state", None)
         return data
@@ -33,15 +43,25 @@ class MCPBookTools:
 
         if not title or not title.strip():
             raise ValueError("Title is required")
+        book = run_write(
+            book_service.create_book,
+            title=title,
+            author=author,
+            publisher=publisher,
+            purchase_link=purchase_link,
+        )
+        return self._to_dict(book)
+
+    def books_bulk_add(self, books: List[Dict[str, Any]], batch_size: int | None = None) -> Dict[str, Any]:
+        """Cadastra varios livros de uma vez (mesmas regras do `books_add`).
+
+        Retorna `{"inserted", "failed", "errors"}`; cada erro traz o indice do
+        item rejeitado, e os demais sao gravados normalmente.
+        """
+
         with get_db() as db:
-            book = book_service.create_book(
-                db,
-                title=title,
-                author=author,
-                publisher=publisher,
-                purchase_link=purchase_link,
-            )
-            return self._to_dict(book)
+            result = book_service.bulk_create_books(db, books, batch_size=batch_size)
+        return result.to_dict()
 
     def books_update(
         self,
@@ -50,46 +70,201 @@ class MCPBookTools:
         author: str | None = None,
         publisher: str | None = None,
         purchase_link: str | None = None,
+        expected_version: int | None = None,
+    ) -> Dict[str, Any]:
+        """Atualiza campos de um livro existente.
+
+        `expected_version` (campo `version` lido antes) faz a tool falhar se
+        outro cliente alterou o livro nesse meio tempo.
+        """
+
+        book = run_write(
+            book_service.update_book,
+            book_id,
+            title=title,
+            author=author,
+            publisher=publisher,
+            purchase_link=purchase_link,
+            expected_version=expected_version,
+        )
+        return self._to_dict(book)
+
+    def books_delete(self, book_id: int, expected_version: int | None = None) -> Dict[str, Any]:
+        """Remove um livro e confirma o ID deletado."""
+
+        run_write(book_service.delete_book, book_id, expected_version=expected_version)
+        return {"deleted": True, "id": book_id}
+
+    def books_bulk_update(
+        self,
+        where: Dict[str, Any],
+        title: str | None = None,
+        author: str | None = None,
+        publisher: str | None = None,
+        purchase_link: str | None = None,
+        dry_run: bool = False,
+        max_rows: int | None = None,
     ) -> Dict[str, Any]:
-        """Atualiza campos de um livro existente."""
+        """Aplica os campos informados a todos os livros que casam com `where`.
+
+        `where` aceita `query` (regra da busca), `title`, `author` e `publisher`
+        (igualdade exata). Retorna `{"matched", "affected", "chunks", "max_rows",
+        "dry_run"}`; acima de `max_rows` nada e alterado.
+        """
 
         with get_db() as db:
-            book = book_service.update_book(
+            result = book_service.update_books_where(
                 db,
-                book_id,
+                book_service.BookFilter.from_dict(where),
                 title=title,
                 author=author,
                 publisher=publisher,
                 purchase_link=purchase_link,
+                dry_run=dry_run,
+                max_rows=max_rows,
             )
-            return self._to_dict(book)
+        return result.to_dict()
 
-    def books_delete(self, book_id: int) -> Dict[str, Any]:
-        """Remove um livro e confirma o ID deletado."""
+    def books_bulk_delete(
+        self, where: Dict[str, Any], dry_run: bool = False, max_rows: int | None = None
+    ) -> Dict[str, Any]:
+        """Remove todos os livros que casam com `where` (mesmos filtros e resumo do `books_bulk_update`)."""
 
         with get_db() as db:
-            book_service.delete_book(db, book_id)
-        return {"deleted": True, "id": book_id}
+            result = book_service.delete_books_where(
+                db, book_service.BookFilter.from_dict(where), dry_run=dry_run, max_rows=max_rows
+            )
+        return result.to_dict()
 
-    def books_get(self, book_id: int) -> Dict[str, Any]:
-        """Retorna um livro unico."""
+    def books_get(self, book_id: int, fields: List[str] | None = None) -> Dict[str, Any]:
+        """Retorna um livro unico (so os campos de `fields`, se informado)."""
 
-        with get_db() as db:
+        selected = parse_fields(fields)
+        with get_read_db() as db:
             book = book_service.get_book(db, book_id)
-            return self._to_dict(book)
+            return self._to_dict(book, selected)
+
+    def books_get_many(self, ids: List[int], fields: List[str] | None = None) -> Dict[str, Any]:
+        """Retorna varios livros numa unica consulta (`WHERE id IN (...)`).
 
-    def books_list(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
-        """Lista livros paginados (mais recentes primeiro)."""
+        Resposta: `{"items": [...], "missing": [ids nao encontrados]}`, com os
+        itens na ordem dos IDs pedidos.
+        """
+
+        selected = parse_fields(fields)
+        with get_read_db() as db:
+            books, missing = book_service.get_books(db, ids)
+        with metrics.serialization():
+            items = [self._as_dict(book, selected) for book in books]
+        return {"items": items, "missing": missing}
+
+    def books_batch(self, operations: List[Dict[str, Any]], atomic: bool = False) -> Dict[str, Any]:
+        """Aplica varias operacoes add/update/delete numa unica transacao.
+
+        Cada operacao e um objeto com `op` (`add`, `update` ou `delete`) e os
+        mesmos campos das tools individuais (`book_id`, `title`...,
+        `expected_version`). Retorna um resultado por operacao; com
+        `atomic=True` qualquer falha desfaz o lote inteiro (`committed=False`).
+        """
 
         with get_db() as db:
-            books = book_service.list_books(db, limit=limit, offset=offset)
-            return [self._to_dict(book) for book in books]
+            result = book_service.apply_batch(db, operations, atomic=atomic)
+        return result.to_dict()
+
+    def books_changes(self, since: int = 0, limit: int = 500) -> Dict[str, Any]:
+        """Mudancas desde `since` (delta sync): livros criados/alterados e lapides de removidos.
+
+        Retorna `{"items": [{"seq", "op", "id", "book"}], "next_since", "has_more"}`;
+        `book` e nulo quando `op` e `delete`. Use `next_since` na chamada seguinte.
+        """
+
+        with get_read_db() as db:
+            page = book_service.list_changes(db, since=since, limit=limit)
+        with metrics.serialization():
+            for item in page.items:
+                if item["book"] is not None:
+                    item["book"] = to_jsonable(item["book"])
+        return page.to_dict()
+
+    def books_stats(self, top: int = 20, days: int = 30) -> Dict[str, Any]:
+        """Total de livros, autores/editoras mais frequentes e cadastros por dia.
+
+        Nao percorre o catalogo: le a tabela de resumo mantida a cada escrita.
+        """
+
+        with get_read_db() as db:
+            return book_service.catalog_stats(db, top=top, days=days)
+
+    def books_suggest(self, prefix: str, limit: int = 10) -> Dict[str, Any]:
+        """Completa titulos, autores e editoras pelo texto digitado.
+
+        Retorna `{"items": [{"text", "field", "count"}, ...]}`, mais frequentes
+        primeiro; vem de um indice em memoria, sem consultar o banco.
+        """
+
+        return {"items": book_service.suggest_books(prefix, limit=limit)}
+
+    def _page_to_dict(self, page: book_service.BookPage, fields: Sequence[str] | None = None) -> Dict[str, Any]:
+        with metrics.serialization():
+            items = [self._as_dict(book, fields) for book in page.items]
+        return {"items": items, "next_cursor": page.next_cursor}
+
+    def _rows_to_list(self, rows: Sequence[Any], fields: Sequence[str] | None) -> List[Dict[str, Any]]:
+        with metrics.serialization():
+            return [self._as_dict(book, fields) for book in rows]
+
+    def books_list(self, limit: int = 100, offset: int = 0, fields: List[str] | None = None) -> List[Dict[str, Any]]:
+        """Lista livros paginados por offset (mais recentes primeiro).
 
-    def books_search(self, query: str, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
-        """Busca livros por palavra-chave."""
+        `fields` (ex.: `["id", "title"]`) limita os campos de cada item. Para
+        percorrer o catalogo inteiro, prefira `books_list_page` (cursor).
+        """
+
+        selected = parse_fields(fields)
+        with get_read_db() as db:
+            return self._rows_to_list(book_service.list_books(db, limit=limit, offset=offset), selected)
+
+    def books_list_page(
+        self, limit: int = 100, cursor: str | None = None, fields: List[str] | None = None
+    ) -> Dict[str, Any]:
+        """Lista livros por cursor (custo constante em qualquer profundidade).
+
+        Retorna `{"items": [...], "next_cursor": ...}`; passe `next_cursor`
+        na chamada seguinte para continuar de onde parou.
+        """
+
+        selected = parse_fields(fields)
+        with get_read_db() as db:
+            return self._page_to_dict(book_service.list_books_page(db, limit=limit, cursor=cursor), selected)
+
+    def books_search(
+        self,
+        query: str,
+        limit: int = 100,
+        offset: int = 0,
+        mode: str = "default",
+        fields: List[str] | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Busca livros por palavra-chave, paginada por offset (mesmo `fields` de `books_list`).
+
+        `mode="fuzzy"` tolera erros de digitacao.
+        """
 
         if not query or not query.strip():
             raise ValueError("Query must contain at least one character")
-        with get_db() as db:
-            books = book_service.search_books(db, query=query, limit=limit, offset=offset)
-            return [self._to_dict(book) for book in books]
+        selected = parse_fields(fields)
+        with get_read_db() as db:
+            books = book_service.search_books(db, query=query, limit=limit, offset=offset, mode=mode)
+            return self._rows_to_list(books, selected)
+
+    def books_search_page(
+        self, query: str, limit: int = 100, cursor: str | None = None, fields: List[str] | None = None
+    ) -> Dict[str, Any]:
+        """Busca por cursor, ordenada por relevancia (mesmo envelope de `books_list_page`)."""
+
+        if not query or not query.strip():
+            raise ValueError("Query must contain at least one character")
+        selected = parse_fields(fields)
+        with get_read_db() as db:
+            page = book_service.search_books_page(db, query=query, limit=limit, cursor=cursor)
+            return self._page_to_dict(page, selected)
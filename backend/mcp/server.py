@@ -10,25 +10,49 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Literal
 
 from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 
-from backend.database.connection import init_db
+from backend import metrics
+from backend.database import memory_replica, routing, suggest
+from backend.config import get_settings
+from backend.database.connection import init_db, stop_write_coalescer
+from backend.mcp.executor import ToolExecutor
 from backend.mcp.mcp_tools import MCPBookTools
+from backend.services.book_service import ChangesUnsupportedError
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 CONFIG_PATH = Path(__file__).with_name("config_mcp.json")
-with CONFIG_PATH.open("r", encoding="utf-8") as fp:
-    CONFIG = json.load(fp)
+
+
+@lru_cache()
+def load_config() -> dict[str, Any]:
+    """Le `config_mcp.json` na primeira chamada, nao no import."""
+
+    with CONFIG_PATH.open("r", encoding="utf-8") as fp:
+        return json.load(fp)
+
+
+def __getattr__(name: str) -> Any:
+    # Compatibilidade com `from backend.mcp.server import CONFIG`.
+    if name == "CONFIG":
+        return load_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def is_tool_enabled(name: str) -> bool:
     """Verifica no JSON se a tool esta habilitada."""
 
-    for endpoint in CONFIG.get("endpoints", []):
+    for endpoint in load_config().get("endpoints", []):
         if endpoint["name"] == name:
             return endpoint.get("enabled", False)
     return False
@@ -37,76 +61,222 @@ def is_tool_enabled(name: str) -> bool:
 def get_tool_description(name: str) -> str:
     """Texto auxiliar exibido para o cliente MCP."""
 
-    for endpoint in CONFIG.get("endpoints", []):
+    for endpoint in load_config().get("endpoints", []):
         if endpoint["name"] == name:
             return endpoint.get("description", "")
     return ""
 
 
-def register_tools(server: FastMCP, tools: MCPBookTools) -> None:
-    """Liga declaracoes do JSON aos metodos de MCPBookTools."""
+def register_tools(server: FastMCP, tools: MCPBookTools, executor: ToolExecutor | None = None) -> ToolExecutor:
+    """Liga declaracoes do JSON aos metodos de MCPBookTools.
+
+    As tools sao `async` e delegam ao `ToolExecutor`: o SQL bloqueante roda no
+    pool de threads, nunca no event loop do transporte.
+    """
+
+    executor = executor or ToolExecutor.from_config(load_config())
+    run = executor.run
 
     if is_tool_enabled("books_add"):
         @server.tool(name="books_add", description=get_tool_description("books_add"))
-        def tool_books_add(
+        async def tool_books_add(
             title: str,
             author: str | None = None,
             publisher: str | None = None,
             purchase_link: str | None = None,
         ):
-            return tools.books_add(title, author, publisher, purchase_link)
+            return await run("books_add", tools.books_add, title, author, publisher, purchase_link)
+
+    if is_tool_enabled("books_bulk_add"):
+        @server.tool(name="books_bulk_add", description=get_tool_description("books_bulk_add"))
+        async def tool_books_bulk_add(books: list[dict], batch_size: int | None = None):
+            return await run("books_bulk_add", tools.books_bulk_add, books, batch_size)
 
     if is_tool_enabled("books_update"):
         @server.tool(name="books_update", description=get_tool_description("books_update"))
-        def tool_books_update(
+        async def tool_books_update(
             book_id: int,
             title: str | None = None,
             author: str | None = None,
             publisher: str | None = None,
             purchase_link: str | None = None,
+            expected_version: int | None = None,
         ):
-            return tools.books_update(book_id, title, author, publisher, purchase_link)
+            return await run(
+                "books_update", tools.books_update, book_id, title, author, publisher, purchase_link, expected_version
+            )
 
     if is_tool_enabled("books_delete"):
         @server.tool(name="books_delete", description=get_tool_description("books_delete"))
-        def tool_books_delete(book_id: int):
-            return tools.books_delete(book_id)
+        async def tool_books_delete(book_id: int, expected_version: int | None = None):
+            return await run("books_delete", tools.books_delete, book_id, expected_version)
+
+    if is_tool_enabled("books_bulk_update"):
+        @server.tool(name="books_bulk_update", description=get_tool_description("books_bulk_update"))
+        async def tool_books_bulk_update(
+            where: dict,
+            title: str | None = None,
+            author: str | None = None,
+            publisher: str | None = None,
+            purchase_link: str | None = None,
+            dry_run: bool = False,
+            max_rows: int | None = None,
+        ):
+            return await run(
+                "books_bulk_update", tools.books_bulk_update, where, title, author, publisher, purchase_link,
+                dry_run, max_rows,
+            )
+
+    if is_tool_enabled("books_bulk_delete"):
+        @server.tool(name="books_bulk_delete", description=get_tool_description("books_bulk_delete"))
+        async def tool_books_bulk_delete(where: dict, dry_run: bool = False, max_rows: int | None = None):
+            return await run("books_bulk_delete", tools.books_bulk_delete, where, dry_run, max_rows)
 
     if is_tool_enabled("books_get"):
         @server.tool(name="books_get", description=get_tool_description("books_get"))
-        def tool_books_get(book_id: int):
-            return tools.books_get(book_id)
+        async def tool_books_get(book_id: int, fields: list[str] | None = None):
+            return await run("books_get", tools.books_get, book_id, fields)
+
+    if is_tool_enabled("books_get_many"):
+        @server.tool(name="books_get_many", description=get_tool_description("books_get_many"))
+        async def tool_books_get_many(ids: list[int], fields: list[str] | None = None):
+            return await run("books_get_many", tools.books_get_many, ids, fields)
+
+    if is_tool_enabled("books_batch"):
+        @server.tool(name="books_batch", description=get_tool_description("books_batch"))
+        async def tool_books_batch(operations: list[dict], atomic: bool = False):
+            return await run("books_batch", tools.books_batch, operations, atomic)
 
     if is_tool_enabled("books_list"):
         @server.tool(name="books_list", description=get_tool_description("books_list"))
-        def tool_books_list(limit: int = 100, offset: int = 0):
-            return tools.books_list(limit, offset)
+        async def tool_books_list(limit: int = 100, offset: int = 0, fields: list[str] | None = None):
+            return await run("books_list", tools.books_list, limit, offset, fields)
+
+    if is_tool_enabled("books_list_page"):
+        @server.tool(name="books_list_page", description=get_tool_description("books_list_page"))
+        async def tool_books_list_page(limit: int = 100, cursor: str | None = None, fields: list[str] | None = None):
+            return await run("books_list_page", tools.books_list_page, limit, cursor, fields)
 
     if is_tool_enabled("books_search"):
         @server.tool(name="books_search", description=get_tool_description("books_search"))
-        def tool_books_search(query: str, limit: int = 100, offset: int = 0):
-            return tools.books_search(query, limit, offset)
+        async def tool_books_search(
+            query: str,
+            limit: int = 100,
+            offset: int = 0,
+            mode: Literal["default", "fuzzy"] = "default",
+            fields: list[str] | None = None,
+        ):
+            return await run("books_search", tools.books_search, query, limit, offset, mode, fields)
 
+    if is_tool_enabled("books_search_page"):
+        @server.tool(name="books_search_page", description=get_tool_description("books_search_page"))
+        async def tool_books_search_page(
+            query: str, limit: int = 100, cursor: str | None = None, fields: list[str] | None = None
+        ):
+            return await run("books_search_page", tools.books_search_page, query, limit, cursor, fields)
 
-def main() -> None:
-    """Entry point chamado por `python run_mcp_server.py`."""
+    if is_tool_enabled("books_suggest"):
+        @server.tool(name="books_suggest", description=get_tool_description("books_suggest"))
+        async def tool_books_suggest(prefix: str, limit: int = 10):
+            return await run("books_suggest", tools.books_suggest, prefix, limit)
 
-    server_info = CONFIG["server"]
-    logger.info("Iniciando MCP Server %s v%s", server_info["name"], server_info["version"])
-    init_db()
-    logger.info("Banco inicializado")
+    if is_tool_enabled("books_changes"):
+        @server.tool(name="books_changes", description=get_tool_description("books_changes"))
+        async def tool_books_changes(since: int = 0, limit: int = 500):
+            try:
+                return await run("books_changes", tools.books_changes, since, limit)
+            except ChangesUnsupportedError as exc:
+                # Equivalente ao 501 do REST: erro esperado, mensagem sempre visivel ao cliente.
+                raise ToolError(str(exc)) from exc
 
+    if is_tool_enabled("books_stats"):
+        @server.tool(name="books_stats", description=get_tool_description("books_stats"))
+        async def tool_books_stats(top: int = 20, days: int = 30):
+            return await run("books_stats", tools.books_stats, top, days)
+
+    return executor
+
+
+class MetricsMiddleware(Middleware):
+    """Mede cada chamada de tool (latencia, queries, tempo de banco e serializacao)."""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext):
+        with metrics.track("mcp", context.message.name):
+            return await call_next(context)
+
+
+class ClientScopeMiddleware(Middleware):
+    """Identifica o cliente pela sessao MCP para a janela read-your-writes."""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext):
+        session_id = context.fastmcp_context.session_id if context.fastmcp_context else None
+        with routing.client_scope(f"mcp:{session_id}" if session_id else None):
+            return await call_next(context)
+
+
+def install_metrics(server: FastMCP, *, route: bool = True) -> None:
+    """Liga o middleware de metricas e expoe `/metrics` no mesmo host/porta do MCP.
+
+    Montado dentro da API (`route=False`), o `/metrics` da API ja inclui as tools.
+    """
+
+    server.add_middleware(MetricsMiddleware())
+    if not route:
+        return
+
+    @server.custom_route(metrics.METRICS_PATH, methods=["GET"])
+    async def metrics_endpoint(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def create_server(*, metrics_route: bool = True) -> tuple[FastMCP, ToolExecutor]:
+    """Monta o FastMCP com as tools habilitadas e os middlewares ativos na config.
+
+    Usado pelo `main` (processo proprio) e pela API quando `MOUNT_MCP=true`.
+    """
+
+    mcp_config = load_config()
+    server_info = mcp_config["server"]
     server = FastMCP(server_info["name"], version=server_info["version"])
-    tools = MCPBookTools()
-    register_tools(server, tools)
+    executor = register_tools(server, MCPBookTools())
+    logger.info("Pool de execucao das tools: %s threads", executor.max_workers)
+    if routing.window() > 0:
+        server.add_middleware(ClientScopeMiddleware())
+    if metrics.enabled():
+        install_metrics(server, route=metrics_route)
 
-    enabled = [endpoint["name"] for endpoint in CONFIG["endpoints"] if endpoint.get("enabled", False)]
+    enabled = [endpoint["name"] for endpoint in mcp_config["endpoints"] if endpoint.get("enabled", False)]
     logger.info("Tools habilitadas: %s", ", ".join(enabled) or "nenhuma")
+    return server, executor
+
+
+def main() -> None:
+    """Entry point chamado por `python run_mcp_server.py`."""
+
+    server_info = load_config()["server"]
+    logger.info("Iniciando MCP Server %s v%s", server_info["name"], server_info["version"])
+    settings = get_settings()
+    if settings.lazy_init:
+        logger.info("LAZY_INIT: banco sera inicializado na primeira tool")
+    else:
+        init_db()
+        logger.info("Banco inicializado")
+        if settings.suggest_warmup:
+            suggest.warm_up()
+        if settings.memory_replica:
+            memory_replica.warm_up()
+
+    server, executor = create_server()
+    if metrics.enabled():
+        logger.info("Metricas em http://%s:%s%s", server_info["host"], server_info["port"], metrics.METRICS_PATH)
 
     try:
         server.run(transport="streamable-http", host=server_info["host"], port=server_info["port"])
     except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("MCP Server interrompido pelo usuario. Encerrando com seguranca.")
+    finally:
+        executor.shutdown(wait=False)
+        stop_write_coalescer()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,332 @@
+"""Metricas no formato texto do Prometheus (API REST e MCP Server).
+
+Registro minimo (contadores, gauges e histogramas com labels), sem
+dependencia externa. Cada processo expoe as proprias metricas em `/metrics`.
+
+Por requisicao/tool guardamos um `RequestStats` num ContextVar: os listeners
+`before/after_cursor_execute` do SQLAlchemy somam ali as queries e o tempo de
+banco, inclusive quando o trabalho roda no threadpool (anyio copia o contexto)
+ou via `run_sync` no modo async. Com `METRICS_ENABLED=false` (padrao) nada e
+instalado: sem middleware, sem listeners e sem `/metrics`.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from sqlalchemy import Engine, event
+
+from backend.config import get_settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_PATH = "/metrics"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}" for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Por serie: contagem por bucket (nao cumulativa), soma e total.
+        self._series: dict[tuple[str, ...], list[Any]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, ([*series[0]], series[1], series[2])) for key, series in self._series.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "books_request_duration_seconds",
+    "Latencia por rota HTTP ou tool MCP.",
+    ("channel", "name", "status"),
+)
+REQUESTS_IN_FLIGHT = Gauge("books_requests_in_flight", "Requisicoes/tools em andamento.", ("channel",))
+REQUEST_DB_QUERIES = Histogram(
+    "books_request_db_queries",
+    "Queries executadas por requisicao/tool.",
+    ("channel", "name"),
+    COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "books_request_db_seconds",
+    "Tempo no banco (cursor.execute) por requisicao/tool.",
+    ("channel", "name"),
+)
+REQUEST_SERIALIZATION_SECONDS = Histogram(
+    "books_request_serialization_seconds",
+    "Tempo de serializacao da resposta por requisicao/tool.",
+    ("channel", "name"),
+)
+DB_QUERIES = Counter("books_db_queries_total", "Queries executadas por tipo de comando.", ("operation",))
+DB_QUERY_SECONDS = Histogram(
+    "books_db_query_duration_seconds",
+    "Duracao de cada query por tipo de comando.",
+    ("operation",),
+)
+POOL_CHECKOUT_SECONDS = Histogram(
+    "books_db_pool_checkout_seconds",
+    "Espera para obter uma conexao do pool.",
+)
+POOL_CHECKED_OUT = Gauge("books_db_pool_checked_out", "Conexoes do pool em uso.")
+
+REGISTRY: list[_Metric] = [
+    REQUEST_DURATION,
+    REQUESTS_IN_FLIGHT,
+    REQUEST_DB_QUERIES,
+    REQUEST_DB_SECONDS,
+    REQUEST_SERIALIZATION_SECONDS,
+    DB_QUERIES,
+    DB_QUERY_SECONDS,
+    POOL_CHECKOUT_SECONDS,
+    POOL_CHECKED_OUT,
+]
+
+
+def render() -> str:
+    """Todas as metricas do processo no formato de exposicao texto."""
+
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class RequestStats:
+    """Acumuladores de uma requisicao/tool; `name` pode ser definido depois do roteamento."""
+
+    channel: str
+    name: str
+    status: str = "ok"
+    queries: int = 0
+    db_seconds: float = 0.0
+    serialization_seconds: float = 0.0
+    handler_done_at: float | None = field(default=None, repr=False)
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("books_request_stats", default=None)
+
+
+def enabled() -> bool:
+    return get_settings().metrics_enabled
+
+
+def current() -> RequestStats | None:
+    return _current.get()
+
+
+@contextmanager
+def track(channel: str, name: str) -> Iterator[RequestStats]:
+    """Mede uma requisicao/tool e registra os histogramas ao sair."""
+
+    stats = RequestStats(channel=channel, name=name)
+    token = _current.set(stats)
+    REQUESTS_IN_FLIGHT.inc(channel=channel)
+    started = time.perf_counter()
+    try:
+        yield stats
+    except BaseException:
+        stats.status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        REQUESTS_IN_FLIGHT.dec(channel=channel)
+        _current.reset(token)
+        REQUEST_DURATION.observe(elapsed, channel=channel, name=stats.name, status=stats.status)
+        REQUEST_DB_QUERIES.observe(stats.queries, channel=channel, name=stats.name)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, channel=channel, name=stats.name)
+        REQUEST_SERIALIZATION_SECONDS.observe(stats.serialization_seconds, channel=channel, name=stats.name)
+
+
+def mark_handler_done() -> None:
+    """Marca o fim do handler; o tempo ate o inicio da resposta conta como serializacao."""
+
+    stats = _current.get()
+    if stats is not None:
+        stats.handler_done_at = time.perf_counter()
+
+
+def mark_response_started() -> None:
+    stats = _current.get()
+    if stats is not None and stats.handler_done_at is not None:
+        stats.serialization_seconds += time.perf_counter() - stats.handler_done_at
+        stats.handler_done_at = None
+
+
+@contextmanager
+def serialization() -> Iterator[None]:
+    """Soma o bloco ao tempo de serializacao da requisicao atual (no-op fora de uma)."""
+
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialization_seconds += time.perf_counter() - started
+
+
+_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+_STARTS_KEY = "metrics_query_start"
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:6].upper()
+    return head if head in _OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault(_STARTS_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    starts = conn.info.get(_STARTS_KEY)
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    operation = _operation(statement)
+    DB_QUERIES.inc(operation=operation)
+    DB_QUERY_SECONDS.observe(elapsed, operation=operation)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def _on_checkout(*_args: Any) -> None:
+    POOL_CHECKED_OUT.inc()
+
+
+def _on_checkin(*_args: Any) -> None:
+    POOL_CHECKED_OUT.dec()
+
+
+def _time_pool_connect(target: Engine) -> None:
+    # O pool nao tem evento "antes do checkout"; medimos envolvendo `connect`
+    # da instancia (recolocado quando `dispose()` recria o pool, que herda os
+    # listeners de checkout/checkin).
+    pool = target.pool
+    original = pool.connect
+
+    def connect():
+        started = time.perf_counter()
+        try:
+            return original()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+    pool.connect = connect
+
+
+def instrument_engine(target: Engine) -> None:
+    """Instala os listeners de query e a medicao de checkout do pool."""
+
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target.pool, "checkout", _on_checkout)
+    event.listen(target.pool, "checkin", _on_checkin)
+    _time_pool_connect(target)
+    event.listen(target, "engine_disposed", _time_pool_connect)
@@ -0,0 +1,117 @@
+"""Caminho rapido de serializacao dos livros (REST e MCP).
+
+Listagens e buscas trazem do banco apenas as colunas de `BOOK_FIELDS` e
+montam dicts direto das tuplas do result set, sem hidratar objetos ORM nem
+revalidar cada linha com `BookOut`. O JSON sai de uma so vez via `orjson`
+(se instalado) ou de um `TypeAdapter` pre-compilado do pydantic, que tambem
+serializa em Rust, sem validacao.
+
+`Book.to_dict` e as tools MCP usam `to_jsonable`, entao os tres caminhos
+produzem exatamente os mesmos campos e formatos. Com `fields=` (REST e tools
+de leitura), `project` corta cada linha nos campos pedidos antes de
+serializar.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Iterable, Mapping, Optional, Sequence
+
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+BOOK_FIELDS = ("id", "title", "author", "publisher", "purchase_link", "created_at", "updated_at", "version")
+_DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+class BookRow(TypedDict):
+    """Formato de uma linha de livro (mesmos campos do `BookOut`)."""
+
+    id: int
+    title: str
+    author: Optional[str]
+    publisher: Optional[str]
+    purchase_link: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    version: int
+
+
+_ROW_ADAPTER = TypeAdapter(BookRow)
+_ROWS_ADAPTER = TypeAdapter(list[BookRow])
+
+
+def row_to_dict(row: Sequence[Any]) -> dict[str, Any]:
+    """Tupla do result set (colunas na ordem de `BOOK_FIELDS`) -> dict."""
+
+    return dict(zip(BOOK_FIELDS, row))
+
+
+def book_to_dict(book: Any) -> dict[str, Any]:
+    """Objeto com os atributos do livro (ORM ou transiente) -> dict."""
+
+    return {name: getattr(book, name) for name in BOOK_FIELDS}
+
+
+def parse_fields(fields: str | Iterable[str] | None) -> tuple[str, ...] | None:
+    """`fields` pedido ("id,title" ou lista) -> campos na ordem de `BOOK_FIELDS`; None = todos.
+
+    Dispara ValueError com campos desconhecidos.
+    """
+
+    if fields is None:
+        return None
+    names = fields.split(",") if isinstance(fields, str) else fields
+    requested = {name.strip() for name in names if name and name.strip()}
+    unknown = requested.difference(BOOK_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (use {', '.join(BOOK_FIELDS)})")
+    if not requested or len(requested) == len(BOOK_FIELDS):
+        return None
+    return tuple(name for name in BOOK_FIELDS if name in requested)
+
+
+def project(row: Mapping[str, Any], fields: Sequence[str] | None) -> Mapping[str, Any]:
+    """So os campos pedidos da linha (a propria linha com `fields` None)."""
+
+    if fields is None:
+        return row
+    return {name: row[name] for name in fields}
+
+
+def project_rows(rows: Sequence[Mapping[str, Any]], fields: Sequence[str] | None) -> Sequence[Mapping[str, Any]]:
+    if fields is None:
+        return rows
+    return [{name: row[name] for name in fields} for row in rows]
+
+
+def to_jsonable(row: Mapping[str, Any]) -> dict[str, Any]:
+    """Copia da linha com datas em ISO 8601 (formato das tools MCP)."""
+
+    data = dict(row)
+    for name in _DATETIME_FIELDS:
+        value = data.get(name)
+        if isinstance(value, datetime):
+            data[name] = value.isoformat()
+    return data
+
+
+def dumps_row(row: Mapping[str, Any]) -> bytes:
+    """Serializa uma linha em JSON (bytes), como `dumps_rows`."""
+
+    if orjson is not None:
+        return orjson.dumps(row)
+    return _ROW_ADAPTER.dump_json(row)
+
+
+def dumps_rows(rows: Sequence[Mapping[str, Any]]) -> bytes:
+    """Serializa uma lista de linhas em JSON (bytes) sem validar linha a linha."""
+
+    if orjson is not None:
+        return orjson.dumps(rows)
+    return _ROWS_ADAPTER.dump_json(rows)
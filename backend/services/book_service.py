@@ -7,18 +7,133 @@ o ideal e implementa-lo neste modulo.
 
 from __future__ import annotations
 
-from typing import Sequence
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Sequence
 
+from pydantic import ValidationError
+from sqlalchemy import ColumnElement, Row
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
-from backend.database import crud
+from backend.config import get_settings
+from backend.database import changes, crud, fuzzy, memory_replica, search, stats, suggest
 from backend.database.models import Book
+from backend.database.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from backend.serialization import book_to_dict, row_to_dict
+from backend.services.cache import BookCache, build_cache
+from backend.services.validation import BookInput
+
+
+EXPORT_FORMATS = ("ndjson", "csv")
+SEARCH_MODES = ("default", "fuzzy")
+BATCH_OPERATIONS = ("add", "update", "delete")
+BULK_FILTER_FIELDS = ("query", "title", "author", "publisher")
+MAX_BATCH_SIZE = 500
+EXPORT_FIELDS = ("id", "title", "author", "publisher", "purchase_link", "created_at")
+
+# Cache de leitura compartilhado por REST e MCP (ver backend/services/cache.py).
+cache = BookCache(build_cache())
 
 
 class BookNotFoundError(Exception):
     """Indica que um ID solicitado nao existe no banco."""
 
 
+class VersionConflictError(Exception):
+    """A versao informada (If-Match / expected_version) nao e a atual."""
+
+
+class ChangesExpiredError(Exception):
+    """`since` e anterior ao horizonte compactado do changelog: refaca a sincronizacao completa."""
+
+
+class ChangesUnsupportedError(Exception):
+    """O banco configurado nao mantem o changelog (triggers so existem no SQLite)."""
+
+
+@dataclass
+class BookPage:
+    """Pagina de resultados com o cursor opaco da proxima pagina (ou None).
+
+    `items` sao dicts com os campos de `BOOK_FIELDS`, montados direto do result
+    set (sem objetos ORM). Podem vir do cache: trate-os como somente leitura.
+    """
+
+    items: Sequence[dict[str, Any]]
+    next_cursor: str | None = None
+
+
+@dataclass
+class ChangesPage:
+    """Pagina do changelog: mudancas em ordem de `seq` e o `since` da proxima chamada."""
+
+    items: list[dict[str, Any]]
+    next_since: int
+    has_more: bool = False
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"items": self.items, "next_since": self.next_since, "has_more": self.has_more}
+
+
+@dataclass
+class BulkResult:
+    """Resumo de uma carga em massa: total inserido e erros por linha."""
+
+    inserted: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, index: int, message: str) -> None:
+        self.errors.append({"index": index, "error": message})
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"inserted": self.inserted, "failed": len(self.errors), "errors": self.errors}
+
+
+def _restore(row: dict[str, Any]) -> Book:
+    """Recria um `Book` transiente a partir do cache ou de um RETURNING (cada chamada recebe o seu)."""
+
+    return Book(**row)
+
+
+def _rows_page(rows: Sequence[Sequence[Any]], next_cursor: str | None = None) -> BookPage:
+    return BookPage(items=[row_to_dict(row) for row in rows], next_cursor=next_cursor)
+
+
+def _cache_page(key: str, page: BookPage) -> BookPage:
+    cache.set(key, {"items": page.items, "next_cursor": page.next_cursor})
+    return page
+
+
+def _cached_page(key: str) -> BookPage | None:
+    data = cache.get(key)
+    if data is None:
+        return None
+    return BookPage(items=data["items"], next_cursor=data["next_cursor"])
+
+
+def _query_key(db: Session, kind: str, version: int | None, *params: Any) -> str:
+    # A versao do catalogo (a do ETag) entra na chave: escrita de outro processo muda a chave.
+    # Lida antes da consulta, a pagina guardada sob ela nunca e mais antiga que ela.
+    if version is None:
+        version = crud.get_catalog_version(db)
+    return cache.query_key(kind, version, *params)
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def cache_stats() -> dict[str, Any]:
+    """Contadores de hit/miss e tamanho do cache de leitura."""
+
+    return cache.stats()
+
+
 def _validate_title(title: str | None) -> str | None:
     """Garante que o titulo nao esteja vazio depois do strip."""
 
@@ -36,30 +151,127 @@ def create_book(
     title: str,
     author: str | None = None,
     publisher: str | None = None,
-    purchase_link: str | None = None,
+    purchase_link: Any = None,
 ) -> Book:
-    """Cria um livro aplicando as validacoes de titulo."""
+    """Cria um livro aplicando as validacoes de titulo.
+
+    Um unico `INSERT ... RETURNING` quando o banco suporta; o `Book`
+    devolvido e transiente, montado da linha retornada.
+    """
 
     cleaned_title = _validate_title(title)
-    return crud.create_book(
-        db,
-        title=cleaned_title,
-        author=author,
-        publisher=publisher,
-        purchase_link=purchase_link,
-    )
+    values = {"title": cleaned_title, "author": author, "publisher": publisher, "purchase_link": _link(purchase_link)}
+    if crud.supports_returning(db):
+        book = _restore(row_to_dict(crud.insert_book_returning(db, **values)))
+    else:
+        book = crud.create_book(db, **values)
+    crud.bump_catalog_version(db)
+    cache.invalidate(db)
+    memory_replica.note_write(db)
+    fuzzy.note_book(db, cleaned_title, author, publisher)
+    suggest.note_change(db, None, (cleaned_title, author, publisher))
+    return book
+
+
+def catalog_version(db: Session) -> int:
+    """Versao global do catalogo; muda a cada escrita (base do ETag de listas).
+
+    Com a replica em memoria, e a versao que ela esta servindo.
+    """
 
+    replica = memory_replica.current()
+    if replica is not None:
+        return replica.version
+    return crud.get_catalog_version(db)
 
-def list_books(db: Session, *, limit: int = 100, offset: int = 0) -> Sequence[Book]:
-    """Retorna livros ordenados por data de criacao."""
+
+def catalog_stats(db: Session, *, top: int = 20, days: int = 30, version: int | None = None) -> dict[str, Any]:
+    """Total, autores/editoras mais frequentes e cadastros por dia (UTC).
+
+    Le a tabela de resumo mantida por triggers (custo O(facetas), nao
+    O(livros)); o resultado passa pelo mesmo cache das listagens, com a
+    chave ligada a `version` (a do ETag, como em `list_books`).
+    """
+
+    safe_top = min(max(top, 1), 100)
+    safe_days = min(max(days, 1), 366)
+    today = datetime.utcnow().date()
+    key = _query_key(db, "stats", version, safe_top, safe_days, today.isoformat())
+    data = cache.get(key)
+    if data is None:
+        data = stats.catalog_stats(db, top=safe_top, days=safe_days, today=today)
+        cache.set(key, data)
+    return data
+
+
+def book_version(db: Session, book_id: int) -> int:
+    """Versao atual de um livro, lida sem carregar o registro."""
+
+    replica = memory_replica.current()
+    version = replica.book_version(book_id) if replica is not None else crud.get_book_version(db, book_id)
+    if version is None:
+        raise BookNotFoundError(f"Book {book_id} not found")
+    return version
+
+
+def _link(purchase_link: Any) -> str | None:
+    """`HttpUrl` do pydantic (REST) vira texto, como na carga em massa; o driver nao o aceita."""
+
+    return str(purchase_link) if purchase_link is not None else None
+
+
+def _check_version(book: Book, expected_version: int | None) -> None:
+    if expected_version is not None and book.version != expected_version:
+        raise VersionConflictError(
+            f"Book {book.id} is at version {book.version}, expected {expected_version}"
+        )
+
+
+def list_books(
+    db: Session, *, limit: int = 100, offset: int = 0, version: int | None = None
+) -> Sequence[dict[str, Any]]:
+    """Retorna livros (dicts) ordenados por data de criacao.
+
+    `version` e a versao do catalogo ja lida pelo chamador (ETag); sem ela,
+    e lida aqui. O mesmo vale para as demais listagens e buscas.
+    """
 
     safe_limit = min(max(limit, 1), 500)
     safe_offset = max(offset, 0)
-    return crud.list_books(db, limit=safe_limit, offset=safe_offset)
+    replica = memory_replica.current()
+    if replica is not None:
+        return replica.list_books(limit=safe_limit, offset=safe_offset)
+    key = _query_key(db, "list", version, safe_limit, safe_offset)
+    page = _cached_page(key)
+    if page is None:
+        page = _cache_page(key, _rows_page(crud.list_books(db, limit=safe_limit, offset=safe_offset)))
+    return page.items
 
 
-def get_book(db: Session, book_id: int) -> Book:
-    """Busca um livro ou dispara BookNotFoundError."""
+def list_books_page(
+    db: Session, *, limit: int = 100, cursor: str | None = None, version: int | None = None
+) -> BookPage:
+    """Lista por cursor (keyset em created_at, id); custo O(pagina) em qualquer profundidade."""
+
+    safe_limit = min(max(limit, 1), 500)
+    replica = memory_replica.current()
+    if replica is not None:
+        return BookPage(*replica.list_books_page(limit=safe_limit, cursor=cursor))
+    key = _query_key(db, "list_page", version, safe_limit, cursor)
+    page = _cached_page(key)
+    if page is not None:
+        return page
+    after = decode_cursor(cursor, "list", 2) if cursor else None
+    rows = crud.list_books_after(db, limit=safe_limit + 1, after=after)
+    if len(rows) <= safe_limit:
+        return _cache_page(key, _rows_page(rows))
+    rows = rows[:safe_limit]
+    next_cursor = encode_cursor("list", (rows[-1].created_at, rows[-1].id))
+    return _cache_page(key, _rows_page(rows, next_cursor))
+
+
+def _load_book(db: Session, book_id: int) -> Book:
+    """Carrega da sessao (sem cache), para escritas."""
 
     book = crud.get_book(db, book_id)
     if not book:
@@ -67,6 +279,39 @@ def get_book(db: Session, book_id: int) -> Book:
     return book
 
 
+def get_book(db: Session, book_id: int) -> Book:
+    """Busca um livro (replica em memoria ou cache) ou dispara BookNotFoundError."""
+
+    replica = memory_replica.current()
+    if replica is not None:
+        row = replica.get(book_id)
+        if row is None:
+            raise BookNotFoundError(f"Book {book_id} not found")
+        return _restore(row)
+    key = cache.book_key(book_id)
+    row = cache.get(key)
+    if row is not None:
+        return _restore(row)
+    book = _load_book(db, book_id)
+    cache.set(key, book_to_dict(book))
+    return book
+
+
+def _unchanged_row(db: Session, book_id: int, expected_version: int | None) -> Row:
+    """Caminho de falha do UPDATE/DELETE ... RETURNING: descobre por que nenhuma linha casou.
+
+    Livro ausente vira BookNotFoundError e outra versao, VersionConflictError;
+    se nenhum dos dois, a linha atual e devolvida (UPDATE sem mudanca).
+    """
+
+    row = crud.get_book_row(db, book_id)
+    if row is None:
+        raise BookNotFoundError(f"Book {book_id} not found")
+    if expected_version is not None and row.version != expected_version:
+        raise VersionConflictError(f"Book {book_id} is at version {row.version}, expected {expected_version}")
+    return row
+
+
 def update_book(
     db: Session,
     book_id: int,
@@ -74,34 +319,613 @@ def update_book(
     title: str | None = None,
     author: str | None = None,
     publisher: str | None = None,
-    purchase_link: str | None = None,
+    purchase_link: Any = None,
+    expected_version: int | None = None,
 ) -> Book:
-    """Atualiza total ou parcialmente um livro."""
+    """Atualiza total ou parcialmente um livro.
+
+    Com `expected_version`, falha com VersionConflictError se outro cliente
+    ja alterou o livro (controle otimista; o UPDATE tambem filtra pela versao).
+    Quando o banco suporta RETURNING, e um unico `UPDATE ... RETURNING`. Com
+    o indice de sugestoes construido, uma mudanca de titulo, autor ou editora
+    precisa dos valores antigos: no SQLite eles voltam no mesmo RETURNING
+    (`crud.returns_previous_text`); nos demais bancos, um SELECT antes.
+    """
 
-    book = get_book(db, book_id)
     cleaned_title = _validate_title(title) if title is not None else None
-    return crud.update_book(
-        db,
-        book,
-        title=cleaned_title,
-        author=author,
-        publisher=publisher,
-        purchase_link=purchase_link,
-    )
+    if not crud.supports_returning(db):
+        return _update_loaded_book(
+            db,
+            book_id,
+            title=cleaned_title,
+            author=author,
+            publisher=publisher,
+            purchase_link=_link(purchase_link),
+            expected_version=expected_version,
+        )
+    fields = {"title": cleaned_title, "author": author, "publisher": publisher, "purchase_link": _link(purchase_link)}
+    values = {name: value for name, value in fields.items() if value is not None}
+    before = None
+    previous_text = False
+    if suggest.ready() and values.keys() - {"purchase_link"}:
+        previous_text = crud.returns_previous_text(db)
+        if not previous_text:
+            current = crud.get_book_row(db, book_id)
+            if current is None:
+                raise BookNotFoundError(f"Book {book_id} not found")
+            before = (current.title, current.author, current.publisher)
+    row = None
+    if values:
+        row = crud.update_book_returning(
+            db, book_id, values, expected_version=expected_version, previous_text=previous_text
+        )
+        if row is not None and previous_text:
+            before = tuple(row[len(crud.BOOK_COLUMNS):])
+    if row is None:
+        # Nada mudou: sem versao nova do catalogo, invalidacao nem notas aos indices.
+        return _restore(row_to_dict(_unchanged_row(db, book_id, expected_version)))
+    crud.bump_catalog_version(db)
+    cache.invalidate(db, book_id)
+    memory_replica.note_write(db)
+    fuzzy.note_book(db, cleaned_title, author, publisher)
+    if before is not None:
+        suggest.note_change(db, before, (row.title, row.author, row.publisher))
+    return _restore(row_to_dict(row))
+
 
+def _update_loaded_book(
+    db: Session,
+    book_id: int,
+    *,
+    title: str | None,
+    author: str | None,
+    publisher: str | None,
+    purchase_link: str | None,
+    expected_version: int | None,
+) -> Book:
+    """`update_book` pelo ORM (SELECT, UPDATE no flush e refresh), para bancos sem RETURNING."""
+
+    book = _load_book(db, book_id)
+    _check_version(book, expected_version)
+    before = (book.title, book.author, book.publisher)
+    version = book.version
+    try:
+        book = crud.update_book(
+            db,
+            book,
+            title=title,
+            author=author,
+            publisher=publisher,
+            purchase_link=purchase_link,
+        )
+    except StaleDataError as exc:
+        raise VersionConflictError(f"Book {book_id} was modified concurrently") from exc
+    if book.version == version:
+        # O flush nao emitiu UPDATE (valores iguais aos atuais), como no caminho RETURNING.
+        return book
+    crud.bump_catalog_version(db)
+    cache.invalidate(db, book_id)
+    memory_replica.note_write(db)
+    fuzzy.note_book(db, title, author, publisher)
+    suggest.note_change(db, before, (book.title, book.author, book.publisher))
+    return book
 
-def delete_book(db: Session, book_id: int) -> None:
-    """Remove um livro definitivamente."""
 
-    book = get_book(db, book_id)
-    crud.delete_book(db, book)
+def delete_book(db: Session, book_id: int, *, expected_version: int | None = None) -> None:
+    """Remove um livro definitivamente (opcionalmente condicionado a versao).
 
+    Com RETURNING, um unico `DELETE ... RETURNING` que ja traz os valores
+    removidos para o indice de sugestoes.
+    """
+
+    if crud.supports_returning(db):
+        row = crud.delete_book_returning(db, book_id, expected_version=expected_version)
+        if row is None:
+            _unchanged_row(db, book_id, expected_version)
+            raise VersionConflictError(f"Book {book_id} was modified concurrently")
+        before = (row.title, row.author, row.publisher)
+    else:
+        book = _load_book(db, book_id)
+        _check_version(book, expected_version)
+        before = (book.title, book.author, book.publisher)
+        crud.delete_book(db, book)
+        try:
+            db.flush()
+        except StaleDataError as exc:
+            raise VersionConflictError(f"Book {book_id} was modified concurrently") from exc
+    crud.bump_catalog_version(db)
+    cache.invalidate(db, book_id)
+    memory_replica.note_write(db)
+    suggest.note_change(db, before, None)
+
+
+def search_books(
+    db: Session,
+    *,
+    query: str,
+    limit: int = 100,
+    offset: int = 0,
+    mode: str = "default",
+    version: int | None = None,
+) -> Sequence[dict[str, Any]]:
+    """Busca textual em titulo, autor e editora ordenada por relevancia.
 
-def search_books(db: Session, *, query: str, limit: int = 100, offset: int = 0) -> Sequence[Book]:
-    """Executa busca case-insensitive em titulo, autor e editora."""
+    Usa o backend de `backend.database.search` (FTS5 + bm25 no SQLite,
+    ILIKE nos demais bancos sem backend registrado). `mode="fuzzy"` tolera
+    erros de digitacao e ordena por similaridade (`backend.database.fuzzy`).
+    """
 
     if len(query.strip()) < 1:
         raise ValueError("Query must contain at least one character")
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unsupported search mode '{mode}' (use {', '.join(SEARCH_MODES)})")
     safe_limit = min(max(limit, 1), 500)
     safe_offset = max(offset, 0)
-    return crud.search_books(db, query=query.strip(), limit=safe_limit, offset=safe_offset)
+    replica = memory_replica.current() if mode == "default" else None
+    if replica is not None:
+        rows = replica.search(query.strip(), limit=safe_limit, offset=safe_offset)
+        if rows is not None:
+            return rows
+    kind = "search" if mode == "default" else f"search_{mode}"
+    key = _query_key(db, kind, version, _normalize_query(query), safe_limit, safe_offset)
+    page = _cached_page(key)
+    if page is None:
+        if mode == "fuzzy":
+            rows = fuzzy.search_books(db, query=query.strip(), limit=safe_limit, offset=safe_offset)
+        else:
+            rows = search.search_books(db, query=query.strip(), limit=safe_limit, offset=safe_offset)
+        page = _cache_page(key, _rows_page(rows))
+    return page.items
+
+
+def search_books_page(
+    db: Session, *, query: str, limit: int = 100, cursor: str | None = None, version: int | None = None
+) -> BookPage:
+    """Versao por cursor do `search_books`, na mesma ordem de relevancia."""
+
+    if len(query.strip()) < 1:
+        raise ValueError("Query must contain at least one character")
+    safe_limit = min(max(limit, 1), 500)
+    replica = memory_replica.current()
+    if replica is not None:
+        result = replica.search_page(query.strip(), limit=safe_limit, cursor=cursor)
+        if result is not None:
+            return BookPage(*result)
+    key = _query_key(db, "search_page", version, _normalize_query(query), safe_limit, cursor)
+    page = _cached_page(key)
+    if page is None:
+        rows, next_cursor = search.search_books_page(db, query=query.strip(), limit=safe_limit, cursor=cursor)
+        page = _cache_page(key, _rows_page(rows, next_cursor))
+    return page
+
+
+def list_changes(db: Session, *, since: int = 0, limit: int = 500) -> ChangesPage:
+    """Delta sync: livros criados/alterados (estado atual) e lapides de removidos desde `since`.
+
+    Cada livro aparece uma vez, na sua ultima mudanca; guarde `next_since`
+    e repita enquanto `has_more`. `since=0` devolve o catalogo inteiro.
+    Dispara ChangesExpiredError se lapides posteriores a `since` ja foram
+    compactadas (`backend/database/changes.py`) e ChangesUnsupportedError
+    fora do SQLite.
+    """
+
+    if not changes.uses_triggers(db.get_bind()):
+        raise ChangesUnsupportedError("The changelog is maintained by SQLite triggers; not available on this database")
+    safe_limit = min(max(limit, 1), changes.MAX_LIMIT)
+    safe_since = max(since, 0)
+    rows = changes.changes_since(db, since=safe_since, limit=safe_limit + 1)
+    # Horizonte lido depois das linhas: uma compactacao entre as duas leituras tambem e detectada.
+    horizon = changes.horizon(db)
+    if 0 < safe_since < horizon:
+        raise ChangesExpiredError(f"Changes up to seq {horizon} were compacted; since={safe_since} needs a full resync")
+    changes.maybe_compact()
+    items = [
+        {
+            "seq": row.seq,
+            "op": row.op,
+            "id": row.book_id,
+            "book": row_to_dict(row[3:]) if row.op == changes.UPSERT else None,
+        }
+        for row in rows[:safe_limit]
+    ]
+    next_since = items[-1]["seq"] if items else safe_since
+    has_more = len(rows) > safe_limit
+    if not has_more:
+        # Cliente em dia: lapides compactadas apos o ultimo item ja estao refletidas (livro ausente).
+        # Sem isso, um `next_since` abaixo do horizonte receberia 410 na chamada seguinte.
+        next_since = max(next_since, horizon)
+    return ChangesPage(items=items, next_since=next_since, has_more=has_more)
+
+
+def suggest_books(prefix: str, *, limit: int = 10) -> list[dict[str, Any]]:
+    """Completa titulos, autores e editoras pelo texto digitado, mais frequentes primeiro.
+
+    Servido do indice em memoria de `backend.database.suggest`, sem sessao de
+    banco (exceto na primeira chamada, se o indice ainda nao foi construido).
+    """
+
+    return suggest.complete(prefix, limit=min(max(limit, 1), suggest.MAX_LIMIT))
+
+
+def suggestions_ready() -> bool:
+    """Se `suggest_books` responde direto da memoria (indice ja construido)."""
+
+    return suggest.ready()
+
+
+def get_books(db: Session, book_ids: Sequence[int]) -> tuple[list[dict[str, Any]], list[int]]:
+    """Busca varios livros por ID: cache primeiro, o resto num unico `IN`.
+
+    Devolve `(livros, ids_ausentes)`, com os livros na ordem pedida e sem
+    repeticoes.
+    """
+
+    ids = list(dict.fromkeys(book_ids))
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} ids per call")
+    replica = memory_replica.current()
+    if replica is not None:
+        rows = replica.get_many(ids)
+        found_ids = {row["id"] for row in rows}
+        return rows, [book_id for book_id in ids if book_id not in found_ids]
+    found: dict[int, dict[str, Any]] = {}
+    misses = []
+    for book_id in ids:
+        row = cache.get(cache.book_key(book_id))
+        if row is None:
+            misses.append(book_id)
+        else:
+            found[book_id] = row
+    for row in crud.get_books_by_ids(db, misses):
+        data = row_to_dict(row)
+        cache.set(cache.book_key(data["id"]), data)
+        found[data["id"]] = data
+    return [found[book_id] for book_id in ids if book_id in found], [book_id for book_id in ids if book_id not in found]
+
+
+@dataclass
+class BatchResult:
+    """Resultado de `apply_batch`: um item por operacao, na ordem recebida."""
+
+    results: list[dict[str, Any]] = field(default_factory=list)
+    committed: bool = True
+
+    def to_dict(self) -> dict[str, Any]:
+        failed = sum(1 for item in self.results if not item["ok"])
+        return {"committed": self.committed, "succeeded": len(self.results) - failed, "failed": failed,
+                "results": self.results}
+
+
+_BATCH_FIELDS = {
+    "add": {"title", "author", "publisher", "purchase_link"},
+    "update": {"book_id", "title", "author", "publisher", "purchase_link", "expected_version"},
+    "delete": {"book_id", "expected_version"},
+}
+
+
+def _apply_operation(db: Session, operation: dict[str, Any]) -> dict[str, Any]:
+    if not isinstance(operation, dict):
+        raise ValueError("Operation must be an object")
+    name = operation.get("op")
+    if name not in BATCH_OPERATIONS:
+        raise ValueError(f"Unknown op {name!r}; expected one of {', '.join(BATCH_OPERATIONS)}")
+    args = {key: value for key, value in operation.items() if key != "op"}
+    unexpected = set(args) - _BATCH_FIELDS[name]
+    if unexpected:
+        raise ValueError(f"Unexpected fields for {name}: {', '.join(sorted(unexpected))}")
+    if name != "add" and not isinstance(args.get("book_id"), int):
+        raise ValueError("book_id is required")
+    if name == "add":
+        # Mesmas regras (`BookInput`) do `bulk_create_books`; o erro vai para o indice da operacao.
+        try:
+            payload = BookInput.model_validate(args)
+        except ValidationError as exc:
+            raise ValueError(_format_validation_error(exc)) from exc
+        return {"book": create_book(db, **_create_values(payload)).to_dict()}
+    if name == "update":
+        book_id = args.pop("book_id")
+        return {"book": update_book(db, book_id, **args).to_dict()}
+    delete_book(db, args["book_id"], expected_version=args.get("expected_version"))
+    return {"deleted": True, "id": args["book_id"]}
+
+
+def apply_batch(db: Session, operations: Sequence[dict[str, Any]], *, atomic: bool = False) -> BatchResult:
+    """Aplica varias operacoes add/update/delete numa unica transacao.
+
+    Cada operacao roda num SAVEPOINT: uma falha e reportada no seu indice e
+    as demais seguem (um unico commit no fim). Com `atomic=True`, a primeira
+    falha desfaz tudo e as operacoes seguintes nao sao executadas.
+    """
+
+    if len(operations) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} operations per batch")
+    result = BatchResult()
+    for index, operation in enumerate(operations):
+        op_name = operation.get("op") if isinstance(operation, dict) else None
+        try:
+            with db.begin_nested():
+                outcome = _apply_operation(db, operation)
+        except (BookNotFoundError, VersionConflictError, ValueError, DBAPIError) as exc:
+            message = str(exc.orig) if isinstance(exc, DBAPIError) else str(exc)
+            result.results.append({"index": index, "op": op_name, "ok": False, "error": message})
+            if atomic:
+                db.rollback()
+                result.committed = False
+                break
+            continue
+        result.results.append({"index": index, "op": op_name, "ok": True, **outcome})
+    if result.committed:
+        db.commit()
+    return result
+
+
+def _create_values(payload: BookInput) -> dict[str, Any]:
+    """Campos validados pelo `BookInput`, prontos para o INSERT (link como texto)."""
+
+    return {
+        "title": payload.title,
+        "author": payload.author,
+        "publisher": payload.publisher,
+        "purchase_link": str(payload.purchase_link) if payload.purchase_link else None,
+    }
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+    )
+
+
+def _flush_batch(db: Session, batch: list[tuple[int, dict[str, Any]]], result: BulkResult) -> None:
+    """Insere o lote num unico executemany; se falhar, isola as linhas com erro."""
+
+    rows = [row for _, row in batch]
+    try:
+        with db.begin_nested():
+            crud.insert_books(db, rows)
+        inserted = rows
+    except DBAPIError:
+        inserted = []
+        for index, row in batch:
+            try:
+                with db.begin_nested():
+                    crud.insert_books(db, [row])
+                inserted.append(row)
+            except DBAPIError as exc:
+                result.add_error(index, str(exc.orig))
+    result.inserted += len(inserted)
+    for row in inserted:
+        values = (row["title"], row["author"], row["publisher"])
+        fuzzy.note_book(db, *values)
+        suggest.note_change(db, None, values)
+    crud.bump_catalog_version(db)
+    cache.invalidate(db)
+    memory_replica.note_write(db)
+    db.commit()
+
+
+def bulk_create_books(
+    db: Session,
+    items: Iterable[Any],
+    *,
+    batch_size: int | None = None,
+    start: int = 0,
+    result: BulkResult | None = None,
+) -> BulkResult:
+    """Valida (regras do `BookInput`) e insere livros em lotes.
+
+    Cada lote vira um INSERT multi-linha e um commit, entao cargas grandes
+    custam um fsync por lote, nao por livro. Linhas invalidas entram em
+    `errors` com o indice original (`start` + posicao) sem abortar o restante.
+    Aceita qualquer iteravel, inclusive geradores, para nao materializar a
+    carga inteira; `result` permite acumular varias chamadas num so resumo.
+    """
+
+    size = max(batch_size or get_settings().bulk_batch_size, 1)
+    result = result if result is not None else BulkResult()
+    batch: list[tuple[int, dict[str, Any]]] = []
+    for index, item in enumerate(items, start=start):
+        try:
+            payload = BookInput.model_validate(item)
+        except ValidationError as exc:
+            result.add_error(index, _format_validation_error(exc))
+            continue
+        batch.append((index, _create_values(payload)))
+        if len(batch) >= size:
+            _flush_batch(db, batch, result)
+            batch = []
+    if batch:
+        _flush_batch(db, batch, result)
+    return result
+
+
+@dataclass
+class BookFilter:
+    """Filtro de update/delete em massa: `query` com a regra da busca, demais campos por igualdade exata."""
+
+    query: str | None = None
+    title: str | None = None
+    author: str | None = None
+    publisher: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> BookFilter:
+        """Monta o filtro a partir do `where` das tools MCP, rejeitando chaves desconhecidas."""
+
+        if not isinstance(data, dict):
+            raise ValueError("where must be an object")
+        unexpected = set(data) - set(BULK_FILTER_FIELDS)
+        if unexpected:
+            raise ValueError(f"Unexpected filter fields: {', '.join(sorted(unexpected))}")
+        return cls(**data)
+
+
+@dataclass
+class BulkWriteResult:
+    """Resumo de um update/delete em massa: livros que casam, alterados e blocos commitados."""
+
+    matched: int
+    max_rows: int
+    affected: int = 0
+    chunks: int = 0
+    dry_run: bool = False
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"matched": self.matched, "affected": self.affected, "chunks": self.chunks,
+                "max_rows": self.max_rows, "dry_run": self.dry_run}
+
+
+def _bulk_filters(db: Session, where: BookFilter) -> list[ColumnElement[bool]]:
+    filters = crud.field_filters(title=where.title, author=where.author, publisher=where.publisher)
+    if where.query is not None:
+        if len(where.query.strip()) < 1:
+            raise ValueError("Query must contain at least one character")
+        filters.append(search.where(db, query=where.query.strip()))
+    if not filters:
+        raise ValueError(f"At least one filter is required ({', '.join(BULK_FILTER_FIELDS)})")
+    return filters
+
+
+def _bulk_write(
+    db: Session,
+    filters: list[ColumnElement[bool]],
+    write: Callable[[Session, Sequence[Row]], None],
+    *,
+    dry_run: bool,
+    max_rows: int | None,
+    chunk_size: int | None,
+) -> BulkWriteResult:
+    """Conta, aplica o limite e executa `write(db, linhas)` bloco a bloco, um commit por bloco.
+
+    Cada bloco le os IDs por keyset (id > ultimo) e escreve dentro de um
+    SAVEPOINT: no SQLite o lock de escrita (BEGIN IMMEDIATE) vale so para o
+    bloco, e outras escritas entram entre um bloco e o seguinte.
+    """
+
+    settings = get_settings()
+    limit = max_rows or settings.bulk_write_max_rows
+    size = max(chunk_size or settings.bulk_write_chunk_size, 1)
+    result = BulkWriteResult(matched=crud.count_books_where(db, filters), max_rows=limit, dry_run=dry_run)
+    if dry_run or not result.matched:
+        return result
+    if result.matched > limit:
+        raise ValueError(f"Filter matches {result.matched} books, above max_rows={limit}")
+    last_id = 0
+    # O teto tambem vale durante a execucao (livros que passaram a casar depois da contagem).
+    while result.affected < limit:
+        with db.begin_nested():
+            rows = crud.books_where_after(db, filters, after_id=last_id, limit=min(size, limit - result.affected))
+            if rows:
+                write(db, rows)
+        if not rows:
+            break
+        crud.bump_catalog_version(db)
+        cache.invalidate(db, *(row.id for row in rows))
+        memory_replica.note_write(db)
+        db.commit()
+        result.affected += len(rows)
+        result.chunks += 1
+        last_id = rows[-1].id
+    db.commit()
+    return result
+
+
+def update_books_where(
+    db: Session,
+    where: BookFilter,
+    *,
+    title: str | None = None,
+    author: str | None = None,
+    publisher: str | None = None,
+    purchase_link: Any = None,
+    dry_run: bool = False,
+    max_rows: int | None = None,
+    chunk_size: int | None = None,
+) -> BulkWriteResult:
+    """Aplica os mesmos valores a todos os livros que casam com `where` (UPDATE por blocos de IDs).
+
+    Livros que ja tem esses valores nao contam nem ganham versao nova. Com
+    `dry_run`, so conta. Se mais de `max_rows` (padrao `BULK_WRITE_MAX_ROWS`)
+    casarem, nada e alterado. Cada bloco e commitado a parte: uma falha no
+    meio deixa os blocos anteriores aplicados.
+    """
+
+    cleaned_title = _validate_title(title) if title is not None else None
+    fields = {"title": cleaned_title, "author": author, "publisher": publisher, "purchase_link": _link(purchase_link)}
+    values = {name: value for name, value in fields.items() if value is not None}
+    if not values:
+        raise ValueError("Nothing to update: send at least one field")
+    filters = [*_bulk_filters(db, where), crud.differs_from(values)]
+
+    def write(db: Session, rows: Sequence[Row]) -> None:
+        crud.update_books_by_ids(db, [row.id for row in rows], values)
+        fuzzy.note_book(db, cleaned_title, author, publisher)
+        for row in rows:
+            before = (row.title, row.author, row.publisher)
+            after = tuple(values.get(name, value) for name, value in zip(("title", "author", "publisher"), before))
+            suggest.note_change(db, before, after)
+
+    return _bulk_write(db, filters, write, dry_run=dry_run, max_rows=max_rows, chunk_size=chunk_size)
+
+
+def delete_books_where(
+    db: Session,
+    where: BookFilter,
+    *,
+    dry_run: bool = False,
+    max_rows: int | None = None,
+    chunk_size: int | None = None,
+) -> BulkWriteResult:
+    """Remove todos os livros que casam com `where` (DELETE por blocos de IDs).
+
+    Mesmas regras de `update_books_where` para `dry_run`, `max_rows` e blocos.
+    """
+
+    def write(db: Session, rows: Sequence[Row]) -> None:
+        crud.delete_books_by_ids(db, [row.id for row in rows])
+        for row in rows:
+            suggest.note_change(db, (row.title, row.author, row.publisher), None)
+
+    filters = _bulk_filters(db, where)
+    return _bulk_write(db, filters, write, dry_run=dry_run, max_rows=max_rows, chunk_size=chunk_size)
+
+
+def export_books(db: Session, *, fmt: str = "ndjson", chunk_size: int | None = None) -> Iterator[str]:
+    """Gera o catalogo inteiro como NDJSON ou CSV, um bloco de texto por vez.
+
+    As linhas saem direto do cursor como tuplas, sem hidratar `Book` nem
+    validar `BookOut`; a memoria usada e a de um bloco (`EXPORT_CHUNK_SIZE`).
+    """
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    size = max(chunk_size or get_settings().export_chunk_size, 1)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(EXPORT_FIELDS)
+        yield buffer.getvalue()
+    for rows in crud.iter_book_rows(db, chunk_size=size):
+        if fmt == "csv":
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(
+                (*row[:5], row[5].isoformat() if row[5] else None) for row in rows
+            )
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps(
+                    {
+                        "id": row[0],
+                        "title": row[1],
+                        "author": row[2],
+                        "publisher": row[3],
+                        "purchase_link": row[4],
+                        "created_at": row[5].isoformat() if row[5] else None,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+                for row in rows
+            )
@@ -0,0 +1,303 @@
+"""Cache de leitura (read-through) usado pelo book_service.
+
+Entradas por ID (`book:<id>`) sao removidas uma a uma nas escritas. Paginas
+de listagem/busca carregam no prefixo da chave a "geracao" do catalogo; cada
+escrita incrementa a geracao e torna todas as paginas antigas inalcancaveis
+em O(1), sem varrer o cache (elas saem por LRU/TTL). A chave leva tambem a
+versao do catalogo lida do banco (a do ETag): escritas de outro processo nao
+mexem na geracao local, mas mudam a versao, entao a pagina servida nunca e
+mais antiga que o ETag que a acompanha.
+
+O backend padrao (`memory`) vive no processo. Para varios workers/processos
+(ex.: API + MCP), use `CACHE_BACKEND=redis` para que todos vejam a mesma
+invalidacao.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+
+GENERATION_KEY = "catalog:generation"
+_PENDING_KEY = "cache_invalidate"
+
+
+class CacheBackend(ABC):
+    """Contrato dos backends de cache. Valores sao estruturas JSON-compativeis."""
+
+    name = "base"
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Any | None:
+        """Valor guardado ou None (ausente ou expirado); conta hit/miss."""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """Guarda o valor com o TTL do backend."""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        """Remove as chaves (ausentes sao ignoradas)."""
+
+    @abstractmethod
+    def generation(self) -> int:
+        """Geracao atual do catalogo (prefixo das chaves de paginas)."""
+
+    @abstractmethod
+    def bump_generation(self) -> int:
+        """Incrementa a geracao e devolve a nova."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Esvazia o cache."""
+
+    def size(self) -> int:
+        return 0
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "size": self.size(),
+        }
+
+
+class NullCacheBackend(CacheBackend):
+    """Cache desligado: toda leitura vai ao banco."""
+
+    name = "none"
+
+    def get(self, key: str) -> Any | None:
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        return None
+
+    def delete(self, *keys: str) -> None:
+        return None
+
+    def generation(self) -> int:
+        return 0
+
+    def bump_generation(self) -> int:
+        return 0
+
+    def clear(self) -> None:
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """LRU com TTL e limite de entradas, protegido por lock (threadpool)."""
+
+    name = "memory"
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self) -> int:
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def size(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        data = super().stats()
+        data["evictions"] = self.evictions
+        data["max_entries"] = self.max_entries
+        return data
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__dt__": value.isoformat()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _json_hook(value: dict[str, Any]) -> Any:
+    if "__dt__" in value and len(value) == 1:
+        return datetime.fromisoformat(value["__dt__"])
+    return value
+
+
+class RedisCacheBackend(CacheBackend):
+    """Backend compartilhado entre processos (requer o pacote `redis`).
+
+    TTL via `SET ... EX`; o limite de memoria/LRU fica a cargo do servidor
+    (`maxmemory-policy allkeys-lru`). A geracao do catalogo e um `INCR`.
+    """
+
+    name = "redis"
+
+    def __init__(self, *, url: str, ttl_seconds: float, prefix: str = "books:") -> None:
+        super().__init__()
+        try:
+            import redis
+        except ImportError as exc:  # pragma: no cover - dependencia opcional
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self.ttl_seconds = max(int(ttl_seconds), 1)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any | None:
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw, object_hook=_json_hook)
+
+    def set(self, key: str, value: Any) -> None:
+        self._client.set(self.prefix + key, json.dumps(value, default=_json_default), ex=self.ttl_seconds)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._client.delete(*(self.prefix + key for key in keys))
+
+    def generation(self) -> int:
+        return int(self._client.get(self.prefix + GENERATION_KEY) or 0)
+
+    def bump_generation(self) -> int:
+        return int(self._client.incr(self.prefix + GENERATION_KEY))
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+    def size(self) -> int:
+        return -1
+
+
+def build_cache() -> CacheBackend:
+    """Instancia o backend configurado em `CACHE_BACKEND`."""
+
+    settings = get_settings()
+    name = settings.cache_backend
+    if name == "none":
+        return NullCacheBackend()
+    if name == "memory":
+        return MemoryCacheBackend(max_entries=settings.cache_max_entries, ttl_seconds=settings.cache_ttl_seconds)
+    if name == "redis":
+        if not settings.cache_url:
+            raise ValueError("CACHE_BACKEND=redis requires CACHE_URL")
+        return RedisCacheBackend(url=settings.cache_url, ttl_seconds=settings.cache_ttl_seconds)
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+class BookCache:
+    """Fachada usada pelo book_service: chaves, geracao e invalidacao."""
+
+    def __init__(self, backend: CacheBackend) -> None:
+        self.backend = backend
+
+    @staticmethod
+    def book_key(book_id: int) -> str:
+        return f"book:{book_id}"
+
+    def query_key(self, kind: str, version: int, *params: Any) -> str:
+        """Chave de uma pagina; `version` e a versao do catalogo lida antes da consulta."""
+
+        normalized = ":".join("" if param is None else str(param) for param in params)
+        return f"{kind}:{self.backend.generation()}:{version}:{normalized}"
+
+    def get(self, key: str) -> Any | None:
+        return self.backend.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(key, value)
+
+    def invalidate(self, db: Session, *book_ids: int) -> None:
+        """Invalida agora e de novo apos o commit da sessao.
+
+        A segunda rodada cobre leitores concorrentes que repopularam o cache
+        com dados anteriores ao commit.
+        """
+
+        self._apply(book_ids)
+        _, pending = db.info.setdefault(_PENDING_KEY, (self, set()))
+        pending.update(book_ids)
+
+    def _apply(self, book_ids: tuple[int, ...] | set[int]) -> None:
+        if book_ids:
+            self.backend.delete(*(self.book_key(book_id) for book_id in book_ids))
+        self.backend.bump_generation()
+
+    def stats(self) -> dict[str, Any]:
+        return self.backend.stats()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        # RELEASE de um SAVEPOINT tambem dispara after_commit; espera o commit de fora.
+        return
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending is not None:
+        cache, book_ids = pending
+        cache._apply(book_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction: Any) -> None:
+    # Um SAVEPOINT desfeito (operacao de lote que falhou) nao descarta as demais escritas.
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,28 @@
+"""Regras de entrada de um livro, compartilhadas por REST, MCP e carga em massa.
+
+Ficam na camada de servicos para que o `book_service` valide sem importar a
+API; `backend/api/schemas.py` herda estes modelos e so acrescenta a
+documentacao dos campos para o OpenAPI.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from pydantic import BaseModel, HttpUrl, field_validator
+
+
+class BookInput(BaseModel):
+    """Campos de um livro novo: titulo obrigatorio (sem espacos nas pontas) e link como URL."""
+
+    title: str
+    author: Optional[str] = None
+    publisher: Optional[str] = None
+    purchase_link: Optional[HttpUrl] = None
+
+    @field_validator("title")
+    @classmethod
+    def title_not_empty(cls, value: str) -> str:
+        if not value or not value.strip():
+            raise ValueError("Title is required")
+        return value.strip()
@@ -0,0 +1,401 @@
+"""Benchmark de carga dos endpoints REST e das tools MCP.
+
+Para cada tamanho de catalogo (`--rows`), semeia um banco SQLite proprio em
+`benchmarks/data/`, dispara cada operacao por `--duration` segundos com
+`--concurrency` clientes simultaneos e mede vazao e latencia p50/p95/p99.
+
+Exemplos:
+    python -m benchmarks.run --rows 10000 --duration 10 --concurrency 32
+    python -m benchmarks.run --rows 10000 1000000 --save benchmarks/results/atual.json
+    python -m benchmarks.run --rows 10000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --rows 10000 --compare benchmarks/baseline.json --tolerance 0.2
+
+`--target inprocess` (padrao) chama o app FastAPI via ASGI e o FastMCP em
+memoria, sem rede: bom para CI. `--target http` mede servidores reais em
+`--api-url`/`--mcp-url`; com `--start-servers` o script sobe uvicorn e o MCP
+Server apontando para o banco semeado.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+REST_OPS = ("list", "list_deep", "search", "get", "create", "update")
+MCP_OPS = ("books_list", "books_search", "books_get", "books_add", "books_update")
+
+logger = logging.getLogger("benchmarks")
+
+Call = Callable[[random.Random], Awaitable[bool]]
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Percentil por nearest-rank (valores ja ordenados)."""
+
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict[str, float | int]:
+    latencies.sort()
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round((latencies[-1] if latencies else 0.0) * 1000, 3),
+    }
+
+
+async def drive(call: Call, *, concurrency: int, duration: float, seed: int) -> dict[str, float | int]:
+    """Roda `concurrency` workers chamando `call` ate o prazo; cada worker tem seu RNG."""
+
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = await call(rng)
+            except Exception:  # noqa: BLE001 - qualquer falha conta como erro da operacao
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def rest_calls(client: Any, rows: int, words: list[str]) -> dict[str, Call]:
+    """Operacoes REST; cada uma devolve True se a resposta foi < 400."""
+
+    async def list_first(rng: random.Random) -> bool:
+        return (await client.get("/api/books/", params={"limit": 100})).status_code < 400
+
+    async def list_deep(rng: random.Random) -> bool:
+        offset = rng.randint(0, max(rows - 100, 0))
+        return (await client.get("/api/books/", params={"limit": 100, "offset": offset})).status_code < 400
+
+    async def search(rng: random.Random) -> bool:
+        query = rng.choice(words)
+        return (await client.get("/api/books/search", params={"query": query, "limit": 20})).status_code < 400
+
+    async def get(rng: random.Random) -> bool:
+        return (await client.get(f"/api/books/{rng.randint(1, rows)}")).status_code < 400
+
+    async def create(rng: random.Random) -> bool:
+        payload = {"title": f"Bench {uuid.uuid4().hex[:12]}", "author": "Benchmark"}
+        return (await client.post("/api/books/", json=payload)).status_code < 400
+
+    async def update(rng: random.Random) -> bool:
+        payload = {"publisher": f"Editora Bench {rng.randint(1, 50)}"}
+        return (await client.patch(f"/api/books/{rng.randint(1, rows)}", json=payload)).status_code < 400
+
+    return {
+        "list": list_first,
+        "list_deep": list_deep,
+        "search": search,
+        "get": get,
+        "create": create,
+        "update": update,
+    }
+
+
+def mcp_calls(clients: list[Any], rows: int, words: list[str]) -> dict[str, Call]:
+    """Tools MCP; o worker escolhe um cliente (sessao) de forma deterministica."""
+
+    def pick(rng: random.Random) -> Any:
+        return clients[rng.randrange(len(clients))]
+
+    async def call(rng: random.Random, name: str, arguments: dict[str, Any]) -> bool:
+        result = await pick(rng).call_tool(name, arguments, raise_on_error=False)
+        return not result.is_error
+
+    return {
+        "books_list": lambda rng: call(rng, "books_list", {"limit": 100}),
+        "books_search": lambda rng: call(rng, "books_search", {"query": rng.choice(words), "limit": 20}),
+        "books_get": lambda rng: call(rng, "books_get", {"book_id": rng.randint(1, rows)}),
+        "books_add": lambda rng: call(rng, "books_add", {"title": f"Bench {uuid.uuid4().hex[:12]}"}),
+        "books_update": lambda rng: call(
+            rng, "books_update", {"book_id": rng.randint(1, rows), "publisher": f"Editora {rng.randint(1, 50)}"}
+        ),
+    }
+
+
+def _wait_http(url: str, timeout: float = 60.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=2.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Servidor nao respondeu em {url}")
+
+
+def _start_servers(args: argparse.Namespace, env: dict[str, str]) -> list[subprocess.Popen]:
+    processes = []
+    if "rest" in args.channels:
+        port = args.api_url.rsplit(":", 1)[-1].split("/")[0]
+        processes.append(
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.api.main:app", "--port", port, "--log-level", "warning"],
+                cwd=ROOT,
+                env=env,
+            )
+        )
+        _wait_http(args.api_url + "/")
+    if "mcp" in args.channels:
+        processes.append(subprocess.Popen([sys.executable, "run_mcp_server.py"], cwd=ROOT, env=env))
+        _wait_http(args.mcp_url)
+    return processes
+
+
+async def _run_channels(args: argparse.Namespace, rows: int) -> dict[str, dict[str, Any]]:
+    import httpx
+    from fastmcp import Client
+
+    from benchmarks.seed import WORDS
+
+    words = list(WORDS)
+    results: dict[str, dict[str, Any]] = {}
+    ops = set(args.ops) if args.ops else None
+
+    if "rest" in args.channels:
+        if args.target == "inprocess":
+            from backend.api.main import app
+
+            transport = httpx.ASGITransport(app=app)
+            client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0)
+        else:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            client = httpx.AsyncClient(base_url=args.api_url, timeout=60.0, limits=limits)
+        async with client:
+            for name, call in rest_calls(client, rows, words).items():
+                if ops and name not in ops:
+                    continue
+                logger.info("[%s linhas] REST %s...", rows, name)
+                results[f"rest.{name}"] = await drive(
+                    call, concurrency=args.concurrency, duration=args.duration, seed=args.seed
+                )
+
+    if "mcp" in args.channels:
+        if args.target == "inprocess":
+            from fastmcp import FastMCP
+
+            from backend.mcp.mcp_tools import MCPBookTools
+            from backend.mcp.server import register_tools
+
+            server = FastMCP("books-bench")
+            register_tools(server, MCPBookTools())
+            targets = [server] * args.mcp_sessions
+        else:
+            targets = [args.mcp_url] * args.mcp_sessions
+        clients = [Client(target) for target in targets]
+        for client in clients:
+            await client.__aenter__()
+        try:
+            for name, call in mcp_calls(clients, rows, words).items():
+                if ops and name not in ops:
+                    continue
+                logger.info("[%s linhas] MCP %s...", rows, name)
+                results[f"mcp.{name}"] = await drive(
+                    call, concurrency=args.concurrency, duration=args.duration, seed=args.seed
+                )
+        finally:
+            for client in clients:
+                await client.__aexit__(None, None, None)
+    return results
+
+
+def run_scale(args: argparse.Namespace, rows: int) -> dict[str, dict[str, Any]]:
+    """Executa um cenario; precisa rodar em processo proprio (config lida no import)."""
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    db_path = DATA_DIR / f"catalog_{rows}.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path.as_posix()}"
+    if args.cache:
+        os.environ["CACHE_BACKEND"] = args.cache
+    if args.memory_replica:
+        os.environ["MEMORY_REPLICA"] = "true"
+
+    from benchmarks.seed import seed_catalog
+    from backend.database.connection import init_db
+
+    seed_catalog(rows, seed=args.seed)
+    init_db()
+    if args.memory_replica and args.target == "inprocess":
+        from backend.database import memory_replica
+
+        # Sem lifespan no ASGITransport: constroi a replica antes de medir.
+        memory_replica.warm_up()
+        while memory_replica.supported() and not memory_replica.ready():
+            time.sleep(0.1)
+
+    processes: list[subprocess.Popen] = []
+    if args.target == "http" and args.start_servers:
+        processes = _start_servers(args, dict(os.environ))
+    try:
+        return asyncio.run(_run_channels(args, rows))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Lista regressoes: p95 acima ou vazao abaixo do baseline alem da tolerancia."""
+
+    regressions = []
+    for scale, operations in results["scales"].items():
+        base_operations = baseline.get("scales", {}).get(scale, {})
+        for name, stats in operations.items():
+            base = base_operations.get(name)
+            if not base:
+                continue
+            if base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{scale} {name}: p95 {stats['p95_ms']}ms > baseline {base['p95_ms']}ms (+{tolerance:.0%})"
+                )
+            if base["throughput"] and stats["throughput"] < base["throughput"] * (1 - tolerance):
+                regressions.append(
+                    f"{scale} {name}: vazao {stats['throughput']}/s < baseline {base['throughput']}/s (-{tolerance:.0%})"
+                )
+            if stats["errors"] > base.get("errors", 0):
+                regressions.append(f"{scale} {name}: {stats['errors']} erros (baseline {base.get('errors', 0)})")
+    return regressions
+
+
+def print_table(results: dict[str, Any]) -> None:
+    header = f"{'linhas':>10} {'operacao':<22} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>6}"
+    print(header)
+    print("-" * len(header))
+    for scale, operations in results["scales"].items():
+        for name, stats in operations.items():
+            print(
+                f"{scale:>10} {name:<22} {stats['throughput']:>10} {stats['p50_ms']:>9} "
+                f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>6}"
+            )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000], help="Tamanhos de catalogo (ex.: 10000 1000000 10000000).")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clientes simultaneos por operacao.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por operacao.")
+    parser.add_argument("--channels", nargs="+", choices=("rest", "mcp"), default=["rest", "mcp"])
+    parser.add_argument("--ops", nargs="+", help=f"Filtra operacoes ({', '.join(REST_OPS + MCP_OPS)}).")
+    parser.add_argument("--target", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--api-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mcp-url", default="http://127.0.0.1:8765/mcp")
+    parser.add_argument("--mcp-sessions", type=int, default=4, help="Sessoes MCP compartilhadas pelos workers.")
+    parser.add_argument("--start-servers", action="store_true", help="Sobe API e MCP (com --target http).")
+    parser.add_argument("--cache", choices=("memory", "redis", "none"), help="Sobrescreve CACHE_BACKEND.")
+    parser.add_argument("--memory-replica", action="store_true", help="Liga MEMORY_REPLICA (replica em memoria).")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do catalogo e da carga.")
+    parser.add_argument("--save", type=Path, help="Grava os resultados em JSON.")
+    parser.add_argument("--save-baseline", type=Path, help="Grava os resultados como novo baseline.")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON para detectar regressoes.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Folga relativa aceita na comparacao.")
+    parser.add_argument("--scale-output", type=Path, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    # O SDK MCP e o httpx logam cada chamada em INFO; isso distorceria a medicao.
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.scale_output:
+        # Processo filho: um unico cenario.
+        results = run_scale(args, args.rows[0])
+        args.scale_output.write_text(json.dumps(results), encoding="utf-8")
+        return 0
+
+    scales: dict[str, Any] = {}
+    forwarded = [arg for arg in (argv if argv is not None else sys.argv[1:])]
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "scale.json"
+            child_args = _child_args(forwarded, rows, output)
+            subprocess.run([sys.executable, "-m", "benchmarks.run", *child_args], cwd=ROOT, check=True)
+            scales[str(rows)] = json.loads(output.read_text(encoding="utf-8"))
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target": args.target,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "scales": scales,
+    }
+    print_table(results)
+    for path in (args.save, args.save_baseline):
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+            logger.info("Resultados gravados em %s", path)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressoes encontradas:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nSem regressoes em relacao ao baseline.")
+    return 0
+
+
+def _child_args(argv: list[str], rows: int, output: Path) -> list[str]:
+    """Repassa os argumentos ao processo filho trocando --rows e removendo saidas."""
+
+    skip_values = {"--rows", "--save", "--save-baseline", "--compare"}
+    child: list[str] = []
+    skipping = False
+    for arg in argv:
+        if arg in skip_values:
+            skipping = True
+            continue
+        if skipping and not arg.startswith("--"):
+            continue
+        skipping = False
+        child.append(arg)
+    return [*child, "--rows", str(rows), "--scale-output", str(output)]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Gera um catalogo sintetico e deterministico para os benchmarks.
+
+Deve ser importado depois de `DATABASE_URL` apontar para o banco do cenario,
+pois o engine de `backend.database.connection` le as variaveis no import.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+from typing import Iterator
+
+from sqlalchemy import func, insert, select, update
+
+from backend.database.connection import engine, init_db
+from backend.database.models import Book, CatalogState
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "senhor aneis hobbit duna fundacao imperio sombra vento cidade noite jardim mar rio montanha "
+    "guerra paz tempo memoria segredo viagem historia reino cronicas estrela sol lua fogo gelo "
+    "livro casa porta ilha floresta deserto caminho lenda sonho silencio cancao espelho relogio "
+    "labirinto codigo algoritmo dados sistema rede python banco consulta indice arquitetura"
+).split()
+FIRST_NAMES = (
+    "Ana Bruno Carla Daniel Elisa Fabio Gabriela Heitor Isabel Joao Karina Lucas Marina Nuno "
+    "Olivia Paulo Rita Sergio Tania Vitor"
+).split()
+LAST_NAMES = (
+    "Silva Souza Costa Oliveira Pereira Almeida Ferreira Rodrigues Gomes Martins Araujo Barbosa "
+    "Ribeiro Carvalho Rocha Dias Moreira Nunes Teixeira Mendes"
+).split()
+PUBLISHERS = [f"Editora {word.title()}" for word in WORDS[:40]]
+
+
+def synthetic_rows(count: int, *, start: int = 0, seed: int = 42) -> Iterator[dict[str, str | None]]:
+    """Linhas reproduziveis: mesma semente e posicao geram o mesmo livro."""
+
+    rng = random.Random(seed + start)
+    for index in range(start, start + count):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).capitalize()
+        yield {
+            "title": f"{title} {index}",
+            "author": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "publisher": rng.choice(PUBLISHERS) if rng.random() > 0.05 else None,
+            "purchase_link": f"https://loja.exemplo.com/livros/{index}" if rng.random() > 0.5 else None,
+        }
+
+
+def count_books() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Book)).scalar_one()
+
+
+def seed_catalog(rows: int, *, batch_size: int = 10000, seed: int = 42) -> int:
+    """Completa o banco ate `rows` livros (idempotente); devolve quantos inseriu."""
+
+    init_db()
+    existing = count_books()
+    missing = rows - existing
+    if missing <= 0:
+        logger.info("Catalogo ja possui %s livros; nada a semear", existing)
+        return 0
+    started = time.perf_counter()
+    inserted = 0
+    while inserted < missing:
+        size = min(batch_size, missing - inserted)
+        batch = list(synthetic_rows(size, start=existing + inserted, seed=seed))
+        with engine.begin() as conn:
+            conn.execute(insert(Book), batch)
+        inserted += size
+        if inserted % (batch_size * 10) == 0:
+            logger.info("Semeados %s/%s livros", inserted, missing)
+    with engine.begin() as conn:
+        conn.execute(update(CatalogState).where(CatalogState.id == 1).values(version=CatalogState.version + 1))
+    logger.info("Semeados %s livros em %.1fs", inserted, time.perf_counter() - started)
+    return inserted
@@ -0,0 +1,112 @@
+"""Orcamento de cold start: tempo de import dos entry points da API e do MCP.
+
+Cada modulo e importado num processo novo com `python -X importtime`, que
+registra o tempo de cada import. O total (raiz da arvore, incluindo o `site`
+do interpretador) e comparado com o orcamento; se algum estourar, o script
+termina com codigo 1 (util em CI, como o `--compare` do `benchmarks.run`).
+
+Exemplos:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget api=1200 mcp=2500 --repeat 5
+    python -m benchmarks.startup --only api --top 15
+
+Os numeros dependem da maquina e do cache de bytecode: calibre o orcamento
+no mesmo ambiente da CI. Como no `benchmarks.run`, o ambiente (`.env`,
+`MOUNT_MCP`, `METRICS_ENABLED`...) vale para o processo medido.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ENTRY_POINTS = {"api": "backend.api.main", "mcp": "backend.mcp.server"}
+DEFAULT_BUDGET_MS = {"api": 1500.0, "mcp": 3000.0}
+
+_PREFIX = "import time:"
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, float, float, int]]:
+    """Linhas do `-X importtime` como (modulo, self_ms, cumulativo_ms, profundidade)."""
+
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith(_PREFIX):
+            continue
+        self_us, cumulative_us, name = line[len(_PREFIX):].split("|", 2)
+        if not self_us.strip().isdigit():  # cabecalho "self [us] | cumulative | imported package"
+            continue
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return entries
+
+
+def measure(module: str) -> tuple[float, list[tuple[str, float, float, int]]]:
+    """Importa `module` num processo novo; devolve (total_ms, entradas)."""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        tail = "\n".join(line for line in result.stderr.splitlines() if not line.startswith(_PREFIX))
+        raise RuntimeError(f"import {module} falhou:\n{tail}")
+    entries = parse_importtime(result.stderr)
+    total = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    return total, entries
+
+
+def _parse_budget(values: list[str]) -> dict[str, float]:
+    budget = dict(DEFAULT_BUDGET_MS)
+    for value in values:
+        name, _, ms = value.partition("=")
+        if name not in ENTRY_POINTS or not ms:
+            raise argparse.ArgumentTypeError(f"use <{'|'.join(ENTRY_POINTS)}>=<ms>, recebido: {value}")
+        budget[name] = float(ms)
+    return budget
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", nargs="+", default=[], metavar="NOME=MS", help="Orcamento por entry point.")
+    parser.add_argument("--only", nargs="+", choices=tuple(ENTRY_POINTS), help="Mede so alguns entry points.")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports por entry point; vale o menor (menos ruido).")
+    parser.add_argument("--top", type=int, default=8, help="Imports de primeiro nivel mais caros a listar.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    budget = _parse_budget(args.budget)
+    over: list[str] = []
+    for name in args.only or ENTRY_POINTS:
+        module = ENTRY_POINTS[name]
+        runs = [measure(module) for _ in range(max(args.repeat, 1))]
+        total, entries = min(runs, key=lambda run: run[0])
+        status = "ok" if total <= budget[name] else "ESTOUROU"
+        print(f"{name} ({module}): {total:.0f} ms de import, orcamento {budget[name]:.0f} ms [{status}]")
+        top_level = sorted((entry for entry in entries if entry[3] == 1), key=lambda entry: entry[2], reverse=True)
+        for module_name, _, cumulative, _ in top_level[: args.top]:
+            print(f"    {cumulative:8.1f} ms  {module_name}")
+        if total > budget[name]:
+            over.append(f"{name}: {total:.0f} ms > {budget[name]:.0f} ms")
+
+    if over:
+        print("\nOrcamento de cold start estourado:")
+        for line in over:
+            print(f"  - {line}")
+        return 1
+    print("\nCold start dentro do orcamento.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
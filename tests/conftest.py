@@ -0,0 +1,42 @@
+"""Ambiente dos testes: banco SQLite temporario, configurado antes de importar o backend."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from typing import Iterator
+
+import pytest
+
+_DATA_DIR = tempfile.mkdtemp(prefix="books-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DATA_DIR}/books.db"
+os.environ["SUGGEST_WARMUP"] = "false"
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend.api.main import app  # noqa: E402
+from backend.database.connection import ensure_db  # noqa: E402
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database() -> None:
+    """Schema criado uma vez, mesmo em testes que usam o book_service sem subir a API."""
+
+    ensure_db()
+
+
+@pytest.fixture(scope="session")
+def client() -> Iterator[TestClient]:
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def database_url() -> str:
+    return os.environ["DATABASE_URL"]
@@ -0,0 +1,40 @@
+"""Contratos de backend: implementacao incompleta falha ao instanciar, nao na primeira chamada."""
+
+from __future__ import annotations
+
+import pytest
+
+from backend.database import search
+from backend.services import cache
+
+
+def test_incomplete_search_backend_fails_at_instantiation():
+    class OnlySearch(search.SearchBackend):
+        name = "only-search"
+
+        def search(self, db, *, query, limit=100, offset=0):
+            return []
+
+    with pytest.raises(TypeError, match="search_page"):
+        OnlySearch()
+    with pytest.raises(TypeError):
+        search.SearchBackend()
+
+
+def test_incomplete_cache_backend_fails_at_instantiation():
+    class ReadOnly(cache.CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError, match="bump_generation"):
+        ReadOnly()
+
+
+@pytest.mark.parametrize("backend", [search.LikeSearchBackend, search.SQLiteFTS5Backend])
+def test_shipped_search_backends_are_complete(backend):
+    assert isinstance(backend(), search.SearchBackend)
+
+
+def test_shipped_cache_backends_are_complete():
+    assert isinstance(cache.NullCacheBackend(), cache.CacheBackend)
+    assert isinstance(cache.MemoryCacheBackend(max_entries=1, ttl_seconds=1), cache.CacheBackend)
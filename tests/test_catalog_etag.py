@@ -0,0 +1,67 @@
+"""ETag de listagens e buscas com escritas feitas por outro processo."""
+
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.database import crud
+
+
+@pytest.fixture
+def other_process(database_url: str):
+    """Escreve como outro processo: engine proprio, sem passar pelo book_service (nem pelo cache)."""
+
+    engine = create_engine(database_url)
+
+    def write(title: str) -> None:
+        with Session(engine) as db:
+            crud.create_book(db, title=title)
+            crud.bump_catalog_version(db)
+            db.commit()
+
+    yield write
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "path, params",
+    [
+        ("/api/books", {"limit": 5}),
+        ("/api/books", {"limit": 5, "offset": 0}),
+        ("/api/books/search", {"query": "etagtest", "limit": 5}),
+        ("/api/books/search", {"query": "etagtest", "limit": 5, "offset": 1}),
+    ],
+)
+def test_body_is_never_older_than_etag(client, other_process, path, params):
+    tag = uuid.uuid4().hex[:8]
+    other_process(f"etagtest primeiro {tag}")
+    other_process(f"etagtest segundo {tag}")
+    first = client.get(path, params=params)
+    assert first.status_code == 200
+    assert client.get(path, params=params).json() == first.json()  # repetida: vem do cache
+
+    other_process(f"etagtest terceiro {tag}")
+    second = client.get(path, params=params, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    # O livro novo entra no topo (listagem) ou desloca a pagina (offset): o corpo tem que mudar.
+    assert second.json() != first.json()
+    assert client.get(path, params=params, headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
+
+
+def test_stats_follow_the_catalog_version(client, other_process):
+    first = client.get("/api/books/stats")
+    assert first.status_code == 200
+    assert client.get("/api/books/stats").json() == first.json()
+
+    other_process(f"etagtest stats {uuid.uuid4().hex[:8]}")
+    second = client.get("/api/books/stats", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.json()["total"] == first.json()["total"] + 1
@@ -0,0 +1,53 @@
+"""Delta sync (`GET /books/changes`) depois da compactacao do changelog."""
+
+from __future__ import annotations
+
+import uuid
+
+from backend.database import changes
+from backend.database.connection import engine
+
+
+def _sync(client, since: int = 0) -> tuple[dict[int, dict], int]:
+    books: dict[int, dict] = {}
+    while True:
+        response = client.get("/api/books/changes", params={"since": since, "limit": 50})
+        assert response.status_code == 200, response.json()
+        page = response.json()
+        for item in page["items"]:
+            if item["op"] == "delete":
+                books.pop(item["id"], None)
+            else:
+                books[item["id"]] = item["book"]
+        since = page["next_since"]
+        if not page["has_more"]:
+            return books, since
+
+
+def test_full_sync_after_compaction_is_not_expired(client):
+    client.post("/api/books", json={"title": "delta fica"})
+    created = [client.post("/api/books", json={"title": f"delta {uuid.uuid4().hex[:6]}"}).json() for _ in range(3)]
+    # As ultimas mudancas do changelog sao lapides, e a compactacao as remove.
+    for book in created:
+        assert client.delete(f"/api/books/{book['id']}").status_code == 204
+    assert changes.compact(engine, retention_days=-1) >= 3
+
+    books, since = _sync(client)
+    assert not {book["id"] for book in created} & books.keys()
+    again, _ = _sync(client, since)  # a proxima chamada incremental nao pede resync (410)
+    assert again == {}
+
+    survivor = client.post("/api/books", json={"title": "delta depois"}).json()
+    delta, _ = _sync(client, since)
+    assert list(delta) == [survivor["id"]]
+
+
+def test_since_before_the_horizon_still_expires(client):
+    book = client.post("/api/books", json={"title": "delta expira"}).json()
+    client.post("/api/books", json={"title": "delta expira 2"})
+    _books, since = _sync(client)
+    # Nao o maior id: o SQLite reaproveitaria o rowid e o upsert substituiria a lapide.
+    client.delete(f"/api/books/{book['id']}")
+    client.post("/api/books", json={"title": "delta expira 3"})
+    assert changes.compact(engine, retention_days=-1) >= 1
+    assert client.get("/api/books/changes", params={"since": since}).status_code == 410
@@ -0,0 +1,159 @@
+"""Replica em memoria: mesmas respostas que o banco, sincronizacao pelo changelog e reconstrucao."""
+
+from __future__ import annotations
+
+import random
+import uuid
+from typing import Any, Callable
+
+import pytest
+
+from backend.config import get_settings
+from backend.database import changes, memory_replica
+from backend.database.connection import SessionLocal, engine
+from backend.services import book_service
+
+WORDS = ["Sol", "Lua", "Mar", "Rio", "Anéis", "Casa", "ab", "Ônibus", "senhor", "sombra", "são", "paulo"]
+QUERIES = ["sol", "mar", "ana", "anéis", "sao paulo", "senhor s", "o", "zz"]
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+
+@pytest.fixture(scope="module", autouse=True)
+def catalog():
+    rng = random.Random(24)
+    with SessionLocal.begin() as db:
+        for _ in range(80):
+            book_service.create_book(
+                db,
+                title=_title(rng),
+                author=rng.choice([None, "Ana", "ANA", "Bia", "J. R. R. Tolkien"]),
+                publisher=rng.choice([None, "Ed A", "Mar Ed"]),
+            )
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Replica construida na hora (sem thread de warm-up) e sem refresh periodico durante o teste."""
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "memory_replica", True)
+    monkeypatch.setattr(settings, "memory_replica_refresh_seconds", 3600)
+    monkeypatch.setattr(memory_replica, "_replica", None)
+    with SessionLocal() as db:
+        monkeypatch.setattr(memory_replica, "_replica", memory_replica.build_replica(db))
+    return memory_replica._replica
+
+
+def _from_database(read: Callable[..., Any], **kwargs: Any) -> Any:
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(get_settings(), "memory_replica", False)
+        with SessionLocal() as db:
+            return read(db, **kwargs)
+
+
+def _from_replica(read: Callable[..., Any], **kwargs: Any) -> Any:
+    with SessionLocal() as db:
+        return read(db, **kwargs)
+
+
+def _walk(read: Callable[..., book_service.BookPage], **kwargs: Any) -> list[dict[str, Any]]:
+    items: list[dict[str, Any]] = []
+    cursor = None
+    while True:
+        page = read(cursor=cursor, **kwargs)
+        items.extend(page.items)
+        if not (cursor := page.next_cursor):
+            return items
+
+
+def _assert_same_reads() -> None:
+    for offset in (0, 7, 40, 500):
+        assert list(_from_replica(book_service.list_books, limit=25, offset=offset)) == list(
+            _from_database(book_service.list_books, limit=25, offset=offset)
+        ), offset
+    assert _walk(lambda **kw: _from_replica(book_service.list_books_page, **kw), limit=17) == _walk(
+        lambda **kw: _from_database(book_service.list_books_page, **kw), limit=17
+    )
+    for query in QUERIES:
+        expected = list(_from_database(book_service.search_books, query=query, limit=500))
+        assert list(_from_replica(book_service.search_books, query=query, limit=500)) == expected, query
+        assert list(_from_replica(book_service.search_books, query=query, limit=5, offset=3)) == expected[3:8], query
+        assert _walk(lambda **kw: _from_replica(book_service.search_books_page, **kw), query=query, limit=9) == expected
+    assert _from_replica(book_service.catalog_version) == _from_database(book_service.catalog_version)
+
+
+def test_reads_match_the_database(replica):
+    assert memory_replica.current() is replica
+    _assert_same_reads()
+    ids = [row["id"] for row in _from_database(book_service.list_books, limit=500)]
+    for book_id in ids[:20]:
+        assert _from_replica(book_service.get_book, book_id=book_id).to_dict() == (
+            _from_database(book_service.get_book, book_id=book_id).to_dict()
+        )
+
+
+def test_own_writes_sync_through_the_changelog(replica):
+    rng = random.Random(7)
+    ids = [row["id"] for row in _from_database(book_service.list_books, limit=500)]
+    with SessionLocal.begin() as db:
+        created = book_service.create_book(db, title=f"senhor {uuid.uuid4().hex[:6]}", author="Bia")
+        book_service.update_book(db, ids[0], title=_title(rng), publisher="Ed C")
+        book_service.delete_book(db, ids[1])
+    with SessionLocal() as db:
+        book_service.update_books_where(db, book_service.BookFilter(author="ANA"), publisher="Ed Massa")
+
+    synced_from = replica.seq
+    assert memory_replica.current() is replica  # aplicou o changelog, sem reconstruir
+    assert replica.seq > synced_from
+    assert replica.book_version(created.id) == created.version
+    assert replica.book_version(ids[1]) is None
+    _assert_same_reads()
+
+
+def test_foreign_writes_sync_on_version_check(replica):
+    # Escrita de outro processo: SQL direto, sem passar pelo book_service (nem marcar a replica).
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE books SET title = 'Sol externo', version = version + 1 WHERE id = (SELECT max(id) FROM books)")
+        conn.exec_driver_sql("INSERT INTO books(title, created_at, version) VALUES ('Mar antigo', '2000-01-01 00:00:00', 1)")
+        conn.exec_driver_sql("UPDATE catalog_state SET version = version + 1 WHERE id = 1")
+
+    assert _from_replica(book_service.catalog_version) != _from_database(book_service.catalog_version)
+    memory_replica._sync(replica, check=True)  # o que o refresh em segundo plano faz
+    assert memory_replica.current() is replica
+    _assert_same_reads()
+
+
+def test_rebuilds_when_the_changelog_was_compacted_past_it(replica):
+    ids = [row["id"] for row in _from_database(book_service.list_books, limit=500)]
+    with SessionLocal.begin() as db:
+        book_service.delete_book(db, ids[-1])
+    # Lapides removidas e horizonte alem do `seq` da replica: o changelog nao a atualiza mais.
+    assert changes.compact(engine, retention_days=-1) >= 1
+    with SessionLocal() as db:
+        assert changes.horizon(db) > replica.seq
+
+    rebuilt = memory_replica.current()
+    assert rebuilt is not None and rebuilt is not replica
+    assert rebuilt.book_version(ids[-1]) is None
+    _assert_same_reads()
+
+    # A replica reconstruida parte do horizonte: a escrita seguinte volta a sincronizar pelo changelog.
+    with SessionLocal.begin() as db:
+        book_service.update_book(db, ids[0], title="Lua depois da compactacao")
+    assert memory_replica.current() is rebuilt
+    _assert_same_reads()
+
+
+def test_compacting_tombstones_keeps_answers(replica):
+    ids = [row["id"] for row in _from_database(book_service.list_books, limit=500)]
+    with SessionLocal.begin() as db:
+        for book_id in ids[:5]:
+            book_service.delete_book(db, book_id)
+    assert memory_replica.current() is replica
+    assert replica.dead
+    replica.compact()
+    assert not replica.dead
+    _assert_same_reads()
@@ -0,0 +1,41 @@
+"""Cold start: orcamento de import dos entry points e config preguicosa.
+
+O orcamento e o de `benchmarks/startup.py`; para calibrar na maquina da CI,
+use `STARTUP_BUDGET="api=1200 mcp=2500"` (mesmo formato do `--budget`).
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks import startup
+
+
+@pytest.mark.parametrize("name", tuple(startup.ENTRY_POINTS))
+def test_import_time_within_budget(name):
+    budget = startup._parse_budget(os.environ.get("STARTUP_BUDGET", "").split())
+    # Melhor de duas medicoes, como o `--repeat` do script (menos ruido).
+    total, entries = min((startup.measure(startup.ENTRY_POINTS[name]) for _ in range(2)), key=lambda run: run[0])
+    slowest = sorted((entry for entry in entries if entry[3] == 1), key=lambda entry: entry[2], reverse=True)[:5]
+    assert total <= budget[name], f"{name}: {total:.0f} ms > {budget[name]:.0f} ms; mais caros: {slowest}"
+
+
+def test_settings_are_built_on_first_use():
+    code = (
+        "import backend.config as c, backend.api.schemas, backend.database.search, backend.services.validation\n"
+        "assert c.get_settings.cache_info().currsize == 0\n"
+        "from backend.config import config\n"
+        "assert config is c.get_settings()\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=startup.ROOT,
+        env={**os.environ, "PYTHONPATH": str(startup.ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,51 @@
+"""Estatisticas do catalogo: livros sem autor/editora fora dos rankings."""
+
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from backend.database import stats
+from backend.database.connection import SessionLocal
+from backend.database.models import Book
+
+
+@pytest.fixture(scope="module", autouse=True)
+def books(client):
+    tag = uuid.uuid4().hex[:8]
+    for index in range(3):
+        client.post("/api/books", json={"title": f"sem editora {tag} {index}", "author": f"Autor {tag}"})
+    client.post("/api/books", json={"title": f"sem autor {tag}", "publisher": f"Editora {tag}"})
+
+
+@pytest.mark.parametrize("triggers", [True, False], ids=["catalog_facets", "group_by"])
+def test_unknown_values_are_counted_apart(monkeypatch, triggers):
+    monkeypatch.setattr(stats, "uses_triggers", lambda _bind: triggers)
+    with SessionLocal() as db:
+        data = stats.catalog_stats(db, top=100)
+        without_author = sum(1 for (author,) in db.execute(select(Book.author)) if not author)
+        without_publisher = sum(1 for (publisher,) in db.execute(select(Book.publisher)) if not publisher)
+
+    assert all(entry["value"] for entry in data["authors"] + data["publishers"])
+    assert data["unknown_authors"] == without_author >= 1
+    assert data["unknown_publishers"] == without_publisher >= 3
+    assert data["distinct_publishers"] == len(data["publishers"])
+    assert sum(entry["count"] for entry in data["publishers"]) + data["unknown_publishers"] == data["total"]
+
+
+def test_both_paths_agree():
+    with SessionLocal() as db:
+        with_triggers = stats.catalog_stats(db)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(stats, "uses_triggers", lambda _bind: False)
+        with SessionLocal() as db:
+            grouped = stats.catalog_stats(db)
+    assert with_triggers == grouped
+
+
+def test_rest_response(client):
+    data = client.get("/api/books/stats", params={"top": 100}).json()
+    assert None not in {entry["value"] for entry in data["authors"] + data["publishers"]}
+    assert data["unknown_publishers"] >= 3
@@ -0,0 +1,179 @@
+"""Indice de sugestoes: orcamento de memoria, array de chaves recentes, top-k guardado e contagens."""
+
+from __future__ import annotations
+
+import random
+import uuid
+from collections import Counter
+from typing import Any
+
+import pytest
+
+from backend.config import get_settings
+from backend.database import suggest
+from backend.database.connection import SessionLocal
+from backend.services import book_service
+
+WORDS = ["abril", "amor", "ana", "anel", "areia", "arco", "asa", "bar", "barco", "casa", "mar"]
+
+Counts = Counter[tuple[int, str]]
+
+
+def _values(rng: random.Random, size: int) -> Counts:
+    counts: Counts = Counter()
+    while len(counts) < size:
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+        counts[(rng.choice((suggest.TITLE, suggest.AUTHOR)), text)] = rng.randint(1, 40)
+    return counts
+
+
+def _build(counts: Counts, budget_bytes: int = 1 << 30) -> suggest.PrefixIndex:
+    # Mesma ordem do `build_index`: dos valores mais frequentes para os menos.
+    index = suggest.PrefixIndex(version=1, budget_bytes=budget_bytes)
+    for (field, text), count in sorted(counts.items(), key=lambda item: -item[1]):
+        if index.truncated:
+            break
+        index.load(field, text, count)
+    index.finish()
+    return index
+
+
+def _assert_complete(index: suggest.PrefixIndex, counts: Counts, prefix: str, limit: int = 10) -> None:
+    """Mesmas contagens e mesma ordem que uma varredura de todos os valores (empates em qualquer ordem)."""
+
+    got = index.complete(prefix, limit)
+    fields = {name: field for field, name in enumerate(suggest.FIELDS)}
+    for row in got:
+        assert counts[(fields[row["field"]], row["text"])] == row["count"], row
+        normalized = suggest.normalize(row["text"])
+        assert any(normalized[offset:].startswith(prefix) for offset in suggest.word_offsets(normalized)), row
+    expected = sorted(
+        (
+            suggest._rank(count, text)
+            for (_field, text), count in counts.items()
+            if count > 0
+            and any(
+                suggest.normalize(text)[offset:].startswith(prefix)
+                for offset in suggest.word_offsets(suggest.normalize(text))
+            )
+        ),
+        reverse=True,
+    )[:limit]
+    assert [suggest._rank(row["count"], row["text"]) for row in got] == expected, prefix
+
+
+def _apply(index: suggest.PrefixIndex, counts: Counts, changes: list[tuple[Any, Any]]) -> None:
+    index.apply(changes)
+    for before, after in changes:
+        for values, delta in ((before, -1), (after, 1)):
+            for field, text in enumerate(values or ()):
+                if text:
+                    counts[(field, text)] += delta
+
+
+def _retitle(old: str | None, new: str | None) -> tuple[Any, Any]:
+    return (None if old is None else (old, None, None)), (None if new is None else (new, None, None))
+
+
+def test_budget_keeps_the_most_frequent_values():
+    counts = Counter({(suggest.AUTHOR, f"autor {n:03d}"): 1000 - n for n in range(200)})
+    full = _build(counts)
+    index = _build(counts, budget_bytes=full.bytes // 4)
+
+    assert index.truncated and not full.truncated
+    assert 0 < len(index) < len(counts)
+    assert index.bytes <= index.budget_bytes
+    # Os que entraram sao exatamente os mais frequentes.
+    assert set(index.entry_ids) == {(suggest.AUTHOR, f"autor {n:03d}") for n in range(len(index))}
+    assert [row["count"] for row in index.complete("autor", 3)] == [1000, 999, 998]
+
+    # Escritas tambem respeitam o orcamento: um valor novo que nao cabe fica de fora.
+    index.apply([(None, ("titulo novo", None, None))])
+    assert index.complete("titulo", 5) == []
+    assert index.stats()["truncated"]
+
+
+def test_recent_keys_merge_into_the_main_array(monkeypatch):
+    monkeypatch.setattr(suggest, "RECENT_MIN_KEYS", 16)
+    rng = random.Random(20)
+    counts = _values(rng, 60)
+    index = _build(counts)
+    merged = False
+    for step in range(40):
+        changes = []
+        for _ in range(rng.randint(1, 4)):
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + f" {step}"
+            old = rng.choice([text for (field, text), count in counts.items() if field == suggest.TITLE and count > 0])
+            changes.append(_retitle(rng.choice([None, old]), text))
+        before = len(index.keys)
+        _apply(index, counts, changes)
+        merged |= len(index.keys) > before
+        assert len(index.recent) <= max(suggest.RECENT_MIN_KEYS, len(index.keys) // suggest.RECENT_FRACTION)
+        assert list(index.recent) == sorted(index.recent, key=index._suffix)
+        for prefix in ("a", "an", "bar", "casa ", f"{step}", "mar a"):
+            _assert_complete(index, counts, prefix)
+    assert merged and len(index.keys) > 0
+    assert list(index.keys) == sorted(index.keys, key=index._suffix)
+    assert index.stats()["keys"] == _build(+counts).stats()["keys"]
+
+
+def test_large_prefixes_use_the_cached_top_k(monkeypatch):
+    monkeypatch.setattr(suggest, "SCAN_LIMIT", 8)
+    monkeypatch.setattr(suggest, "MAX_LIMIT", 5)
+    rng = random.Random(3)
+    counts = _values(rng, 80)
+    index = _build(counts)
+
+    _assert_complete(index, counts, "a", 5)
+    assert "a" in index._top  # intervalo maior que SCAN_LIMIT: top-k guardado
+    for _ in range(60):
+        live = [(field, text) for (field, text), count in counts.items() if field == suggest.TITLE and count > 0]
+        text = rng.choice(live)[1]
+        if rng.random() < 0.5:
+            # Sobe (varias copias na mesma troca): o valor pode entrar no top-k guardado.
+            _apply(index, counts, [_retitle(None, text)] * rng.randint(1, 30))
+        else:
+            # Cai ou some: o top-k do prefixo e descartado e recalculado na proxima consulta.
+            _apply(index, counts, [_retitle(text, None)] * rng.randint(1, counts[(suggest.TITLE, text)]))
+        for prefix in ("a", "an", "b", "mar"):
+            for limit in (1, 5):
+                _assert_complete(index, counts, prefix, limit)
+
+
+@pytest.fixture
+def live_index(monkeypatch):
+    """Indice global construido na hora, sem refresh em segundo plano durante o teste."""
+
+    monkeypatch.setattr(get_settings(), "suggest_refresh_seconds", 3600)
+    with SessionLocal() as db:
+        monkeypatch.setattr(suggest, "_index", suggest.build_index(db))
+    return suggest._index
+
+
+def test_counts_follow_updates_and_deletes(live_index):
+    tag = uuid.uuid4().hex[:8]
+    with SessionLocal.begin() as db:
+        books = [
+            book_service.create_book(db, title=f"{tag} livro {n}", author=f"{tag} autor {n % 3}", publisher=f"{tag} ed")
+            for n in range(9)
+        ]
+    with SessionLocal.begin() as db:
+        book_service.update_book(db, books[0].id, author=f"{tag} autor 2")
+        book_service.update_book(db, books[1].id, title=f"{tag} livro 0")
+        book_service.update_book(db, books[2].id, purchase_link="https://example.com/x")
+        book_service.delete_book(db, books[3].id)
+    with SessionLocal() as db:
+        book_service.update_books_where(db, book_service.BookFilter(author=f"{tag} autor 1"), publisher=f"{tag} outra")
+        book_service.delete_books_where(db, book_service.BookFilter(author=f"{tag} autor 2"))
+
+    assert suggest._index is live_index
+    with SessionLocal() as db:
+        rebuilt = suggest.build_index(db)
+    for prefix in (tag, f"{tag} autor", f"{tag} livro", f"{tag} ed", f"{tag} outra"):
+        normalized = suggest.normalize(prefix)
+        assert sorted(map(repr, live_index.complete(normalized, suggest.MAX_LIMIT))) == sorted(
+            map(repr, rebuilt.complete(normalized, suggest.MAX_LIMIT))
+        ), prefix
+    assert book_service.suggest_books(f"{tag} autor 2") == []
+    assert [row["count"] for row in book_service.suggest_books(f"{tag} autor 1")] == [3]
+    assert [row["count"] for row in book_service.suggest_books(f"{tag} ed")] == [1]
@@ -0,0 +1,49 @@
+"""`update_book`: PATCH sem mudanca nao conta como escrita."""
+
+from __future__ import annotations
+
+import uuid
+
+import pytest
+
+from backend.database import crud, memory_replica
+from backend.database.connection import SessionLocal
+from backend.services import book_service
+
+
+@pytest.fixture
+def book():
+    with SessionLocal.begin() as db:
+        created = book_service.create_book(db, title=f"Sem mudanca {uuid.uuid4().hex[:8]}", author="Ana")
+    return created
+
+
+@pytest.mark.parametrize("returning", [True, False], ids=["returning", "orm"])
+def test_noop_update_is_not_a_write(monkeypatch, book, returning):
+    monkeypatch.setattr(crud, "supports_returning", lambda _db: returning)
+    calls = []
+    monkeypatch.setattr(book_service.cache, "invalidate", lambda *args: calls.append("invalidate"))
+    monkeypatch.setattr(memory_replica, "note_write", lambda _db: calls.append("note_write"))
+    with SessionLocal() as db:
+        version = crud.get_catalog_version(db)
+
+    with SessionLocal.begin() as db:
+        same = book_service.update_book(db, book.id, title=book.title, author="Ana", expected_version=book.version)
+        assert (same.id, same.title, same.version) == (book.id, book.title, book.version)
+
+    assert calls == []
+    with SessionLocal() as db:
+        assert crud.get_catalog_version(db) == version
+
+    with SessionLocal.begin() as db:
+        assert book_service.update_book(db, book.id, author="Bia").version == book.version + 1
+    assert calls == ["invalidate", "note_write"]
+    with SessionLocal() as db:
+        assert crud.get_catalog_version(db) == version + 1
+
+
+def test_noop_update_keeps_version_checks(book):
+    with SessionLocal.begin() as db, pytest.raises(book_service.VersionConflictError):
+        book_service.update_book(db, book.id, author="Ana", expected_version=book.version + 1)
+    with SessionLocal.begin() as db, pytest.raises(book_service.BookNotFoundError):
+        book_service.update_book(db, 10**9, author="Ana")
@@ -0,0 +1,120 @@
+"""Group commit: falha no commit do grupo, resultado de cada chamador e notas aplicadas uma vez."""
+
+from __future__ import annotations
+
+import uuid
+from typing import Any
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from backend.config import get_settings
+from backend.database import fuzzy, memory_replica, suggest
+from backend.database.connection import SessionLocal
+from backend.database.models import Book
+from backend.database.write_coalescer import WriteCoalescer
+from backend.services import book_service
+
+
+def _word() -> str:
+    # So letras: o indice fuzzy ignora termos com digitos.
+    return "".join(chr(ord("a") + int(digit, 16)) for digit in uuid.uuid4().hex[:10])
+
+
+@pytest.fixture
+def indexes(monkeypatch):
+    """Indices em memoria construidos na hora e contadores das notas aplicadas apos o commit."""
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "memory_replica", True)
+    monkeypatch.setattr(settings, "suggest_refresh_seconds", 3600)
+    monkeypatch.setattr(settings, "fuzzy_refresh_seconds", 3600)
+    with SessionLocal() as db:
+        monkeypatch.setattr(suggest, "_index", suggest.build_index(db))
+        monkeypatch.setattr(fuzzy, "_index", fuzzy.build_index(db))
+
+    invalidations: list[set[int]] = []
+    apply = book_service.cache._apply
+
+    def spy(book_ids: Any) -> None:
+        # `invalidate` chama com uma tupla na hora; a rodada apos o commit recebe o set da sessao.
+        if isinstance(book_ids, set):
+            invalidations.append(set(book_ids))
+        apply(book_ids)
+
+    monkeypatch.setattr(book_service.cache, "_apply", spy)
+    return invalidations
+
+
+def _failing_group_commit() -> tuple[Any, list[Session]]:
+    """Fabrica de sessoes em que o commit da primeira (a do grupo) falha no banco."""
+
+    sessions: list[Session] = []
+
+    def fail(session: Session) -> None:
+        raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+
+    def factory(**kwargs: Any) -> Session:
+        session = SessionLocal(**kwargs)
+        if not sessions:
+            event.listen(session, "before_commit", fail)
+        sessions.append(session)
+        return session
+
+    return factory, sessions
+
+
+def test_failed_group_commit_retries_each_write_once(indexes):
+    tag, lost, ghost = _word(), _word(), _word()
+    calls: list[int] = []
+
+    def only_in_the_group(db: Session, **kwargs: Any) -> Any:
+        # Entra no grupo desfeito e falha na repeticao: nada dela pode chegar aos indices.
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("falhou na repeticao")
+        return book_service.create_book(db, **kwargs)
+
+    with SessionLocal.begin() as db:
+        existing = book_service.create_book(db, title=f"{tag} antigo", author=f"{tag} autor")
+    written = memory_replica._written
+    indexes.clear()
+
+    factory, sessions = _failing_group_commit()
+    coalescer = WriteCoalescer(factory, window_ms=1000, max_batch=5)
+    try:
+        futures = [
+            coalescer.submit(book_service.create_book, title=f"{tag} primeiro", author=f"{tag} autor"),
+            coalescer.submit(book_service.update_book, 10**9, title=f"{tag} {lost}"),
+            coalescer.submit(book_service.create_book, title=f"{tag} segundo", author=f"{tag} autor"),
+            coalescer.submit(book_service.update_book, existing.id, publisher=f"{tag} editora"),
+            coalescer.submit(only_in_the_group, title=f"{tag} {ghost}", author=f"{tag} autor"),
+        ]
+        first, missing, second, updated, flaky = futures
+        assert first.result(timeout=10).title == f"{tag} primeiro"
+        assert second.result(timeout=10).title == f"{tag} segundo"
+        assert updated.result(timeout=10).publisher == f"{tag} editora"
+        with pytest.raises(book_service.BookNotFoundError):
+            missing.result(timeout=10)
+        with pytest.raises(RuntimeError):
+            flaky.result(timeout=10)
+    finally:
+        coalescer.stop()
+
+    # Um grupo desfeito e depois uma sessao por escrita.
+    assert len(sessions) == 1 + len(futures)
+    assert coalescer.stats()["batches"] == len(futures)
+    with SessionLocal() as db:
+        titles = sorted(db.scalars(select(Book.title).where(Book.title.startswith(tag))))
+    assert titles == [f"{tag} antigo", f"{tag} primeiro", f"{tag} segundo"]
+
+    # Notas so das tres escritas commitadas, cada uma uma vez (nada da tentativa em grupo).
+    assert indexes == [set(), set(), {existing.id}]
+    assert memory_replica._written == written + 3
+    assert tag in fuzzy._index.term_ids
+    assert lost not in fuzzy._index.term_ids and ghost not in fuzzy._index.term_ids
+    assert [row["count"] for row in suggest.complete(f"{tag} autor")] == [3]
+    assert [row["count"] for row in suggest.complete(f"{tag} editora")] == [1]
+    assert suggest.complete(lost) == suggest.complete(ghost) == []